@@ -0,0 +1,106 @@
+"""
+Benchmark: per-row execute vs etl_db.execute_batch (pipeline + prepared).
+
+Needs a reachable Postgres (a local one or a scratch Neon branch); all work
+happens in a TEMP table inside a rolled-back transaction.
+
+Usage:
+    python benchmarks/bench_db_batch.py --database-url postgresql://localhost/postgres [--rows 5000]
+
+Measured (PostgreSQL 16.2, psycopg 3.3.6, Python 3.11, statements/s, best of runs):
+
+    case                        local socket (5000 rows)   +10 ms RTT proxy (500 rows)
+    insert/rows                 ~27 000                    85
+    insert/pipeline             ~38 000-54 000             11 000-15 000
+    upsert-returning/rows       ~14 500-16 500             85
+    upsert-returning/pipeline   ~20 300                    6 000-12 600
+
+On a local socket pipelining gains 1.3-2x; once there is network latency
+(Neon is typically 5-30 ms away) per-row mode is bound by one round trip per
+statement and pipelining is two orders of magnitude faster.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import etl_db  # noqa: E402
+
+
+INSERT_SQL = "INSERT INTO bench_batch (name, qty, payload) VALUES (%s, %s, %s::jsonb)"
+UPSERT_RETURNING_SQL = """
+    INSERT INTO bench_batch_companies (name)
+    VALUES (%s)
+    ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+    RETURNING id
+"""
+
+
+def _prepare(cur) -> None:
+    cur.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS bench_batch (
+            id BIGSERIAL PRIMARY KEY, name TEXT, qty INTEGER, payload JSONB
+        )
+        """
+    )
+    cur.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS bench_batch_companies (id BIGSERIAL PRIMARY KEY, name TEXT UNIQUE)"
+    )
+    cur.execute("TRUNCATE bench_batch, bench_batch_companies")
+
+
+def _timed(conn, fn) -> float:
+    with conn.cursor() as cur:
+        _prepare(cur)
+        started = time.perf_counter()
+        fn(cur)
+        return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark per-row vs pipelined ETL writes")
+    parser.add_argument("--database-url", default="", help="Override DATABASE_URL from env")
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    database_url = (args.database_url or os.getenv("DATABASE_URL", "")).strip()
+    if not database_url:
+        raise RuntimeError("DATABASE_URL is empty. Set it in .env or pass --database-url.")
+
+    import psycopg
+
+    rows = [(f"row {i}", i, '{"i": %d}' % i) for i in range(args.rows)]
+    companies = [(f"company {i % 200}",) for i in range(args.rows)]
+    cases = {
+        "insert/rows": lambda cur: etl_db.execute_batch(cur, INSERT_SQL, rows, mode=etl_db.BATCH_MODE_ROWS),
+        "insert/pipeline": lambda cur: etl_db.execute_batch(cur, INSERT_SQL, rows),
+        "upsert-returning/rows": lambda cur: etl_db.execute_batch(
+            cur, UPSERT_RETURNING_SQL, companies, returning=True, mode=etl_db.BATCH_MODE_ROWS
+        ),
+        "upsert-returning/pipeline": lambda cur: etl_db.execute_batch(
+            cur, UPSERT_RETURNING_SQL, companies, returning=True
+        ),
+    }
+
+    print(f"pipeline supported: {etl_db.pipeline_supported()}")
+    print(f"{'case':<28} {'rows':>7} {'seconds':>9} {'stmts/s':>10}")
+    with psycopg.connect(database_url) as conn:
+        for name, fn in cases.items():
+            seconds = _timed(conn, fn)
+            conn.rollback()
+            print(f"{name:<28} {args.rows:>7} {seconds:>9.3f} {args.rows / seconds if seconds else 0:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
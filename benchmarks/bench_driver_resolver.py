@@ -0,0 +1,109 @@
+"""
+Benchmark: exact-name dict lookup vs DriverResolver on synthetic plan cells.
+
+Generates --drivers synthetic drivers and --cells plan cells written the way
+dispatchers type them (exact, surname first, initial + surname, surname only,
+trailing notes, alias, name + status, unknown names), then reports match rate
+and cells/s for
+- "exact":    the old _norm(full_name) dict lookup over _driver_candidates
+- "resolver": DriverResolver (indexes built once, memoized per cell text)
+- "resolver-cold": DriverResolver with a fresh cache per cell (worst case)
+
+Usage:
+    python benchmarks/bench_driver_resolver.py [--drivers 300] [--cells 200000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from etl_xlsb_to_postgres import DriverResolver, _driver_candidates, _norm  # noqa: E402
+
+FIRST = ["Max", "Jan", "Erika", "Piotr", "Andrzej", "Olga", "Ivan", "Tomasz", "Marek", "Lukas", "Anna", "Dmitri"]
+LAST_STEMS = ["Muster", "Kowal", "Nowak", "Schmidt", "Petrov", "Wisnie", "Becker", "Lewand", "Zielin", "Koch"]
+
+
+def _drivers(count: int) -> list[tuple[int, str, str]]:
+    return [
+        (i + 1, f"{FIRST[i % len(FIRST)]} {LAST_STEMS[i % len(LAST_STEMS)]}{'ski' * (i // 120)}{i // len(LAST_STEMS)}", f"F{i + 1:04d}")
+        for i in range(count)
+    ]
+
+
+def _cells(drivers: list[tuple[int, str, str]], count: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    styles = [
+        lambda f, l: f"{f} {l}",
+        lambda f, l: f"{l} {f}",
+        lambda f, l: f"{f[0]}. {l}",
+        lambda f, l: l,
+        lambda f, l: f"{f} {l} spät",
+        lambda f, l: f"{f} {l} / Urlaub",
+        lambda f, l: f"{f[:3].lower()}{l[:2].lower()}",
+        lambda f, l: "Aushilfe Nord",
+    ]
+    cells = []
+    for _ in range(count):
+        _, full_name, _ = rng.choice(drivers)
+        first, last = full_name.split(" ", 1)
+        cells.append(rng.choice(styles)(first, last))
+    return cells
+
+
+def _exact_resolve(cell: str, driver_map: dict[str, int]) -> int | None:
+    for candidate in _driver_candidates(cell):
+        matched = driver_map.get(candidate)
+        if matched is not None:
+            return matched
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Driver name resolution: exact dict vs DriverResolver")
+    parser.add_argument("--drivers", type=int, default=300)
+    parser.add_argument("--cells", type=int, default=200_000)
+    args = parser.parse_args()
+
+    drivers = _drivers(args.drivers)
+    aliases = {f"{n.split()[0][:3]}{n.split()[1][:2]}": ext for _, n, ext in drivers}
+    cells = _cells(drivers, args.cells)
+
+    driver_map: dict[str, int] = {}
+    for did, full_name, _ in drivers:
+        driver_map.setdefault(_norm(full_name), did)
+
+    started = time.perf_counter()
+    resolver = DriverResolver(drivers, aliases)
+    build_sec = time.perf_counter() - started
+
+    cold = DriverResolver(drivers, aliases)
+
+    def run_cold(cell: str) -> int | None:
+        cold._cache.clear()
+        return cold.resolve(cell)
+
+    cases = {
+        "exact": lambda cell: _exact_resolve(cell, driver_map),
+        "resolver": resolver.resolve,
+        "resolver-cold": run_cold,
+    }
+    print(f"drivers={len(drivers)} cells={len(cells)} index build={build_sec * 1000:.1f} ms")
+    print(f"{'case':<14} {'matched':>9} {'rate':>7} {'seconds':>9} {'cells/s':>11}")
+    for name, fn in cases.items():
+        started = time.perf_counter()
+        matched = sum(1 for cell in cells if fn(cell) is not None)
+        seconds = time.perf_counter() - started
+        print(f"{name:<14} {matched:>9} {matched / len(cells):>7.1%} {seconds:>9.3f} {len(cells) / seconds:>11.0f}")
+    report = resolver.report()
+    print(f"resolver by method: {report['by_method']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
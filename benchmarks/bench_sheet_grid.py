@@ -0,0 +1,148 @@
+"""
+Benchmark: ws.cell() random access vs SheetGrid on read-only worksheets.
+
+Builds a synthetic workbook shaped like the Bericht_Dispo, BonusDynamik and
+Diesel sheets, then for each sheet times
+- "cell":  the first --rows rows read cell by cell via ws.cell() (the old
+           access pattern; every call re-parses the sheet, so keep it small)
+- "grid":  the same region read through SheetGrid in one pass
+- "extract": the current extractor end to end
+
+Usage:
+    python benchmarks/bench_sheet_grid.py [--drivers 30] [--rows 10] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import openpyxl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from etl_xlsm_to_postgres import (  # noqa: E402
+    BERICHT_DISPO_SHEET,
+    BONUS_DYNAMIK_SHEET,
+    DIESEL_SHEET,
+    MONTH_NAMES_DE,
+    extract_bonus_dynamik_months,
+    extract_diesel_months,
+    extract_einnahmen_months,
+)
+from xlsx_package import SheetGrid  # noqa: E402
+
+
+BONUS_HEADERS = ["DAYS", "KM", "%KM", "CT", "%CT", "BONUS", "PENALTY", "FINAL"]
+
+
+def _build_workbook(path: Path, drivers: int) -> None:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = BERICHT_DISPO_SHEET
+    for month_idx, name in enumerate(MONTH_NAMES_DE, start=1):
+        ws.cell(row=6, column=2 + month_idx, value=name)
+    for row_idx, label in ((40, "Nahverkehr"), (41, "Logistics"), (42, "Gesamt")):
+        ws.cell(row=row_idx, column=2, value=label)
+        for col_idx in range(3, 15):
+            ws.cell(row=row_idx, column=col_idx, value=1000 + row_idx * col_idx)
+    ws.cell(row=120, column=84, value="end")
+
+    ws = wb.create_sheet(BONUS_DYNAMIK_SHEET)
+    for block in range(12):
+        start_col = 3 + block * 8
+        ws.cell(row=1, column=start_col, value=date(2026, block + 1, 1))
+        for off, header in enumerate(BONUS_HEADERS):
+            ws.cell(row=2, column=start_col + off, value=header)
+    for row_idx in range(3, drivers + 3):
+        ws.cell(row=row_idx, column=1, value=f"F{row_idx:04d}")
+        ws.cell(row=row_idx, column=2, value=f"Driver {row_idx}")
+        for block in range(12):
+            start_col = 3 + block * 8
+            for off in range(8):
+                cell = ws.cell(row=row_idx, column=start_col + off, value=(row_idx + off) / 100)
+                if off in (2, 4):
+                    cell.number_format = "0%"
+
+    ws = wb.create_sheet(DIESEL_SHEET)
+    groups = [("Diesel", ["Month", "Year"]), ("Liter", ["Staack", "Shell", "DKV", "Total"]),
+              ("Euro", ["Staack", "Shell", "DKV", "Total"]), ("Euro/Liter", ["Staack", "Shell", "DKV", "Average"])]
+    col_idx = 1
+    for top, subs in groups:
+        ws.cell(row=1, column=col_idx, value=top)
+        for sub in subs:
+            ws.cell(row=2, column=col_idx, value=sub)
+            col_idx += 1
+    for note in ("Note", "Checked by", "Booked"):
+        ws.cell(row=1, column=col_idx, value="Info")
+        ws.cell(row=2, column=col_idx, value=note)
+        col_idx += 1
+    for row_idx in range(3, 3 + 60):
+        ws.cell(row=row_idx, column=1, value=(row_idx - 3) % 12 + 1)
+        ws.cell(row=row_idx, column=2, value=2020 + (row_idx - 3) // 12)
+        for c in range(3, col_idx):
+            ws.cell(row=row_idx, column=c, value=row_idx * c)
+    wb.save(path)
+
+
+def _read_cells(ws, max_row: int, max_col: int) -> int:
+    count = 0
+    for row_idx in range(1, max_row + 1):
+        for col_idx in range(1, max_col + 1):
+            if ws.cell(row=row_idx, column=col_idx).value is not None:
+                count += 1
+    return count
+
+
+def _read_grid(ws, max_row: int, max_col: int) -> int:
+    grid = SheetGrid(ws, max_row=max_row, max_col=max_col)
+    return sum(1 for _, row in grid.iter_rows() for v in row if v is not None)
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ws.cell() scans vs SheetGrid")
+    parser.add_argument("--drivers", type=int, default=30, help="BonusDynamik data rows")
+    parser.add_argument("--rows", type=int, default=10, help="Rows per sheet in the cell/grid comparison")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.xlsx"
+        _build_workbook(path, args.drivers)
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        extractors = {
+            BERICHT_DISPO_SHEET: extract_einnahmen_months,
+            BONUS_DYNAMIK_SHEET: extract_bonus_dynamik_months,
+            DIESEL_SHEET: extract_diesel_months,
+        }
+        print(f"{'sheet':<14} {'cells':>8} {'cell s':>9} {'grid s':>9} {'speedup':>8} {'extract s':>10}")
+        for sheet, extractor in extractors.items():
+            ws = wb[sheet]
+            max_row, max_col = min(args.rows, int(ws.max_row or 0)), int(ws.max_column or 0)
+            assert _read_cells(ws, max_row, max_col) == _read_grid(ws, max_row, max_col)
+            cell_sec = _best_of(args.repeat, lambda: _read_cells(ws, max_row, max_col))
+            grid_sec = _best_of(args.repeat, lambda: _read_grid(ws, max_row, max_col))
+            extract_sec = _best_of(args.repeat, lambda: extractor(wb))
+            print(
+                f"{sheet:<14} {max_row * max_col:>8} {cell_sec:>9.3f} {grid_sec:>9.3f} "
+                f"{cell_sec / grid_sec if grid_sec else 0:>7.1f}x {extract_sec:>10.3f}"
+            )
+        wb.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
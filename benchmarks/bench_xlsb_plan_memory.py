@@ -0,0 +1,136 @@
+"""
+Benchmark: peak memory of the XLSB plan import, buffered vs streaming.
+
+pyxlsb cannot write workbooks, so by default the plan sheet is synthetic: row
+values are generated lazily in the shape of Fahrer-Arbeitsplan (year/week
+headers in rows 2-3, one truck per row, one column per ISO week over --years).
+Pass --xlsb-path to read a real LKW_Fahrer_Plan.xlsb instead.
+
+Each mode runs in a fresh child process so ru_maxrss is its own peak:
+- "buffered": every sheet row copied into a list, all records collected, then
+              all insert params built (the old _extract_records + loader)
+- "stream":   _iter_plan_records feeding INSERT_CHUNK_ROWS-sized param chunks
+
+Usage:
+    python benchmarks/bench_xlsb_plan_memory.py [--trucks 400] [--years 6] [--xlsb-path PATH]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from etl_xlsb_to_postgres import (  # noqa: E402
+    INSERT_CHUNK_ROWS,
+    PLAN_SHEET,
+    PLAN_START_COL,
+    DriverResolver,
+    _iter_plan_records,
+)
+
+MODES = ("buffered", "stream")
+ASSIGNMENTS = ("Max Muster", "Erika Beispiel / Urlaub", "werkstatt", "Jan Kowalski", "u", "")
+
+
+def _synthetic_rows(trucks: int, years: int):
+    weeks = [(year, week) for year in range(2021, 2021 + years) for week in range(1, 53)]
+    pad = [None] * PLAN_START_COL
+    yield ["Fahrer-Arbeitsplan"] + pad[1:] + [None] * len(weeks)
+    yield pad + [year for year, _ in weeks]
+    yield pad + [week for _, week in weeks]
+    for t in range(trucks):
+        yield [f"L{t:04d}", "Firma", "Typ", None, None] + [
+            ASSIGNMENTS[(t + i) % len(ASSIGNMENTS)] or None for i in range(len(weeks))
+        ]
+
+
+def _xlsb_rows(path: Path):
+    from pyxlsb import open_workbook
+
+    with open_workbook(str(path)) as wb:
+        with wb.get_sheet(PLAN_SHEET) as ws:
+            for row in ws.rows():
+                yield [cell.v for cell in row]
+
+
+def _params(rec) -> tuple:
+    return (
+        0,
+        rec.iso_year,
+        rec.iso_week,
+        rec.work_date,
+        rec.company_id,
+        rec.truck_id,
+        rec.driver_id,
+        rec.assignment_value,
+        rec.assignment_type,
+        PLAN_SHEET,
+        rec.source_row_no,
+        rec.source_row_hash,
+        json.dumps(rec.raw_payload, ensure_ascii=False),
+    )
+
+
+def _run_mode(mode: str, rows) -> int:
+    drivers = DriverResolver([(1, "Max Muster", None), (2, "Erika Beispiel", None), (3, "Jan Kowalski", None)])
+    if mode == "buffered":
+        rows = list(rows)
+        records = list(_iter_plan_records(rows, {}, drivers))
+        params = [_params(rec) for rec in records]
+        return len(params)
+
+    count = 0
+    chunk = []
+    for rec in _iter_plan_records(rows, {}, drivers):
+        chunk.append(_params(rec))
+        if len(chunk) >= INSERT_CHUNK_ROWS:
+            count += len(chunk)
+            chunk = []
+    return count + len(chunk)
+
+
+def _child(args) -> int:
+    rows = _xlsb_rows(Path(args.xlsb_path)) if args.xlsb_path else _synthetic_rows(args.trucks, args.years)
+    started = time.perf_counter()
+    records = _run_mode(args.mode, rows)
+    seconds = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024
+    print(json.dumps({"records": records, "seconds": seconds, "peak_kb": peak_kb}))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Peak RSS of buffered vs streaming XLSB plan extraction")
+    parser.add_argument("--trucks", type=int, default=400)
+    parser.add_argument("--years", type=int, default=6)
+    parser.add_argument("--xlsb-path", default="", help="Read a real plan workbook instead of synthetic rows")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        return _child(args)
+
+    source = args.xlsb_path or f"synthetic {args.trucks} trucks x {args.years * 52} weeks"
+    print(f"source: {source}")
+    print(f"{'mode':<10} {'records':>9} {'seconds':>9} {'peak RSS MB':>12}")
+    for mode in MODES:
+        cmd = [sys.executable, __file__, "--mode", mode, "--trucks", str(args.trucks), "--years", str(args.years)]
+        if args.xlsb_path:
+            cmd += ["--xlsb-path", args.xlsb_path]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<10} {result['records']:>9} {result['seconds']:>9.2f} {result['peak_kb'] / 1024:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,7 +4,6 @@ import time
 import atexit
 import msvcrt
 import logging
-import pathlib
 import asyncio
 import signal
 import urllib.request
@@ -34,8 +33,13 @@ from telegram.ext import (
 )
 from telegram.error import BadRequest
 
+import db_pool
 from excel_service import run_report
 from report_config import get_report_config, REPORT_TYPES
+from report_cache import ReportCache
+from report_queue import ReportQueue
+from telegram_file_cache import get_file_cache
+from whitelist_store import WhitelistStore, refresh_sec_from_env
 
 # Load env early so module-level constants read values from .env
 load_dotenv(override=True)
@@ -78,6 +82,8 @@ for name in ("httpx", "telegram", "telegram.ext", "telegram.request", "telegram.
 logger = logging.getLogger("lkw_report_bot")
 
 EXCEL_LOCK = Lock()
+# Single Excel worker; identical queued requests share one run, rendered reports are cached (see report_queue).
+REPORT_QUEUE = ReportQueue(run_report, excel_lock=EXCEL_LOCK, cache=ReportCache.from_env())
 
 # Graceful shutdown flag
 _shutdown_event = asyncio.Event()
@@ -212,6 +218,7 @@ TEXT = {
         "select_year": "Select year:",
         "select_week": "Select week:",
         "set_year_week_first": "Set Year and Week first.",
+        "queued": "Queued: #{pos} in line...",
         "step1": "Step 1/3: Starting Excel...",
         "step2": "Step 2/3: Running VBA + exporting...",
         "step3": "Step 3/3: Sending PDF to Telegram...",
@@ -237,6 +244,7 @@ TEXT = {
         "select_year": "Выберите год:",
         "select_week": "Выберите неделю:",
         "set_year_week_first": "Сначала выберите Year и Week.",
+        "queued": "В очереди: №{pos}...",
         "step1": "Шаг 1/3: Запуск Excel...",
         "step2": "Шаг 2/3: VBA + экспорт...",
         "step3": "Шаг 3/3: Отправка PDF в Telegram...",
@@ -260,46 +268,13 @@ def T(update: Update, key: str, **kwargs) -> str:
 # =========================
 # ACCESS
 # =========================
-# Cached allowed_users from DB with TTL.
-_wl_cache: set[int] = set()
-_wl_cache_ts: float = 0.0
-_WL_CACHE_TTL = 60  # seconds
-_wl_db_warned: bool = False
+# allowed_users snapshot, kept current by a LISTEN/NOTIFY task (see whitelist_store).
+_wl_store = WhitelistStore(refresh_sec=refresh_sec_from_env())
 
 
-def _load_allowed_users_from_db() -> set[int]:
-    db_url = (os.getenv("DATABASE_URL", "") or "").strip()
-    if not db_url:
-        return set()
-    try:
-        import psycopg  # type: ignore
-
-        with psycopg.connect(db_url) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT telegram_user_id
-                    FROM allowed_users
-                    WHERE is_active = true
-                    """
-                )
-                return {int(row[0]) for row in cur.fetchall() if row and row[0]}
-    except Exception:
-        global _wl_db_warned
-        if not _wl_db_warned:
-            logger.exception("Failed to load allowed_users from DB; denying access until DB is reachable")
-            _wl_db_warned = True
-        return set()
-
-
-def _whitelist() -> set[int]:
-    """Return allowed users from DB table allowed_users."""
-    global _wl_cache, _wl_cache_ts
-    now = time.time()
-    if now - _wl_cache_ts > _WL_CACHE_TTL:
-        _wl_cache = _load_allowed_users_from_db()
-        _wl_cache_ts = now
-    return _wl_cache
+def _whitelist() -> frozenset[int]:
+    """Return allowed users from DB table allowed_users (in-memory snapshot, no DB access)."""
+    return _wl_store.snapshot
 
 
 def _allowed(update: Update) -> bool:
@@ -479,6 +454,16 @@ async def _forward_text_to_owner(update: Update, context: ContextTypes.DEFAULT_T
 # COMMANDS / MENU
 # =========================
 async def _post_init(app):
+    # Shared DB pool + whitelist first: handlers only ever read the cached set.
+    await db_pool.open_pool()
+    await _wl_store.refresh()
+    db_url = (os.getenv("DATABASE_URL", "") or "").strip()
+    if db_url:
+        app.bot_data["whitelist_task"] = asyncio.create_task(_wl_store.run(db_url))
+    logger.info(f"Whitelist users: {len(_whitelist())}")
+    REPORT_QUEUE.bot = app.bot
+    await REPORT_QUEUE.recover()
+
     # Set bot commands
     await app.bot.set_my_commands(
         [
@@ -672,48 +657,36 @@ async def _run_report_and_send(
     context: ContextTypes.DEFAULT_TYPE,
     tag: str = "GEN",
 ):
-    """Generate a report via Excel COM and send PDF to user. Shared by inline-menu and webapp handlers."""
-    lang = _lang(update) if update else "en"
+    """Queue a report (REPORT_QUEUE) and send the PDF to the user when it is done. Shared by inline-menu and webapp handlers."""
 
-    async with EXCEL_LOCK:
-        try:
-            await safe_edit(status_msg, T(update, "gen_title", y=year, w=week, step=T(update, "step2")))
+    async def on_start(waiter):
+        await safe_edit(status_msg, T(update, "gen_title", y=year, w=week, step=T(update, "step2")))
 
-            xlsx_path, pdf_path = await asyncio.wait_for(
-                asyncio.to_thread(run_report, report_type, year, week),
-                timeout=30 * 60,
-            )
-        except asyncio.TimeoutError:
-            logger.exception("%s timeout user=%s year=%s week=%s", tag, uid, year, week)
+    async def on_done(waiter, result):
+        if result.error is not None:
+            logger.error("%s failed user=%s year=%s week=%s: %s", tag, uid, year, week, result.error)
             await safe_edit(status_msg, T(update, "err"))
             return
-        except Exception:
-            logger.exception("%s failed user=%s year=%s week=%s", tag, uid, year, week)
-            await safe_edit(status_msg, T(update, "err"))
-            return
-
-    await safe_edit(status_msg, T(update, "gen_title", y=year, w=week, step=T(update, "step3")))
-
-    try:
-        if pdf_path and os.path.exists(pdf_path):
-            with open(pdf_path, "rb") as fp:
-                await bot.send_document(chat_id=uid, document=fp, filename=os.path.basename(pdf_path))
-    except Exception:
-        logger.exception("%s SEND PDF failed user=%s year=%s week=%s", tag, uid, year, week)
-        await bot.send_message(chat_id=uid, text=T(update, "err"))
-        return
 
-    logger.info("%s success user=%s year=%s week=%s pdf=%s", tag, uid, year, week, pdf_path)
-
-    for p in (pdf_path, xlsx_path):
+        await safe_edit(status_msg, T(update, "gen_title", y=year, w=week, step=T(update, "step3")))
         try:
-            if p:
-                pathlib.Path(p).unlink(missing_ok=True)
+            if result.pdf_path and os.path.exists(result.pdf_path):
+                await get_file_cache().send_document(bot, uid, result.pdf_path)
         except Exception:
-            pass
+            logger.exception("%s SEND PDF failed user=%s year=%s week=%s", tag, uid, year, week)
+            await bot.send_message(chat_id=uid, text=T(update, "err"))
+            return
 
-    await bot.send_message(chat_id=uid, text=T(update, "done"), reply_markup=_kb(update))
-    await _send_media_to_chat_if_exists(context, uid, STICKER_DONE)
+        logger.info("%s success user=%s year=%s week=%s pdf=%s", tag, uid, year, week, result.pdf_path)
+        await bot.send_message(chat_id=uid, text=T(update, "done"), reply_markup=_kb(update))
+        await _send_media_to_chat_if_exists(context, uid, STICKER_DONE)
+
+    ticket = await REPORT_QUEUE.submit(uid, uid, report_type, year, week, on_start=on_start, on_done=on_done, source=tag)
+    if ticket.position > 1:
+        await safe_edit(
+            status_msg,
+            T(update, "gen_title", y=year, w=week, step=T(update, "queued", pos=ticket.position)),
+        )
 
 
 async def on_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -872,7 +845,6 @@ def main():
     # no local web server, no Excel report generation from bot runtime.
     logger.info("Starting bot (Mini App only mode)...")
     logger.info(f"WEBAPP_URL: {WEBAPP_URL or 'not configured'}")
-    logger.info(f"Whitelist users: {len(_whitelist())}")
     logger.info(f"HEARTBEAT_PATH: {HEARTBEAT_PATH}")
     logger.info(f"HEARTBEAT_INTERVAL_SEC: {HEARTBEAT_INTERVAL_SEC}")
     if WEBAPP_URL and not WEBAPP_URL.lower().startswith("https://"):
@@ -884,6 +856,11 @@ def main():
         await app.initialize()
         heartbeat_task = None
         try:
+            # initialize() does not run post_init; only run_polling() would.
+            try:
+                await _post_init(app)
+            except Exception:
+                logger.exception("post_init failed; continuing startup")
             await app.start()
             await app.updater.start_polling(drop_pending_updates=True)
             _touch_heartbeat_file()
@@ -901,9 +878,14 @@ def main():
                     await heartbeat_task
                 except asyncio.CancelledError:
                     pass
+            whitelist_task = app.bot_data.pop("whitelist_task", None)
+            if whitelist_task is not None:
+                whitelist_task.cancel()
             await app.updater.stop()
             await app.stop()
             await app.shutdown()
+            await REPORT_QUEUE.close()
+            await db_pool.close_pool()
             logger.info("Bot shutdown complete.")
 
     try:
@@ -13,11 +13,12 @@ import time
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from urllib import parse, request
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 
+from telegram_sender import post_telegram
+
 
 BASE_DIR = Path(__file__).resolve().parent
 LOG_FILE = BASE_DIR / "driver_birthdays.log"
@@ -141,15 +142,7 @@ def _send_telegram(text: str) -> None:
         _log("WARN: TELEGRAM_BOT_TOKEN or chat id is empty, skip notification")
         return
 
-    payload = parse.urlencode({"chat_id": chat_id, "text": text}).encode("utf-8")
-    req = request.Request(
-        url=f"https://api.telegram.org/bot{token}/sendMessage",
-        data=payload,
-        method="POST",
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-    )
-    with request.urlopen(req, timeout=20) as resp:
-        resp.read()
+    post_telegram(token, "sendMessage", {"chat_id": chat_id, "text": text})
 
 
 def _truck_label(external_id: str | None, plate_number: str | None) -> str:
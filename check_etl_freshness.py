@@ -1,7 +1,7 @@
 """
 ETL schedule monitor.
 
-Checks successful ETL imports in etl_log and notifies the admin if the hourly
+Checks successful ETL imports (etl_source_status) and notifies the admin if the hourly
 weekday schedule is not being met. Designed for Windows Task Scheduler.
 """
 
@@ -13,11 +13,13 @@ import subprocess
 import time
 from datetime import datetime, time as dtime, timezone
 from pathlib import Path
-from urllib import parse, request
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 
+import etl_db
+from telegram_sender import post_telegram
+
 
 BASE_DIR = Path(__file__).resolve().parent
 LOG_FILE = BASE_DIR / "etl_freshness.log"
@@ -96,15 +98,7 @@ def _send_telegram(text: str) -> None:
     if not token or not admin_chat_id:
         _log("WARN: TELEGRAM_BOT_TOKEN is empty, skip notification")
         return
-    payload = parse.urlencode({"chat_id": admin_chat_id, "text": text}).encode("utf-8")
-    req = request.Request(
-        url=f"https://api.telegram.org/bot{token}/sendMessage",
-        data=payload,
-        method="POST",
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-    )
-    with request.urlopen(req, timeout=20) as resp:
-        resp.read()
+    post_telegram(token, "sendMessage", {"chat_id": admin_chat_id, "text": text})
 
 
 def _remediation_task_name() -> str:
@@ -204,19 +198,7 @@ def _get_last_success_by_source() -> dict[str, datetime | None]:
 
     with psycopg.connect(db_url) as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT DISTINCT ON (source_name)
-                    source_name,
-                    COALESCE(finished_at, started_at) AS import_ts
-                FROM etl_log
-                WHERE status = 'success'
-                  AND source_name = ANY(%s)
-                ORDER BY source_name, COALESCE(finished_at, started_at) DESC
-                """,
-                (list(SOURCE_SPECS.keys()),),
-            )
-            rows = cur.fetchall()
+            rows = etl_db.fetch_last_success(cur, list(SOURCE_SPECS.keys()))
 
     result: dict[str, datetime | None] = {source: None for source in SOURCE_SPECS}
     for source_name, import_ts in rows:
@@ -0,0 +1,72 @@
+"""
+Process-wide async PostgreSQL pool for the bot and the Mini App web server.
+
+Opened once from bot._post_init (or start_web_server when the web server
+runs on its own). Connections are opened in the background, checked before
+being handed out and recycled after DB_POOL_MAX_IDLE_SEC idle /
+DB_POOL_MAX_LIFETIME_SEC total, so request handlers never pay a TLS
+handshake to Neon.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+
+logger = logging.getLogger("lkw_report_bot.db")
+
+_pool = None
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def get_pool():
+    """The open pool, or None when DATABASE_URL is unset or the pool could not be created."""
+    return _pool
+
+
+async def open_pool(db_url: str | None = None):
+    """Idempotent: returns the existing pool when one is already open."""
+    global _pool
+    if _pool is not None:
+        return _pool
+    db_url = (db_url if db_url is not None else os.getenv("DATABASE_URL", "") or "").strip()
+    if not db_url:
+        return None
+    try:
+        from psycopg_pool import AsyncConnectionPool  # type: ignore
+    except Exception:
+        logger.exception("psycopg_pool is not installed; DB access from the bot is disabled")
+        return None
+
+    min_size = max(1, int(_env_float("DB_POOL_MIN_SIZE", 1)))
+    pool = AsyncConnectionPool(
+        db_url,
+        min_size=min_size,
+        max_size=max(min_size, int(_env_float("DB_POOL_MAX_SIZE", 4))),
+        max_idle=_env_float("DB_POOL_MAX_IDLE_SEC", 300),
+        max_lifetime=_env_float("DB_POOL_MAX_LIFETIME_SEC", 1800),
+        timeout=_env_float("DB_POOL_TIMEOUT_SEC", 10),
+        check=AsyncConnectionPool.check_connection,
+        name="lkw_report_bot",
+        open=False,
+    )
+    # wait=False: connections are established by the pool's workers, startup never blocks on Neon.
+    await pool.open(wait=False)
+    _pool = pool
+    logger.info("DB pool opened (min_size=%s max_size=%s)", pool.min_size, pool.max_size)
+    return pool
+
+
+async def close_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
+        logger.info("DB pool closed")
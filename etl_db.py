@@ -0,0 +1,265 @@
+"""
+Shared DB helpers for the ETL scripts.
+
+Per-row write paths (company upserts, staging inserts, the swap + etl_log
+tail of a run) go through psycopg3 pipeline mode with server-side prepared
+statements, so N statements cost roughly one network round trip instead of N
+(figures in benchmarks/bench_db_batch.py).
+
+etl_source_status keeps one row per source with its latest successful
+import, written in the same transaction as the etl_log success row, so
+freshness readers do not scan etl_log.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Sequence
+
+
+BATCH_MODE_PIPELINE = "pipeline"
+BATCH_MODE_ROWS = "rows"
+BATCH_MODES = (BATCH_MODE_PIPELINE, BATCH_MODE_ROWS)
+
+
+def pipeline_supported() -> bool:
+    try:
+        from psycopg import Pipeline  # type: ignore
+    except Exception:
+        return False
+    return bool(Pipeline.is_supported())
+
+
+def execute_batch(
+    cur,
+    query: str,
+    params_seq: Iterable[Sequence[object]],
+    returning: bool = False,
+    mode: str = BATCH_MODE_PIPELINE,
+) -> list[tuple | None] | int:
+    """
+    Runs query once per params tuple.
+
+    pipeline: cursor.executemany inside conn.pipeline(); psycopg prepares the
+    statement server-side and streams all executions before one sync.
+    rows: plain execute per row (one round trip each; kept as the baseline).
+
+    returning=True returns the first result row of every execution (None if
+    it returned nothing), otherwise the total rowcount.
+    """
+    params_seq = list(params_seq)
+    if mode not in BATCH_MODES:
+        raise ValueError(f"Unknown batch mode: {mode!r} (expected one of {', '.join(BATCH_MODES)})")
+    if not params_seq:
+        return [] if returning else 0
+
+    if mode == BATCH_MODE_ROWS:
+        results: list[tuple | None] = []
+        count = 0
+        for params in params_seq:
+            cur.execute(query, params)
+            if returning:
+                results.append(cur.fetchone())
+            else:
+                count += max(cur.rowcount, 0)
+        return results if returning else count
+
+    if pipeline_supported():
+        with cur.connection.pipeline():
+            cur.executemany(query, params_seq, returning=returning)
+    else:
+        # libpq < 14: executemany still prepares the statement, just without pipelining.
+        cur.executemany(query, params_seq, returning=returning)
+    if not returning:
+        return max(cur.rowcount, 0)
+    results = []
+    while True:
+        results.append(cur.fetchone())
+        if not cur.nextset():
+            break
+    return results
+
+
+def execute_pipelined(cur, statements: Iterable[tuple[str, Sequence[object] | None]]) -> list[int]:
+    """
+    Runs a fixed sequence of different statements in one pipeline (one sync)
+    and returns each statement's rowcount. Statements run in order inside the
+    caller's transaction; a failure aborts the rest like it would without a pipeline.
+    """
+    statements = list(statements)
+    if not statements:
+        return []
+    rowcounts: list[int] = []
+    if not pipeline_supported():
+        for query, params in statements:
+            cur.execute(query, params)
+            rowcounts.append(cur.rowcount)
+        return rowcounts
+
+    conn = cur.connection
+    cursors = []
+    with conn.pipeline():
+        for query, params in statements:
+            stmt_cur = conn.cursor()
+            stmt_cur.execute(query, params)
+            cursors.append(stmt_cur)
+    for stmt_cur in cursors:
+        rowcounts.append(stmt_cur.rowcount)
+        stmt_cur.close()
+    return rowcounts
+
+
+@contextmanager
+def connection(psycopg, database_url: str, conn=None) -> Iterator:
+    """
+    Yields conn unchanged when the caller already holds one (in-process
+    pipeline; the caller owns and closes it), otherwise opens and closes a
+    new psycopg connection for the block.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with psycopg.connect(database_url) as own_conn:
+        yield own_conn
+
+
+def fetch_master_lookups(cur) -> dict[str, list[tuple]]:
+    """
+    Truck and driver rows the plan import resolves against:
+    trucks (id, external_id, company_id), drivers (id, full_name, external_id)
+    with active drivers first.
+    """
+    cur.execute("SELECT id, external_id, company_id FROM trucks")
+    trucks = [tuple(row) for row in cur.fetchall()]
+    cur.execute("SELECT id, full_name, external_id FROM drivers ORDER BY is_active DESC, id")
+    drivers = [tuple(row) for row in cur.fetchall()]
+    return {"trucks": trucks, "drivers": drivers}
+
+
+# etl_log source of run_etl_pipeline's per-run summary row. It is an
+# orchestration record, not an import source: it is never written to
+# etl_source_status and every reader excludes it.
+PIPELINE_SOURCE_NAME = "etl_pipeline"
+
+SOURCE_STATUS_DDL = """
+    CREATE TABLE IF NOT EXISTS etl_source_status (
+        source_name TEXT PRIMARY KEY,
+        last_success_at TIMESTAMPTZ NOT NULL,
+        etl_log_id BIGINT REFERENCES etl_log(id) ON DELETE SET NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+"""
+
+# One-time backfill from etl_log history; the NOT EXISTS is a one-time
+# filter, so once the table has rows this costs nothing.
+SOURCE_STATUS_BACKFILL_SQL = """
+    INSERT INTO etl_source_status (source_name, last_success_at, etl_log_id)
+    SELECT DISTINCT ON (source_name) source_name, COALESCE(finished_at, started_at), id
+    FROM etl_log
+    WHERE status = 'success'
+      AND source_name <> '{pipeline}'
+      AND NOT EXISTS (SELECT 1 FROM etl_source_status)
+    ORDER BY source_name, COALESCE(finished_at, started_at) DESC, id DESC
+    ON CONFLICT (source_name) DO NOTHING
+""".format(pipeline=PIPELINE_SOURCE_NAME)
+
+# Earlier versions also upserted the pipeline summary here; it lives in etl_log only.
+SOURCE_STATUS_CLEANUP_SQL = f"DELETE FROM etl_source_status WHERE source_name = '{PIPELINE_SOURCE_NAME}'"
+
+SOURCE_STATUS_UPSERT_SQL = """
+    INSERT INTO etl_source_status (source_name, last_success_at, etl_log_id, updated_at)
+    SELECT source_name, COALESCE(finished_at, started_at, NOW()), id, NOW()
+    FROM etl_log
+    WHERE id = %s AND status = 'success'
+    ON CONFLICT (source_name) DO UPDATE SET
+        last_success_at = EXCLUDED.last_success_at,
+        etl_log_id = {etl_log_id},
+        updated_at = NOW()
+    WHERE etl_source_status.last_success_at <= EXCLUDED.last_success_at
+"""
+
+# Highest etl_log id that loaded data (any source): moves whenever imported data may have changed.
+DATA_VERSION_SQL = (
+    f"SELECT COALESCE(MAX(etl_log_id), 0) FROM etl_source_status WHERE source_name <> '{PIPELINE_SOURCE_NAME}'"
+)
+
+# Latest successful row per source, as read by run_etl_pipeline.StepCache and
+# the backfill above; the partial index keeps those reads off the full log.
+ETL_LOG_SUCCESS_INDEX_DDL = """
+    CREATE INDEX IF NOT EXISTS idx_etl_log_source_success
+    ON etl_log (source_name, (COALESCE(finished_at, started_at)) DESC, id DESC)
+    WHERE status = 'success'
+"""
+
+_UNDEFINED_TABLE = "42P01"
+
+
+def ensure_source_status_table(cur) -> None:
+    cur.execute(SOURCE_STATUS_DDL)
+    cur.execute(SOURCE_STATUS_BACKFILL_SQL)
+    cur.execute(SOURCE_STATUS_CLEANUP_SQL)
+    cur.execute(ETL_LOG_SUCCESS_INDEX_DDL)
+
+
+def source_status_statement(log_id: int, loaded: bool = True) -> tuple[str, tuple[int]]:
+    """
+    Upsert of etl_source_status from a finished etl_log row. Run it in the
+    transaction that marks the row 'success' (alone or inside
+    execute_pipelined) so readers never see one without the other.
+
+    etl_log_id tracks the run that last loaded data; loaded=False (a step
+    skipped because its inputs did not change) only moves last_success_at.
+    """
+    etl_log_id = "EXCLUDED.etl_log_id" if loaded else "etl_source_status.etl_log_id"
+    return SOURCE_STATUS_UPSERT_SQL.format(etl_log_id=etl_log_id), (log_id,)
+
+
+def record_source_success(cur, log_id: int, loaded: bool = True) -> None:
+    cur.execute(*source_status_statement(log_id, loaded))
+
+
+def _last_success_queries(source_names: Sequence[str] | None) -> tuple[str, str, tuple | None]:
+    if source_names is not None:
+        where, params = "WHERE source_name = ANY(%s)", (list(source_names),)
+    else:
+        where, params = "WHERE source_name <> %s", (PIPELINE_SOURCE_NAME,)
+    status_sql = f"SELECT source_name, last_success_at FROM etl_source_status {where}"
+    fallback_sql = f"""
+        SELECT DISTINCT ON (source_name) source_name, COALESCE(finished_at, started_at)
+        FROM etl_log
+        WHERE status = 'success' {where.replace('WHERE', 'AND')}
+        ORDER BY source_name, COALESCE(finished_at, started_at) DESC
+    """
+    return status_sql, fallback_sql, params
+
+
+def fetch_last_success(cur, source_names: Sequence[str] | None = None) -> list[tuple]:
+    """
+    (source_name, last_success_at) per source from etl_source_status: one
+    primary-key row each, independent of how long etl_log has grown.
+    Falls back to scanning etl_log while the table does not exist yet.
+    """
+    status_sql, fallback_sql, params = _last_success_queries(source_names)
+    try:
+        cur.execute(status_sql, params)
+        return [tuple(row) for row in cur.fetchall()]
+    except Exception as exc:
+        if getattr(exc, "sqlstate", None) != _UNDEFINED_TABLE:
+            raise
+        cur.connection.rollback()
+    cur.execute(fallback_sql, params)
+    return [tuple(row) for row in cur.fetchall()]
+
+
+async def fetch_last_success_async(cur, source_names: Sequence[str] | None = None) -> list[tuple]:
+    """fetch_last_success for a psycopg AsyncCursor (bot / web server pool)."""
+    status_sql, fallback_sql, params = _last_success_queries(source_names)
+    try:
+        await cur.execute(status_sql, params)
+        return [tuple(row) for row in await cur.fetchall()]
+    except Exception as exc:
+        if getattr(exc, "sqlstate", None) != _UNDEFINED_TABLE:
+            raise
+        await cur.connection.rollback()
+    await cur.execute(fallback_sql, params)
+    return [tuple(row) for row in await cur.fetchall()]
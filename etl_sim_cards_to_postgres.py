@@ -21,6 +21,9 @@ from pathlib import Path
 from dotenv import load_dotenv
 import openpyxl
 
+import etl_db
+from xlsx_package import SheetGrid
+
 
 BASE_DIR = Path(__file__).resolve().parent
 DEFAULT_SIM_CARDS_PATH = Path(
@@ -89,12 +92,12 @@ class VodafoneRow:
 
 
 def extract_contado_rows(wb) -> list[ContadoRow]:
-    ws = wb[CONTADO_SHEET]
+    grid = SheetGrid(wb[CONTADO_SHEET], min_row=2, max_col=5)
     by_lkw: dict[str, ContadoRow] = {}
-    for row_idx in range(2, ws.max_row + 1):
-        lkw_number = _clean_text(ws.cell(row_idx, 2).value)
-        name = _clean_text(ws.cell(row_idx, 3).value)
-        password = _clean_text(ws.cell(row_idx, 5).value)
+    for row_idx, _ in grid.iter_rows():
+        lkw_number = _clean_text(grid.value(row_idx, 2))
+        name = _clean_text(grid.value(row_idx, 3))
+        password = _clean_text(grid.value(row_idx, 5))
         if not lkw_number:
             continue
         key = _norm_lkw(lkw_number)
@@ -110,12 +113,12 @@ def extract_contado_rows(wb) -> list[ContadoRow]:
 
 
 def extract_vodafone_rows(wb) -> list[VodafoneRow]:
-    ws = wb[VODAFONE_SHEET]
+    grid = SheetGrid(wb[VODAFONE_SHEET], min_row=2, max_col=10)
     by_lkw: dict[str, VodafoneRow] = {}
-    for row_idx in range(2, ws.max_row + 1):
-        lkw_number = _clean_text(ws.cell(row_idx, 5).value)
-        pin = _clean_text(ws.cell(row_idx, 9).value)
-        puk = _clean_text(ws.cell(row_idx, 10).value)
+    for row_idx, _ in grid.iter_rows():
+        lkw_number = _clean_text(grid.value(row_idx, 5))
+        pin = _clean_text(grid.value(row_idx, 9))
+        puk = _clean_text(grid.value(row_idx, 10))
         if not lkw_number:
             continue
         key = _norm_lkw(lkw_number)
@@ -172,13 +175,13 @@ def _ensure_vodafone_table(cur) -> None:
     )
 
 
-def run_etl(database_url: str, source_path: Path) -> dict[str, int]:
+def run_etl(database_url: str, source_path: Path, conn=None) -> dict[str, int]:
     psycopg = _lazy_import_psycopg()
     created_copy = False
     readable_path = source_path
     log_id = None
 
-    with psycopg.connect(database_url) as conn:
+    with etl_db.connection(psycopg, database_url, conn) as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -189,6 +192,7 @@ def run_etl(database_url: str, source_path: Path) -> dict[str, int]:
                 ("xlsx_sim_cards", json.dumps({"source_path": str(source_path)}, ensure_ascii=False)),
             )
             log_id = int(cur.fetchone()[0])
+            etl_db.ensure_source_status_table(cur)
         conn.commit()
 
         try:
@@ -216,14 +220,15 @@ def run_etl(database_url: str, source_path: Path) -> dict[str, int]:
                     """
                 )
 
-                for row in contado_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_sim_contado (
-                            lkw_number, sim_name, password, source_row, raw_payload, updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
+                etl_db.execute_batch(
+                    cur,
+                    """
+                    INSERT INTO tmp_report_sim_contado (
+                        lkw_number, sim_name, password, source_row, raw_payload, updated_at
+                    )
+                    VALUES (%s, %s, %s, %s, %s::jsonb, NOW())
+                    """,
+                    [
                         (
                             row.lkw_number,
                             row.name,
@@ -238,17 +243,20 @@ def run_etl(database_url: str, source_path: Path) -> dict[str, int]:
                                 },
                                 ensure_ascii=False,
                             ),
-                        ),
-                    )
-
-                for row in vodafone_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_sim_vodafone (
-                            lkw_number, pin, puk, source_row, raw_payload, updated_at
                         )
-                        VALUES (%s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
+                        for row in contado_rows
+                    ],
+                )
+
+                etl_db.execute_batch(
+                    cur,
+                    """
+                    INSERT INTO tmp_report_sim_vodafone (
+                        lkw_number, pin, puk, source_row, raw_payload, updated_at
+                    )
+                    VALUES (%s, %s, %s, %s, %s::jsonb, NOW())
+                    """,
+                    [
                         (
                             row.lkw_number,
                             row.pin,
@@ -263,35 +271,43 @@ def run_etl(database_url: str, source_path: Path) -> dict[str, int]:
                                 },
                                 ensure_ascii=False,
                             ),
-                        ),
-                    )
-
-                cur.execute("DELETE FROM report_sim_contado")
-                cur.execute("INSERT INTO report_sim_contado SELECT * FROM tmp_report_sim_contado")
-                cur.execute("DELETE FROM report_sim_vodafone")
-                cur.execute("INSERT INTO report_sim_vodafone SELECT * FROM tmp_report_sim_vodafone")
+                        )
+                        for row in vodafone_rows
+                    ],
+                )
 
-                cur.execute(
-                    """
-                    UPDATE etl_log
-                    SET status = 'success',
-                        finished_at = NOW(),
-                        rows_inserted = %s,
-                        details = %s::jsonb
-                    WHERE id = %s
-                    """,
-                    (
-                        len(contado_rows) + len(vodafone_rows),
-                        json.dumps(
-                            {
-                                "workbook_used": str(readable_path),
-                                "contado_rows": len(contado_rows),
-                                "vodafone_rows": len(vodafone_rows),
-                            },
-                            ensure_ascii=False,
+                # Swap + etl_log success + source status in a single round trip.
+                etl_db.execute_pipelined(
+                    cur,
+                    [
+                        ("DELETE FROM report_sim_contado", None),
+                        ("INSERT INTO report_sim_contado SELECT * FROM tmp_report_sim_contado", None),
+                        ("DELETE FROM report_sim_vodafone", None),
+                        ("INSERT INTO report_sim_vodafone SELECT * FROM tmp_report_sim_vodafone", None),
+                        (
+                            """
+                            UPDATE etl_log
+                            SET status = 'success',
+                                finished_at = NOW(),
+                                rows_inserted = %s,
+                                details = %s::jsonb
+                            WHERE id = %s
+                            """,
+                            (
+                                len(contado_rows) + len(vodafone_rows),
+                                json.dumps(
+                                    {
+                                        "workbook_used": str(readable_path),
+                                        "contado_rows": len(contado_rows),
+                                        "vodafone_rows": len(vodafone_rows),
+                                    },
+                                    ensure_ascii=False,
+                                ),
+                                log_id,
+                            ),
                         ),
-                        log_id,
-                    ),
+                        etl_db.source_status_statement(log_id),
+                    ],
                 )
             conn.commit()
             return {
@@ -332,13 +348,15 @@ def run_etl(database_url: str, source_path: Path) -> dict[str, int]:
                     pass
 
 
-def main() -> int:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Import SIM card workbook into PostgreSQL")
     parser.add_argument("--database-url", default="", help="Override DATABASE_URL from env")
     parser.add_argument("--source", default="", help="Override SIM_CARDS_FILE_PATH / default path")
-    args = parser.parse_args()
+    return parser.parse_args(argv)
 
-    load_dotenv(BASE_DIR / ".env", override=True)
+
+def run_kwargs(args: argparse.Namespace) -> dict[str, object]:
+    """run_etl keyword arguments from CLI args with env fallbacks (call after load_dotenv)."""
     database_url = (args.database_url or os.getenv("DATABASE_URL", "")).strip()
     if not database_url:
         raise RuntimeError("DATABASE_URL is empty. Set it in .env or pass --database-url.")
@@ -349,7 +367,13 @@ def main() -> int:
     if not source_path.exists():
         raise FileNotFoundError(f"SIM cards workbook not found: {source_path}")
 
-    result = run_etl(database_url, source_path)
+    return {"database_url": database_url, "source_path": source_path}
+
+
+def main() -> int:
+    args = parse_args()
+    load_dotenv(BASE_DIR / ".env", override=True)
+    result = run_etl(**run_kwargs(args))
     print(
         "ETL success: "
         f"contado_rows={result['contado_rows']} "
@@ -1,23 +1,41 @@
 """
-ETL source watcher (polling mode).
+ETL source watcher.
 
-Run periodically from Task Scheduler:
+Polling mode (default), run periodically from Task Scheduler:
 - Detects changes in source Excel files by (mtime, size)
 - Waits until changes are stable for ETL_WATCH_SETTLE_SECONDS
 - Triggers run_etl_pipeline_task.cmd once per change set
+
+Daemon mode (--daemon), long-running:
+- Filesystem change notifications (inotify on Linux, directory change
+  notifications on Windows, polling every ETL_WATCH_POLL_SECONDS otherwise
+  or with ETL_WATCH_BACKEND=polling)
+- Debounces each file for ETL_WATCH_SETTLE_SECONDS, then requires a stable
+  size/mtime and a successful lock probe
+- Runs run_etl_pipeline.py --steps with only the steps consuming the changed
+  files (plus their dependents), so latency is the settle window plus ETL time
 """
 
 from __future__ import annotations
 
+import argparse
 import json
 import os
+import select
+import struct
 import subprocess
+import sys
 import time
+import zipfile
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, Iterable
 
 from dotenv import load_dotenv
 
+import xlsx_package
+from xlsx_package import content_fingerprint
+
 
 BASE_DIR = Path(__file__).resolve().parent
 LOG_FILE = BASE_DIR / "etl_watch.log"
@@ -85,7 +103,7 @@ def _to_int(name: str, default: int) -> int:
         return default
 
 
-def _resolve_sources() -> dict[str, Path]:
+def resolve_sources() -> dict[str, Path]:
     xlsm_path = _env_path("EXCEL_FILE_PATH")
     if xlsm_path is None:
         raise RuntimeError("EXCEL_FILE_PATH is empty")
@@ -105,7 +123,21 @@ def _resolve_sources() -> dict[str, Path]:
     }
 
 
-def _collect_signature(sources: dict[str, Path]) -> dict:
+# Zip members that can change the ETL result (same set as the per-sheet
+# fingerprints). docProps/, calcChain and the container itself, which Excel
+# rewrites on a plain open+save or an AutoSave, are ignored.
+FINGERPRINT_ZIP_PARTS = xlsx_package.EXTRACTION_PART_PREFIXES
+SIGNATURE_VERSION = 3
+
+
+def _collect_signature(sources: dict[str, Path], previous: dict | None = None) -> dict:
+    """
+    previous is the "files" mapping of the last signature: its fingerprint
+    is reused while path, size and mtime match, so an unchanged file costs
+    one stat. The hash is built from fingerprints, so a save that only
+    bumps mtime does not count as a change.
+    """
+    previous = previous or {}
     files: dict[str, dict[str, int | str | bool]] = {}
     all_exist = True
     for logical_name, path in sources.items():
@@ -117,28 +149,42 @@ def _collect_signature(sources: dict[str, Path]) -> dict:
                 "exists": False,
                 "size": 0,
                 "mtime_ns": 0,
+                "fingerprint": "",
             }
             continue
 
         st = path.stat()
-        files[logical_name] = {
+        meta: dict[str, int | str | bool] = {
             "path": str(path),
             "exists": True,
             "size": int(st.st_size),
             "mtime_ns": int(st.st_mtime_ns),
         }
+        prev = previous.get(logical_name) or {}
+        if prev.get("fingerprint") and all(prev.get(k) == meta[k] for k in ("path", "size", "mtime_ns")):
+            meta["fingerprint"] = prev["fingerprint"]
+        else:
+            try:
+                meta["fingerprint"] = content_fingerprint(path)
+            except (OSError, ValueError, zipfile.BadZipFile):
+                # Mid-write or locked: fall back to stat so the change is still noticed.
+                meta["fingerprint"] = f"stat:{meta['size']}:{meta['mtime_ns']}"
+        files[logical_name] = meta
 
-    canonical = "|".join(
-        f"{name}:{meta['path']}:{meta['exists']}:{meta['size']}:{meta['mtime_ns']}"
-        for name, meta in sorted(files.items(), key=lambda x: x[0])
-    )
     return {
         "all_exist": all_exist,
         "files": files,
-        "hash": canonical,
+        "hash": _signature_hash(files),
     }
 
 
+def _signature_hash(files: dict[str, dict]) -> str:
+    return "|".join(
+        f"{name}:{meta['path']}:{meta['exists']}:{meta['fingerprint']}"
+        for name, meta in sorted(files.items(), key=lambda x: x[0])
+    )
+
+
 def _run_pipeline() -> tuple[int, str, str]:
     task_cmd = BASE_DIR / "run_etl_pipeline_task.cmd"
     if not task_cmd.exists():
@@ -153,13 +199,403 @@ def _run_pipeline() -> tuple[int, str, str]:
     return cp.returncode, (cp.stdout or "").strip(), (cp.stderr or "").strip()
 
 
-def main() -> int:
+# --- daemon mode -------------------------------------------------------------
+
+WATCH_BACKEND_AUTO = "auto"
+WATCH_BACKEND_INOTIFY = "inotify"
+WATCH_BACKEND_WINDOWS = "windows"
+WATCH_BACKEND_POLLING = "polling"
+WATCH_BACKENDS = (WATCH_BACKEND_AUTO, WATCH_BACKEND_INOTIFY, WATCH_BACKEND_WINDOWS, WATCH_BACKEND_POLLING)
+
+
+def _path_key(path: Path) -> str:
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
+def _stat_key(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return int(st.st_size), int(st.st_mtime_ns)
+
+
+def is_write_complete(path: Path) -> bool:
+    """
+    Lock probe: False while another process still holds the file for writing
+    (Windows sharing violation on a read/write open; an exclusive flock elsewhere).
+    """
+    try:
+        if os.name == "nt":
+            fd = os.open(str(path), os.O_RDWR | getattr(os, "O_BINARY", 0))
+            os.close(fd)
+            return True
+        import fcntl
+
+        with open(path, "rb") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return True
+    except OSError:
+        return False
+
+
+class PollingBackend:
+    """Stats the watched files every poll_sec; works everywhere, including network shares."""
+
+    name = WATCH_BACKEND_POLLING
+
+    def __init__(self, paths: Iterable[Path], poll_sec: float = 5.0):
+        self.paths = list(paths)
+        self.poll_sec = poll_sec
+        self._last = {_path_key(p): _stat_key(p) for p in self.paths}
+
+    def wait(self, timeout: float) -> set[str]:
+        time.sleep(max(0.0, min(timeout, self.poll_sec)))
+        changed = set()
+        for path in self.paths:
+            key = _path_key(path)
+            current = _stat_key(path)
+            if current != self._last.get(key):
+                self._last[key] = current
+                changed.add(key)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyBackend:
+    """
+    Linux inotify through libc. Watches the parent directories, because
+    Excel saves via a temp file that is renamed over the original.
+    """
+
+    name = WATCH_BACKEND_INOTIFY
+    _MASK = 0x00000002 | 0x00000004 | 0x00000008 | 0x00000080 | 0x00000100  # MODIFY|ATTRIB|CLOSE_WRITE|MOVED_TO|CREATE
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, paths: Iterable[Path]):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched = {_path_key(p) for p in paths}
+        self._dirs: dict[int, Path] = {}
+        for directory in {Path(p).parent for p in paths}:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), self._MASK)
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self._dirs[wd] = directory
+
+    def wait(self, timeout: float) -> set[str]:
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, _mask, _cookie, name_len = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            key = _path_key(directory / os.fsdecode(name))
+            if key in self._watched:
+                changed.add(key)
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class WindowsBackend:
+    """
+    Directory change notifications via pywin32 (FindFirstChangeNotification).
+    A signalled directory is re-stat'ed to find which watched file changed.
+    """
+
+    name = WATCH_BACKEND_WINDOWS
+
+    def __init__(self, paths: Iterable[Path]):
+        import win32con  # type: ignore
+        import win32event  # type: ignore
+        import win32file  # type: ignore
+
+        self._win32event = win32event
+        self._win32file = win32file
+        self.paths = list(paths)
+        self._last = {_path_key(p): _stat_key(p) for p in self.paths}
+        flags = (
+            win32con.FILE_NOTIFY_CHANGE_FILE_NAME
+            | win32con.FILE_NOTIFY_CHANGE_SIZE
+            | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE
+        )
+        self._handles = []
+        self._dir_paths: list[list[Path]] = []
+        for directory in sorted({p.parent for p in self.paths}, key=str):
+            self._handles.append(win32file.FindFirstChangeNotification(str(directory), False, flags))
+            self._dir_paths.append([p for p in self.paths if p.parent == directory])
+
+    def wait(self, timeout: float) -> set[str]:
+        result = self._win32event.WaitForMultipleObjects(self._handles, False, int(max(0.0, timeout) * 1000))
+        if result == self._win32event.WAIT_TIMEOUT:
+            return set()
+        index = result - self._win32event.WAIT_OBJECT_0
+        if not 0 <= index < len(self._handles):
+            return set()
+        self._win32file.FindNextChangeNotification(self._handles[index])
+        changed = set()
+        for path in self._dir_paths[index]:
+            key = _path_key(path)
+            current = _stat_key(path)
+            if current != self._last.get(key):
+                self._last[key] = current
+                changed.add(key)
+        return changed
+
+    def close(self) -> None:
+        for handle in self._handles:
+            try:
+                self._win32file.FindCloseChangeNotification(handle)
+            except Exception:
+                pass
+        self._handles = []
+
+
+def open_watch_backend(paths: list[Path], backend: str = WATCH_BACKEND_AUTO, poll_sec: float = 5.0):
+    """Native notifications where available, polling otherwise (or when requested)."""
+    if backend not in WATCH_BACKENDS:
+        raise ValueError(f"Unknown watch backend: {backend!r} (expected one of {', '.join(WATCH_BACKENDS)})")
+    candidates = []
+    if backend in (WATCH_BACKEND_AUTO, WATCH_BACKEND_INOTIFY) and sys.platform.startswith("linux"):
+        candidates.append(InotifyBackend)
+    if backend in (WATCH_BACKEND_AUTO, WATCH_BACKEND_WINDOWS) and os.name == "nt":
+        candidates.append(WindowsBackend)
+    for backend_cls in candidates:
+        try:
+            return backend_cls(paths)
+        except Exception as exc:
+            _log(f"watch_backend_unavailable={backend_cls.name} error={exc}")
+    return PollingBackend(paths, poll_sec=poll_sec)
+
+
+class FileDebouncer:
+    """
+    Per-file debounce. A file is ready once settle_sec passed since its last
+    change, its (size, mtime) did not move between two looks, and the lock
+    probe says the writer is done.
+    """
+
+    def __init__(
+        self,
+        sources: dict[str, Path],
+        settle_sec: float,
+        clock: Callable[[], float] = time.monotonic,
+        probe: Callable[[Path], bool] = is_write_complete,
+    ):
+        self.sources = dict(sources)
+        self.settle_sec = settle_sec
+        self._clock = clock
+        self._probe = probe
+        self._by_key = {_path_key(path): name for name, path in self.sources.items()}
+        self._pending: dict[str, tuple[float, tuple[int, int] | None]] = {}
+
+    @property
+    def pending(self) -> list[str]:
+        return sorted(self._pending)
+
+    def touch(self, path_key: str) -> str | None:
+        name = self._by_key.get(path_key)
+        if name is not None:
+            self._pending[name] = (self._clock(), _stat_key(self.sources[name]))
+        return name
+
+    def ready(self) -> list[str]:
+        now = self._clock()
+        done = []
+        for name, (changed_at, seen) in list(self._pending.items()):
+            if now - changed_at < self.settle_sec:
+                continue
+            path = self.sources[name]
+            current = _stat_key(path)
+            if current is None:
+                continue
+            if current != seen:
+                self._pending[name] = (now, current)
+                continue
+            if not self._probe(path):
+                continue
+            done.append(name)
+            del self._pending[name]
+        return sorted(done)
+
+    def requeue(self, names: Iterable[str]) -> None:
+        for name in names:
+            self._pending[name] = (self._clock() - self.settle_sec, _stat_key(self.sources[name]))
+
+
+def steps_for_files(file_names: Iterable[str]) -> list[str]:
+    from run_etl_pipeline import STEPS  # imported lazily: run_etl_pipeline imports this module
+
+    changed = set(file_names)
+    return [step.name for step in STEPS if changed & set(step.inputs)]
+
+
+def _run_pipeline_steps(steps: list[str]) -> tuple[int, str, str]:
+    py = BASE_DIR / ".venv" / "Scripts" / "python.exe"
+    if not py.exists():
+        py = Path(sys.executable)
+    cp = subprocess.run(
+        [str(py), str(BASE_DIR / "run_etl_pipeline.py"), "--steps", ",".join(steps)],
+        cwd=str(BASE_DIR),
+        capture_output=True,
+        text=True,
+    )
+    return cp.returncode, (cp.stdout or "").strip(), (cp.stderr or "").strip()
+
+
+def _pipeline_running() -> bool:
+    from run_etl_pipeline import LOCK_FILE, pipeline_lock_stale_reason, read_pipeline_lock
+
+    try:
+        lock_age_sec = time.time() - LOCK_FILE.stat().st_mtime
+    except OSError:
+        return False
+    info = read_pipeline_lock()
+    if not info and lock_age_sec < 60:
+        return True  # the runner is still writing its payload
+    reason = pipeline_lock_stale_reason(info, int(time.time()))
+    if not reason:
+        return True
+    # A crashed run leaves its lock behind; without this the daemon defers forever.
+    _log(f"pipeline_lock_stale=true reason={reason.replace(' ', '_')}")
+    if read_pipeline_lock() == info:
+        try:
+            LOCK_FILE.unlink(missing_ok=True)
+        except OSError:
+            pass
+    return False
+
+
+def run_daemon(
+    sources: dict[str, Path],
+    backend,
+    debouncer: FileDebouncer,
+    trigger: Callable[[list[str]], tuple[int, str, str]] = _run_pipeline_steps,
+    should_stop: Callable[[], bool] = lambda: False,
+    tick_sec: float = 5.0,
+    pipeline_running: Callable[[], bool] = _pipeline_running,
+) -> None:
+    """
+    Event loop: collect change notifications, and once changed files are
+    settled and unlocked, run only the pipeline steps consuming them.
+    """
+    state_path = _state_path()
+    while not should_stop():
+        timeout = tick_sec if debouncer.pending else max(tick_sec, 60.0)
+        for key in backend.wait(timeout):
+            name = debouncer.touch(key)
+            if name:
+                _log(f"change_event=true file={name}")
+        ready = debouncer.ready()
+        if not ready:
+            continue
+        state = _load_state(state_path)
+        known = state.get("files") or {}
+        signature = _collect_signature(sources, known)
+        unchanged = [
+            name for name in ready
+            if known.get(name, {}).get("fingerprint") == signature["files"][name]["fingerprint"]
+        ]
+        if unchanged:
+            _log(f"content_unchanged=true files={','.join(unchanged)}")
+            # Remember the new mtime so the next look is a single stat again.
+            for name in unchanged:
+                known[name] = signature["files"][name]
+            state.update(files=known, last_checked_at=int(time.time()))
+            _save_state(state_path, state)
+            ready = [name for name in ready if name not in unchanged]
+        steps = steps_for_files(ready)
+        if not steps:
+            continue
+        if pipeline_running():
+            _log(f"trigger_deferred=true reason=pipeline_running files={','.join(ready)}")
+            debouncer.requeue(ready)
+            continue
+
+        _log(f"trigger_etl=true reason=source_changed files={','.join(ready)} steps={','.join(steps)}")
+        rc, out, err = trigger(steps)
+        if out:
+            _log(f"etl_stdout={out[:1000]}")
+        if err:
+            _log(f"etl_stderr={err[:1000]}")
+        _log(f"trigger_etl_ok={'true' if rc == 0 else 'false'} rc={rc}")
+
+        # Keep the polling-mode state in sync so switching modes does not re-trigger.
+        # Fingerprints are only stored after a successful run, so a failed
+        # run is retried on the next save even if the content is the same.
+        # Only the files this run consumed are recorded: a file still
+        # settling in the debouncer keeps its old entry and triggers later.
+        state = _load_state(state_path)
+        now = int(time.time())
+        state.update(last_checked_at=now, last_trigger_at=now, last_run_rc=rc)
+        if rc == 0:
+            files = dict(state.get("files") or {})
+            for name in ready:
+                files[name] = signature["files"][name]
+            files_hash = _signature_hash(files)
+            state.update(last_seen_hash=files_hash, files=files)
+            state.update(last_triggered_hash=files_hash, last_change_at=0)
+            state["signature_version"] = SIGNATURE_VERSION
+        _save_state(state_path, state)
+
+
+def main_daemon() -> int:
+    settle_sec = _to_int("ETL_WATCH_SETTLE_SECONDS", 90)
+    poll_sec = _to_int("ETL_WATCH_POLL_SECONDS", 5)
+    backend_name = (os.getenv("ETL_WATCH_BACKEND") or WATCH_BACKEND_AUTO).strip().lower()
+    sources = resolve_sources()
+    backend = open_watch_backend(list(sources.values()), backend_name, poll_sec=poll_sec)
+    _log(f"watcher_daemon_start=true backend={backend.name} settle_sec={settle_sec}")
+    try:
+        run_daemon(sources, backend, FileDebouncer(sources, settle_sec), tick_sec=min(poll_sec, settle_sec))
+    except KeyboardInterrupt:
+        _log("watcher_daemon_stop=true")
+    finally:
+        backend.close()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Trigger the ETL pipeline when source workbooks change.")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run continuously on filesystem change notifications instead of one polling pass",
+    )
+    args = parser.parse_args(argv)
+
     load_dotenv(BASE_DIR / ".env", override=True)
     _rotate_log()
 
     if str(os.getenv("ETL_WATCH_ENABLED", "true")).strip().lower() in {"0", "false", "no", "off"}:
         _log("watcher_disabled=true (ETL_WATCH_ENABLED=false)")
         return 0
+    if args.daemon:
+        return main_daemon()
 
     settle_sec = _to_int("ETL_WATCH_SETTLE_SECONDS", 90)
     min_interval_sec = _to_int("ETL_WATCH_MIN_INTERVAL_SECONDS", 600)
@@ -167,9 +603,11 @@ def main() -> int:
     state = _load_state(state_path)
     now = int(time.time())
 
-    sources = _resolve_sources()
-    signature = _collect_signature(sources)
+    sources = resolve_sources()
+    signature = _collect_signature(sources, state.get("files"))
     current_hash = str(signature["hash"])
+    prev_version = state.get("signature_version")
+    state["signature_version"] = SIGNATURE_VERSION
 
     last_seen_hash = str(state.get("last_seen_hash") or "")
     last_triggered_hash = str(state.get("last_triggered_hash") or "")
@@ -184,7 +622,9 @@ def main() -> int:
         _save_state(state_path, state)
         return 0
 
-    if not last_seen_hash:
+    settled = last_seen_hash == last_triggered_hash
+    if not last_seen_hash or (prev_version != SIGNATURE_VERSION and settled):
+        # First run, or the hash format changed while nothing was pending.
         state["last_seen_hash"] = current_hash
         state["last_triggered_hash"] = current_hash
         state["last_change_at"] = 0
@@ -4,8 +4,10 @@ ETL: LKW_Fahrer_Plan.xlsb -> PostgreSQL (Neon)
 Phase 1.4 MVP:
 - reads weekly assignments from sheet "Fahrer-Arbeitsplan"
 - maps truck IDs via trucks.external_id
-- best-effort maps driver names via drivers.full_name
-- replaces imported rows for this source in schedules
+- maps driver names via a per-run DriverResolver (full name, aliases,
+  initial + surname, surname) and logs match rate / ambiguous cells
+- diffs staged rows against schedules by source_row_hash: vanished cells are
+  deleted, new cells inserted, unchanged cells keep their id and etl_log_id
 - writes run metadata to etl_log
 """
 
@@ -20,13 +22,18 @@ import re
 import shutil
 import tempfile
 import time
+from collections import Counter
 from dataclasses import dataclass
 from datetime import date
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator
 
 from dotenv import load_dotenv
 from pyxlsb import open_workbook
 
+import etl_db
+
 
 PLAN_SHEET = "Fahrer-Arbeitsplan"
 STATUS_TOKENS = {
@@ -46,6 +53,30 @@ STATUS_TOKENS = {
     "andreas groo",
 }
 TRAILING_DRIVER_MARKERS = {"u", "k", "r", "of", "o.f.", "urlaub"}
+PLAN_START_COL = 5  # col F
+INSERT_CHUNK_ROWS = 5000
+
+
+TMP_SCHEDULES_INSERT_SQL = """
+    INSERT INTO tmp_schedules (
+        etl_log_id,
+        iso_year,
+        iso_week,
+        work_date,
+        company_id,
+        truck_id,
+        driver_id,
+        shift_code,
+        assignment_type,
+        source_sheet,
+        source_row_no,
+        source_row_hash,
+        raw_payload
+    )
+    VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb
+    )
+    """
 
 
 def _norm(value: object) -> str:
@@ -140,12 +171,167 @@ def _driver_candidates(assignment: str) -> list[str]:
     return candidates
 
 
-def _resolve_driver_id(assignment: str, driver_map: dict[str, int]) -> int | None:
-    for candidate in _driver_candidates(assignment):
-        matched = driver_map.get(candidate)
-        if matched is not None:
-            return matched
-    return None
+def _name_tokens(value: object) -> list[str]:
+    return [t.strip(".-") for t in _norm(value).split() if t.strip(".-")]
+
+
+MATCH_EXACT = "exact"
+MATCH_ALIAS = "alias"
+MATCH_REORDERED = "reordered"
+MATCH_INITIAL = "initial_surname"
+MATCH_SURNAME = "surname"
+MATCH_AMBIGUOUS = "ambiguous"
+MATCH_UNMATCHED = "unmatched"
+MAX_AMBIGUOUS_EXAMPLES = 20
+
+
+class DriverResolver:
+    """
+    Resolves free-text plan cells to driver ids through indexes built once per run:
+    normalized full name, known aliases, order-insensitive name tokens,
+    first-initial + surname, and surname. Every lookup is a dict hit per
+    candidate/token; a key shared by several drivers counts as ambiguous
+    instead of guessing. The surname level only accepts a bare surname or
+    one whose other tokens agree with the driver's given names/initials, so
+    "Ivan Petrov" never resolves to Oleg Petrov; the initial level likewise
+    takes a bare initial or a prefix of the given name, so "Igor Petrov" is
+    not Ivan Petrov. Results are memoized per cell text.
+    """
+
+    def __init__(self, drivers: Iterable[tuple[int, str, str | None]], aliases: dict[str, str] | None = None):
+        self.full: dict[str, int] = {}
+        self.reordered: dict[str, set[int]] = {}
+        self.initial: dict[str, set[int]] = {}
+        self.surname: dict[str, set[int]] = {}
+        self.alias: dict[str, int] = {}
+        self.given: dict[int, tuple[str, ...]] = {}
+        by_external_id: dict[str, int] = {}
+
+        for driver_id, full_name, external_id in drivers:
+            driver_id = int(driver_id)
+            tokens = _name_tokens(full_name)
+            if not tokens:
+                continue
+            # Exact names keep the first driver (active rows come first), like the old dict lookup.
+            self.full.setdefault(" ".join(tokens), driver_id)
+            if external_id:
+                by_external_id[_norm(external_id)] = driver_id
+            self.reordered.setdefault(" ".join(sorted(tokens)), set()).add(driver_id)
+            if len(tokens) > 1:
+                self.initial.setdefault(f"{tokens[0][0]} {tokens[-1]}", set()).add(driver_id)
+                self.surname.setdefault(tokens[-1], set()).add(driver_id)
+                self.given.setdefault(driver_id, tuple(tokens[:-1]))
+
+        for alias, target in (aliases or {}).items():
+            key = " ".join(_name_tokens(alias))
+            target_id = by_external_id.get(_norm(target)) or self.full.get(" ".join(_name_tokens(target)))
+            if key and target_id is not None:
+                self.alias[key] = target_id
+
+        self.stats: Counter[str] = Counter()
+        self.ambiguous_examples: dict[str, list[int]] = {}
+        self._cache: dict[str, tuple[int | None, str, tuple[int, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.full)
+
+    def _given_names_agree(self, driver_id: int, others: list[str]) -> bool:
+        """True when the cell's non-surname tokens are absent or match one of the driver's given names/initials."""
+        others = [t for t in others if t not in STATUS_TOKENS]
+        if not others:
+            return True
+        given = self.given.get(driver_id, ())
+        return any(o == g or (len(o) == 1 and g.startswith(o)) or (len(g) == 1 and o.startswith(g)) for o in others for g in given)
+
+    def _initial_agrees(self, driver_id: int, token: str) -> bool:
+        """True when token is an initial or a prefix of the driver's first given name ("I." / "Iv" -> Ivan, not "Igor")."""
+        given = self.given.get(driver_id, ())
+        if len(token) == 1 or not given:
+            return True
+        first = given[0]
+        return first.startswith(token) or (len(first) == 1 and token.startswith(first))
+
+    def _match_candidate(self, candidate: str) -> tuple[int | None, str, set[int]]:
+        tokens = _name_tokens(candidate)
+        if not tokens:
+            return None, MATCH_UNMATCHED, set()
+        key = " ".join(tokens)
+        if key in self.full:
+            return self.full[key], MATCH_EXACT, set()
+        if key in self.alias:
+            return self.alias[key], MATCH_ALIAS, set()
+
+        ambiguous: set[int] = set()
+        # (key, given-name token the key's initial came from); surname keys have none.
+        levels = (
+            (MATCH_REORDERED, self.reordered, [(" ".join(sorted(tokens)), None)]),
+            (
+                MATCH_INITIAL,
+                self.initial,
+                [(f"{a[0]} {b}", a) for a, b in zip(tokens, tokens[1:])]
+                + [(f"{b[0]} {a}", b) for a, b in zip(tokens, tokens[1:])],
+            ),
+            (MATCH_SURNAME, self.surname, [(t, None) for t in tokens if len(t) > 2 and t not in STATUS_TOKENS]),
+        )
+        for method, index, keys in levels:
+            found: set[int] = set()
+            for k, given in keys:
+                ids = index.get(k, set())
+                if method == MATCH_INITIAL:
+                    ids = {d for d in ids if self._initial_agrees(d, given)}
+                elif method == MATCH_SURNAME:
+                    ids = {d for d in ids if self._given_names_agree(d, [t for t in tokens if t != k])}
+                found |= ids
+            if len(found) == 1:
+                return next(iter(found)), method, set()
+            ambiguous |= found
+            if ambiguous:
+                break
+        return None, MATCH_AMBIGUOUS if ambiguous else MATCH_UNMATCHED, ambiguous
+
+    def resolve(self, assignment: str) -> int | None:
+        cached = self._cache.get(assignment)
+        if cached is None:
+            driver_id, method, ambiguous = None, MATCH_UNMATCHED, set()
+            for candidate in _driver_candidates(assignment):
+                driver_id, method, found = self._match_candidate(candidate)
+                if driver_id is not None:
+                    break
+                ambiguous |= found
+            if driver_id is None and ambiguous:
+                method = MATCH_AMBIGUOUS
+            cached = (driver_id, method, tuple(sorted(ambiguous)))
+            self._cache[assignment] = cached
+
+        driver_id, method, ambiguous_ids = cached
+        self.stats[method] += 1
+        if method == MATCH_AMBIGUOUS and len(self.ambiguous_examples) < MAX_AMBIGUOUS_EXAMPLES:
+            self.ambiguous_examples.setdefault(assignment, list(ambiguous_ids))
+        return driver_id
+
+    def report(self) -> dict[str, object]:
+        total = sum(self.stats.values())
+        matched = total - self.stats[MATCH_AMBIGUOUS] - self.stats[MATCH_UNMATCHED]
+        return {
+            "cells": total,
+            "matched": matched,
+            "match_rate": round(matched / total, 4) if total else None,
+            "by_method": dict(self.stats),
+            "ambiguous_examples": self.ambiguous_examples,
+        }
+
+
+def _load_driver_aliases(path: str) -> dict[str, str]:
+    """Reads a JSON object {"alias as written in the plan": "full name or Fahrer-ID"}."""
+    if not path:
+        return {}
+    alias_path = Path(path).expanduser()
+    if not alias_path.exists():
+        raise FileNotFoundError(f"Driver alias file not found: {alias_path}")
+    data = json.loads(alias_path.read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError(f"Driver alias file must contain a JSON object: {alias_path}")
+    return {str(k): str(v) for k, v in data.items() if k and v}
 
 
 @dataclass
@@ -164,6 +350,113 @@ class PlanRecord:
     raw_payload: dict[str, object]
 
 
+SCHEDULE_COLUMNS = (
+    "etl_log_id",
+    "iso_year",
+    "iso_week",
+    "work_date",
+    "company_id",
+    "truck_id",
+    "driver_id",
+    "shift_code",
+    "assignment_type",
+    "source_sheet",
+    "source_row_no",
+    "source_row_hash",
+    "raw_payload",
+)
+# Columns derived from lookups or sheet position rather than the hashed cell text.
+SCHEDULE_RESOLVED_COLUMNS = ("company_id", "truck_id", "driver_id", "assignment_type", "source_row_no", "raw_payload")
+
+
+def _staging_params(log_id: int, rec: PlanRecord) -> tuple:
+    """TMP_SCHEDULES_INSERT_SQL parameters for one record (SCHEDULE_COLUMNS order)."""
+    return (
+        log_id,
+        rec.iso_year,
+        rec.iso_week,
+        rec.work_date,
+        rec.company_id,
+        rec.truck_id,
+        rec.driver_id,
+        rec.assignment_value,
+        rec.assignment_type,
+        PLAN_SHEET,
+        rec.source_row_no,
+        rec.source_row_hash,
+        json.dumps(rec.raw_payload, ensure_ascii=False),
+    )
+
+
+def _apply_schedule_diff(cur) -> tuple[int, int, int]:
+    """
+    Applies tmp_schedules to schedules for PLAN_SHEET by source_row_hash.
+
+    Rows are paired on (hash, n-th occurrence of that hash) so duplicate cells
+    stay one-to-one. Unpaired old rows are deleted, unpaired staged rows are
+    inserted, and paired rows are only rewritten when a resolved column
+    (truck/driver lookup, row position) changed. Returns (deleted, updated, inserted).
+    """
+    column_list = ", ".join(SCHEDULE_COLUMNS)
+    resolved_set = ", ".join(f"{c} = t.{c}" for c in SCHEDULE_RESOLVED_COLUMNS)
+    resolved_old = ", ".join(f"s.{c}" for c in SCHEDULE_RESOLVED_COLUMNS)
+    resolved_new = ", ".join(f"t.{c}" for c in SCHEDULE_RESOLVED_COLUMNS)
+    _, deleted, updated, inserted = etl_db.execute_pipelined(
+        cur,
+        [
+            (
+                """
+                CREATE TEMP TABLE tmp_schedules_match ON COMMIT DROP AS
+                WITH old AS (
+                    SELECT id, source_row_hash,
+                           row_number() OVER (PARTITION BY source_row_hash ORDER BY source_row_no, id) AS n
+                    FROM schedules
+                    WHERE source_sheet = %s
+                ),
+                new AS (
+                    SELECT id, source_row_hash,
+                           row_number() OVER (PARTITION BY source_row_hash ORDER BY source_row_no, id) AS n
+                    FROM tmp_schedules
+                )
+                SELECT old.id AS old_id, new.id AS new_id
+                FROM old
+                FULL JOIN new ON new.source_row_hash = old.source_row_hash AND new.n = old.n
+                """,
+                (PLAN_SHEET,),
+            ),
+            (
+                """
+                DELETE FROM schedules
+                WHERE id IN (SELECT old_id FROM tmp_schedules_match WHERE new_id IS NULL)
+                """,
+                None,
+            ),
+            (
+                f"""
+                UPDATE schedules AS s
+                SET {resolved_set}, etl_log_id = t.etl_log_id
+                FROM tmp_schedules_match AS m
+                JOIN tmp_schedules AS t ON t.id = m.new_id
+                WHERE s.id = m.old_id
+                  AND ({resolved_old}) IS DISTINCT FROM ({resolved_new})
+                """,
+                None,
+            ),
+            (
+                f"""
+                INSERT INTO schedules ({column_list})
+                SELECT {", ".join(f"t.{c}" for c in SCHEDULE_COLUMNS)}
+                FROM tmp_schedules AS t
+                JOIN tmp_schedules_match AS m ON m.new_id = t.id
+                WHERE m.old_id IS NULL
+                """,
+                None,
+            ),
+        ],
+    )
+    return max(deleted, 0), max(updated, 0), max(inserted, 0)
+
+
 def _discover_xlsb_path(xlsm_path: Path) -> Path:
     # 1) sibling of EXCEL_FILE_PATH
     sibling = xlsm_path.with_name("LKW_Fahrer_Plan.xlsb")
@@ -195,42 +488,50 @@ def _prepare_readable_copy(source_path: Path) -> tuple[Path, bool]:
         return source_path, False
 
 
-def _fetch_lookup_maps(cur):
-    cur.execute("SELECT id, external_id, company_id FROM trucks")
+def _build_lookup_maps(master: dict[str, list[tuple]], driver_aliases: dict[str, str] | None = None):
     truck_map = {}
-    for tid, external_id, company_id in cur.fetchall():
+    for tid, external_id, company_id in master["trucks"]:
         if external_id:
             truck_map[str(external_id).strip()] = (int(tid), int(company_id) if company_id else None)
+    return truck_map, DriverResolver(master["drivers"], driver_aliases)
 
-    cur.execute("SELECT id, full_name FROM drivers")
-    driver_map = {}
-    for did, full_name in cur.fetchall():
-        n = _norm(full_name)
-        if n and n not in driver_map:
-            driver_map[n] = int(did)
-    return truck_map, driver_map
 
+def _fetch_lookup_maps(cur, driver_aliases: dict[str, str] | None = None):
+    return _build_lookup_maps(etl_db.fetch_master_lookups(cur), driver_aliases)
 
-def _extract_records(xlsb_path: Path, truck_map: dict[str, tuple[int, int | None]], driver_map: dict[str, int]) -> list[PlanRecord]:
-    records: list[PlanRecord] = []
 
-    with open_workbook(str(xlsb_path)) as wb:
-        if PLAN_SHEET not in wb.sheets:
-            raise RuntimeError(f"Sheet '{PLAN_SHEET}' not found in {xlsb_path.name}")
-
-        with wb.get_sheet(PLAN_SHEET) as ws:
-            rows = []
-            for row in ws.rows():
-                rows.append([cell.v for cell in row])
-
-    if len(rows) < 3:
+def _plan_week_columns(year_row: list[object], week_row: list[object]) -> list[tuple[int, int, int, date]]:
+    columns = []
+    for col in range(PLAN_START_COL, min(len(year_row), len(week_row))):
+        year_val = _to_int(year_row[col])
+        week_val = _to_int(week_row[col])
+        if year_val is None or week_val is None:
+            continue
+        if not (2020 <= year_val <= 2100 and 1 <= week_val <= 53):
+            continue
+        columns.append((col, year_val, week_val, _iso_monday(year_val, week_val)))
+    return columns
+
+
+def _iter_plan_records(
+    rows: Iterable[list[object]],
+    truck_map: dict[str, tuple[int, int | None]],
+    drivers: DriverResolver,
+) -> Iterator[PlanRecord]:
+    """
+    Yields PlanRecords from the plan sheet's row values (row 1 first).
+    Only the year/week header rows are kept; data rows are consumed one at a time.
+    """
+    rows = iter(rows)
+    header = list(islice(rows, 3))
+    if len(header) < 3:
         raise RuntimeError("Plan sheet has insufficient rows.")
 
-    year_row = rows[1]  # row 2 in Excel
-    week_row = rows[2]  # row 3 in Excel
-    start_col = 5       # col F
+    year_row = header[1]  # row 2 in Excel
+    week_row = header[2]  # row 3 in Excel
+    week_columns = _plan_week_columns(year_row, week_row)
 
-    for i, row in enumerate(rows[3:], start=4):  # Excel row index starts at 1
+    for i, row in enumerate(rows, start=4):  # Excel row index starts at 1
         truck_external_id = _clean(row[0] if len(row) > 0 else None)
         if not truck_external_id or not truck_external_id.upper().startswith("L"):
             continue
@@ -239,57 +540,76 @@ def _extract_records(xlsb_path: Path, truck_map: dict[str, tuple[int, int | None
         truck_id = truck_info[0] if truck_info else None
         company_id = truck_info[1] if truck_info else None
 
-        for col in range(start_col, min(len(row), len(year_row), len(week_row))):
-            year_val = _to_int(year_row[col] if col < len(year_row) else None)
-            week_val = _to_int(week_row[col] if col < len(week_row) else None)
-            assignment = _clean(row[col] if col < len(row) else None)
-
+        for col, year_val, week_val, monday in week_columns:
+            if col >= len(row):
+                break
+            assignment = _clean(row[col])
             if not assignment:
                 continue
-            if year_val is None or week_val is None:
-                continue
-            if not (2020 <= year_val <= 2100 and 1 <= week_val <= 53):
-                continue
 
             assignment_type = "status" if _is_status_cell(assignment) else "assignment"
-            driver_id = None if assignment_type == "status" else _resolve_driver_id(assignment, driver_map)
+            driver_id = None if assignment_type == "status" else drivers.resolve(assignment)
             src_hash = hashlib.sha1(
                 f"{truck_external_id}|{year_val}|{week_val}|{assignment}".encode("utf-8", errors="ignore")
             ).hexdigest()
 
-            records.append(
-                PlanRecord(
-                    iso_year=year_val,
-                    iso_week=week_val,
-                    work_date=_iso_monday(year_val, week_val),
-                    truck_external_id=truck_external_id,
-                    truck_id=truck_id,
-                    company_id=company_id,
-                    driver_id=driver_id,
-                    assignment_value=assignment,
-                    assignment_type=assignment_type,
-                    source_row_no=i,
-                    source_row_hash=src_hash,
-                    raw_payload={
-                        "source": "xlsb_fahrer_plan",
-                        "truck_external_id": truck_external_id,
-                        "assignment_value": assignment,
-                        "col_index": col + 1,
-                    },
-                )
+            yield PlanRecord(
+                iso_year=year_val,
+                iso_week=week_val,
+                work_date=monday,
+                truck_external_id=truck_external_id,
+                truck_id=truck_id,
+                company_id=company_id,
+                driver_id=driver_id,
+                assignment_value=assignment,
+                assignment_type=assignment_type,
+                source_row_no=i,
+                source_row_hash=src_hash,
+                raw_payload={
+                    "source": "xlsb_fahrer_plan",
+                    "truck_external_id": truck_external_id,
+                    "assignment_value": assignment,
+                    "col_index": col + 1,
+                },
             )
 
-    return records
+
+def _extract_records(
+    xlsb_path: Path, truck_map: dict[str, tuple[int, int | None]], drivers: DriverResolver
+) -> Iterator[PlanRecord]:
+    """Streams PlanRecords straight from the XLSB; the workbook stays open until the generator is exhausted."""
+    with open_workbook(str(xlsb_path)) as wb:
+        if PLAN_SHEET not in wb.sheets:
+            raise RuntimeError(f"Sheet '{PLAN_SHEET}' not found in {xlsb_path.name}")
+
+        with wb.get_sheet(PLAN_SHEET) as ws:
+            yield from _iter_plan_records(
+                ([cell.v for cell in row] for row in ws.rows()),
+                truck_map,
+                drivers,
+            )
 
 
-def run_etl(database_url: str, xlsm_path: Path, xlsb_path_override: str = "") -> dict[str, int]:
+def run_etl(
+    database_url: str,
+    xlsm_path: Path,
+    xlsb_path_override: str = "",
+    driver_aliases_path: str = "",
+    conn=None,
+    lookups: dict | None = None,
+) -> dict[str, int]:
+    """
+    conn reuses an open connection (left open). lookups["master"], when a
+    previous step in the same process filled it, replaces the truck/driver
+    lookup queries.
+    """
     import psycopg  # installed in project venv
 
     source_xlsb = Path(xlsb_path_override).expanduser() if xlsb_path_override else _discover_xlsb_path(xlsm_path)
     readable_path, created_copy = _prepare_readable_copy(source_xlsb)
     log_id = None
 
-    with psycopg.connect(database_url) as conn:
+    with etl_db.connection(psycopg, database_url, conn) as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -300,12 +620,16 @@ def run_etl(database_url: str, xlsm_path: Path, xlsb_path_override: str = "") ->
                 ("xlsb_fahrer_plan", json.dumps({"source_path": str(source_xlsb)}, ensure_ascii=False)),
             )
             log_id = int(cur.fetchone()[0])
+            etl_db.ensure_source_status_table(cur)
         conn.commit()
 
         try:
-            with conn.cursor() as cur:
-                truck_map, driver_map = _fetch_lookup_maps(cur)
-            records = _extract_records(readable_path, truck_map, driver_map)
+            driver_aliases = _load_driver_aliases(driver_aliases_path)
+            if lookups and lookups.get("master"):
+                truck_map, drivers = _build_lookup_maps(lookups["master"], driver_aliases)
+            else:
+                with conn.cursor() as cur:
+                    truck_map, drivers = _fetch_lookup_maps(cur, driver_aliases)
 
             with conn.cursor() as cur:
                 cur.execute(
@@ -317,82 +641,22 @@ def run_etl(database_url: str, xlsm_path: Path, xlsb_path_override: str = "") ->
                 )
 
                 inserted_count = 0
-                for rec in records:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_schedules (
-                            etl_log_id,
-                            iso_year,
-                            iso_week,
-                            work_date,
-                            company_id,
-                            truck_id,
-                            driver_id,
-                            shift_code,
-                            assignment_type,
-                            source_sheet,
-                            source_row_no,
-                            source_row_hash,
-                            raw_payload
-                        )
-                        VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb
-                        )
-                        """,
-                        (
-                            log_id,
-                            rec.iso_year,
-                            rec.iso_week,
-                            rec.work_date,
-                            rec.company_id,
-                            rec.truck_id,
-                            rec.driver_id,
-                            rec.assignment_value,
-                            rec.assignment_type,
-                            PLAN_SHEET,
-                            rec.source_row_no,
-                            rec.source_row_hash,
-                            json.dumps(rec.raw_payload, ensure_ascii=False),
-                        ),
-                    )
+                with_driver = 0
+                with_truck = 0
+                chunk: list[tuple] = []
+                for rec in _extract_records(readable_path, truck_map, drivers):
                     inserted_count += 1
-
-                cur.execute("DELETE FROM schedules WHERE source_sheet = %s", (PLAN_SHEET,))
-                deleted_count = cur.rowcount
-                cur.execute(
-                    """
-                    INSERT INTO schedules (
-                        etl_log_id,
-                        iso_year,
-                        iso_week,
-                        work_date,
-                        company_id,
-                        truck_id,
-                        driver_id,
-                        shift_code,
-                        assignment_type,
-                        source_sheet,
-                        source_row_no,
-                        source_row_hash,
-                        raw_payload
-                    )
-                    SELECT
-                        etl_log_id,
-                        iso_year,
-                        iso_week,
-                        work_date,
-                        company_id,
-                        truck_id,
-                        driver_id,
-                        shift_code,
-                        assignment_type,
-                        source_sheet,
-                        source_row_no,
-                        source_row_hash,
-                        raw_payload
-                    FROM tmp_schedules
-                    """
-                )
+                    with_driver += rec.driver_id is not None
+                    with_truck += rec.truck_id is not None
+                    chunk.append(_staging_params(log_id, rec))
+                    if len(chunk) >= INSERT_CHUNK_ROWS:
+                        etl_db.execute_batch(cur, TMP_SCHEDULES_INSERT_SQL, chunk)
+                        chunk = []
+                if chunk:
+                    etl_db.execute_batch(cur, TMP_SCHEDULES_INSERT_SQL, chunk)
+
+                deleted_count, updated_count, new_count = _apply_schedule_diff(cur)
+                unchanged_count = inserted_count - updated_count - new_count
 
                 cur.execute(
                     """
@@ -402,20 +666,23 @@ def run_etl(database_url: str, xlsm_path: Path, xlsb_path_override: str = "") ->
                         finished_at = NOW(),
                         rows_read = %s,
                         rows_inserted = %s,
-                        rows_updated = 0,
+                        rows_updated = %s,
                         rows_deleted = %s,
                         details = %s::jsonb
                     WHERE id = %s
                     """,
                     (
-                        len(records),
                         inserted_count,
+                        new_count,
+                        updated_count,
                         deleted_count,
                         json.dumps(
                             {
                                 "sheet": PLAN_SHEET,
                                 "trucks_known": len(truck_map),
-                                "drivers_known": len(driver_map),
+                                "drivers_known": len(drivers),
+                                "driver_resolution": drivers.report(),
+                                "rows_unchanged": unchanged_count,
                                 "workbook_used": str(readable_path),
                             },
                             ensure_ascii=False,
@@ -423,17 +690,20 @@ def run_etl(database_url: str, xlsm_path: Path, xlsb_path_override: str = "") ->
                         log_id,
                     ),
                 )
+                etl_db.record_source_success(cur, log_id)
             conn.commit()
 
-            with_driver = sum(1 for r in records if r.driver_id is not None)
-            with_truck = sum(1 for r in records if r.truck_id is not None)
             return {
-                "records": len(records),
-                "inserted": inserted_count,
+                "records": inserted_count,
+                "inserted": new_count,
+                "updated": updated_count,
+                "deleted": deleted_count,
+                "unchanged": unchanged_count,
                 "with_truck": with_truck,
                 "with_driver": with_driver,
             }
         except Exception as exc:
+            conn.rollback()
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -453,14 +723,21 @@ def run_etl(database_url: str, xlsm_path: Path, xlsb_path_override: str = "") ->
                     pass
 
 
-def main() -> int:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Import Fahrer plan from XLSB into schedules table.")
     parser.add_argument("--database-url", default="", help="Override DATABASE_URL from env")
     parser.add_argument("--xlsm-path", default="", help="Override EXCEL_FILE_PATH from env")
     parser.add_argument("--xlsb-path", default="", help="Override XLSB plan path")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--driver-aliases",
+        default="",
+        help="JSON file mapping plan spellings to driver full names or Fahrer-IDs (env XLSB_DRIVER_ALIASES_FILE)",
+    )
+    return parser.parse_args(argv)
 
-    load_dotenv(".env", override=True)
+
+def run_kwargs(args: argparse.Namespace) -> dict[str, object]:
+    """run_etl keyword arguments from CLI args with env fallbacks (call after load_dotenv)."""
     database_url = (args.database_url or os.getenv("DATABASE_URL", "")).strip()
     xlsm_raw = (args.xlsm_path or os.getenv("EXCEL_FILE_PATH", "")).strip()
 
@@ -469,14 +746,22 @@ def main() -> int:
     if not xlsm_raw:
         raise RuntimeError("EXCEL_FILE_PATH is empty. Set it in .env or pass --xlsm-path.")
 
-    result = run_etl(
-        database_url=database_url,
-        xlsm_path=Path(xlsm_raw),
-        xlsb_path_override=(args.xlsb_path or ""),
-    )
+    return {
+        "database_url": database_url,
+        "xlsm_path": Path(xlsm_raw),
+        "xlsb_path_override": (args.xlsb_path or ""),
+        "driver_aliases_path": (args.driver_aliases or os.getenv("XLSB_DRIVER_ALIASES_FILE", "")).strip(),
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    load_dotenv(".env", override=True)
+    result = run_etl(**run_kwargs(args))
     print(
         "ETL success: "
-        f"records={result['records']} inserted={result['inserted']} "
+        f"records={result['records']} inserted={result['inserted']} updated={result['updated']} "
+        f"deleted={result['deleted']} unchanged={result['unchanged']} "
         f"with_truck={result['with_truck']} with_driver={result['with_driver']}"
     )
     return 0
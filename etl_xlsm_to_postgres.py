@@ -6,7 +6,8 @@ Phase 1.3 MVP:
 - reads monthly revenue data from sheet "Bericht_Dispo"
 - reads monthly bonus dynamics from sheet "BonusDynamik"
 - reads monthly diesel data from sheet "Diesel"
-- upserts companies, trucks, drivers
+- upserts companies, trucks, drivers (only rows whose source_row_hash changed)
+- skips sheets whose content fingerprint is unchanged since the last successful run
 - writes run metadata to etl_log
 """
 
@@ -14,21 +15,27 @@ from __future__ import annotations
 
 import argparse
 import glob
+import hashlib
 import json
 import os
 import re
 import shutil
 import tempfile
 import time
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable
 
 from dotenv import load_dotenv
 import openpyxl
 
+import etl_db
+import xlsx_package
+from xlsx_package import SheetGrid
+
 
 def _lazy_import_psycopg():
     try:
@@ -54,6 +61,9 @@ STAACK_SHEET = "Staack"
 SHELL_SHEET = "Shell"
 CARLO_SHEET = "Carlo"
 CONTADO_SHEET = "Contado"
+XLSM_SOURCE_NAME = "xlsm_lkw_fahrer_data"
+LKW_SHEET = "LKW"
+FAHRER_SHEET = "Fahrer"
 REPAIR_TRUCK_RENAMES = {
     "DE-FN186": "GR-OO2103",
     "DE-FN401": "GR-OO2104",
@@ -234,23 +244,25 @@ def _parse_month_token(value: object) -> tuple[int, str] | None:
     return MONTHS_DE.get(key)
 
 
-def _find_metric_row(ws, aliases: Iterable[str], max_scan_rows: int = 120, max_scan_cols: int = 8) -> int | None:
+def _find_metric_row(
+    grid: SheetGrid, aliases: Iterable[str], max_scan_rows: int = 120, max_scan_cols: int = 8
+) -> int | None:
     normalized_aliases = {_norm(a) for a in aliases if _norm(a)}
     if not normalized_aliases:
         return None
-    for row_idx in range(1, max_scan_rows + 1):
+    for row_idx in range(1, min(max_scan_rows, grid.max_row) + 1):
         for col_idx in range(1, max_scan_cols + 1):
-            token = _norm(ws.cell(row=row_idx, column=col_idx).value)
+            token = _norm(grid.value(row_idx, col_idx))
             if token in normalized_aliases:
                 return row_idx
     return None
 
 
-def _discover_month_columns(ws, preferred_row: int = 6, max_scan_rows: int = 30) -> dict[int, tuple[str, int]]:
+def _discover_month_columns(grid: SheetGrid, preferred_row: int = 6, max_scan_rows: int = 30) -> dict[int, tuple[str, int]]:
     def parse_row(row_idx: int) -> dict[int, tuple[str, int]]:
         found: dict[int, tuple[str, int]] = {}
-        for col_idx in range(1, ws.max_column + 1):
-            parsed = _parse_month_token(ws.cell(row=row_idx, column=col_idx).value)
+        for col_idx, value in enumerate(grid.row(row_idx), start=grid.min_col):
+            parsed = _parse_month_token(value)
             if not parsed:
                 continue
             month_idx, month_name = parsed
@@ -263,7 +275,7 @@ def _discover_month_columns(ws, preferred_row: int = 6, max_scan_rows: int = 30)
         return preferred
 
     best: dict[int, tuple[str, int]] = preferred
-    for row_idx in range(1, max_scan_rows + 1):
+    for row_idx in range(1, min(max_scan_rows, grid.max_row) + 1):
         found = parse_row(row_idx)
         if len(found) > len(best):
             best = found
@@ -589,7 +601,7 @@ def extract_repairs(wb) -> list[RepairRow]:
 
 
 def extract_trucks(wb) -> list[TruckRow]:
-    ws = wb["LKW"]
+    ws = wb[LKW_SHEET]
     header_row_idx = _find_header_row(ws, REQUIRED_TRUCK_KEYS)
     header = _get_row_values(ws, header_row_idx)
     index = _build_col_index(header)
@@ -638,7 +650,7 @@ def extract_trucks(wb) -> list[TruckRow]:
 
 
 def extract_drivers(wb) -> list[DriverRow]:
-    ws = wb["Fahrer"]
+    ws = wb[FAHRER_SHEET]
     header_row_idx = _find_header_row(ws, REQUIRED_DRIVER_KEYS)
     header = _get_row_values(ws, header_row_idx)
     index = _build_col_index(header)
@@ -649,7 +661,8 @@ def extract_drivers(wb) -> list[DriverRow]:
     col_phone = _pick_col(index, "Telefonnummer", "Phone")
     col_status = _pick_col(index, "Status", "Active/Fired")
 
-    year_headers = _effective_header_values(ws, max(1, header_row_idx - 1))
+    year_row_idx = max(1, header_row_idx - 1)
+    year_headers = _effective_header_values(SheetGrid(ws, min_row=year_row_idx, max_row=year_row_idx), year_row_idx)
     vacation_cols_by_year: dict[int, int] = {}
     sick_cols_by_year: dict[int, int] = {}
     for i, label in enumerate(header):
@@ -720,13 +733,14 @@ def _normalize_fahrer_week_code(value: object) -> str:
 
 
 def extract_fahrer_weekly_statuses(wb) -> list[FahrerWeekStatusRow]:
-    ws = wb["Fahrer"]
+    ws = wb[FAHRER_SHEET]
     header_row_idx = _find_header_row(ws, REQUIRED_DRIVER_KEYS)
     header = _get_row_values(ws, header_row_idx)
     index = _build_col_index(header)
 
-    year_headers = _effective_header_values(ws, header_row_idx)
-    sub_headers = _get_row_values(ws, header_row_idx + 1)
+    header_grid = SheetGrid(ws, min_row=header_row_idx, max_row=header_row_idx + 1)
+    year_headers = _effective_header_values(header_grid, header_row_idx)
+    sub_headers = list(header_grid.row(header_row_idx + 1))
 
     col_id = _pick_col(index, "Fahrer-ID", "ID")
     col_name = _pick_col(index, "Fahrername", "Name")
@@ -791,23 +805,24 @@ def extract_einnahmen_months(wb) -> list[EinnahmenMonthRow]:
     if BERICHT_DISPO_SHEET not in wb.sheetnames:
         return []
 
-    ws = wb[BERICHT_DISPO_SHEET]
-    month_columns = _discover_month_columns(ws, preferred_row=6)
+    # Month headers sit in the first 30 rows and metric labels in the first 120.
+    grid = SheetGrid(wb[BERICHT_DISPO_SHEET], max_row=120)
+    month_columns = _discover_month_columns(grid, preferred_row=6)
     if len(month_columns) < 2:
         return []
 
-    nahverkehr_row = _find_metric_row(ws, ("Nahverkehr",))
-    logistics_row = _find_metric_row(ws, ("Logistics",))
-    gesamt_row = _find_metric_row(ws, ("Gesamt", "Total"))
+    nahverkehr_row = _find_metric_row(grid, ("Nahverkehr",))
+    logistics_row = _find_metric_row(grid, ("Logistics",))
+    gesamt_row = _find_metric_row(grid, ("Gesamt", "Total"))
     if nahverkehr_row is None or logistics_row is None or gesamt_row is None:
         return []
 
     rows: list[EinnahmenMonthRow] = []
     for month_idx in sorted(month_columns.keys()):
         month_name, col_idx = month_columns[month_idx]
-        nah = _parse_decimal(ws.cell(row=nahverkehr_row, column=col_idx).value)
-        log = _parse_decimal(ws.cell(row=logistics_row, column=col_idx).value)
-        ges = _parse_decimal(ws.cell(row=gesamt_row, column=col_idx).value)
+        nah = _parse_decimal(grid.value(nahverkehr_row, col_idx))
+        log = _parse_decimal(grid.value(logistics_row, col_idx))
+        ges = _parse_decimal(grid.value(gesamt_row, col_idx))
 
         rows.append(
             EinnahmenMonthRow(
@@ -850,9 +865,10 @@ def extract_einnahmen_firm_rows(wb) -> list[EinnahmenFirmRow]:
         "total": 84,       # CF
     }
 
+    grid = SheetGrid(ws, min_row=3, max_row=22, min_col=col_map["firm_name"], max_col=col_map["total"])
     rows: list[EinnahmenFirmRow] = []
     for row_idx in range(3, 23):  # first 20 rows after header
-        firm_name = _clean_text(ws.cell(row=row_idx, column=col_map["firm_name"]).value)
+        firm_name = _clean_text(grid.value(row_idx, col_map["firm_name"]))
         if not firm_name:
             continue
 
@@ -861,25 +877,25 @@ def extract_einnahmen_firm_rows(wb) -> list[EinnahmenFirmRow]:
             "source_range": f"BS{row_idx}:CF{row_idx}",
         }
         for key, col_idx in col_map.items():
-            raw_payload[key] = ws.cell(row=row_idx, column=col_idx).value
+            raw_payload[key] = grid.value(row_idx, col_idx)
 
         rows.append(
             EinnahmenFirmRow(
                 row_index=row_idx - 2,
                 firm_name=firm_name,
-                january=_parse_decimal(ws.cell(row=row_idx, column=col_map["january"]).value),
-                february=_parse_decimal(ws.cell(row=row_idx, column=col_map["february"]).value),
-                march=_parse_decimal(ws.cell(row=row_idx, column=col_map["march"]).value),
-                april=_parse_decimal(ws.cell(row=row_idx, column=col_map["april"]).value),
-                may=_parse_decimal(ws.cell(row=row_idx, column=col_map["may"]).value),
-                june=_parse_decimal(ws.cell(row=row_idx, column=col_map["june"]).value),
-                july=_parse_decimal(ws.cell(row=row_idx, column=col_map["july"]).value),
-                august=_parse_decimal(ws.cell(row=row_idx, column=col_map["august"]).value),
-                september=_parse_decimal(ws.cell(row=row_idx, column=col_map["september"]).value),
-                october=_parse_decimal(ws.cell(row=row_idx, column=col_map["october"]).value),
-                november=_parse_decimal(ws.cell(row=row_idx, column=col_map["november"]).value),
-                december=_parse_decimal(ws.cell(row=row_idx, column=col_map["december"]).value),
-                total=_parse_decimal(ws.cell(row=row_idx, column=col_map["total"]).value),
+                january=_parse_decimal(grid.value(row_idx, col_map["january"])),
+                february=_parse_decimal(grid.value(row_idx, col_map["february"])),
+                march=_parse_decimal(grid.value(row_idx, col_map["march"])),
+                april=_parse_decimal(grid.value(row_idx, col_map["april"])),
+                may=_parse_decimal(grid.value(row_idx, col_map["may"])),
+                june=_parse_decimal(grid.value(row_idx, col_map["june"])),
+                july=_parse_decimal(grid.value(row_idx, col_map["july"])),
+                august=_parse_decimal(grid.value(row_idx, col_map["august"])),
+                september=_parse_decimal(grid.value(row_idx, col_map["september"])),
+                october=_parse_decimal(grid.value(row_idx, col_map["october"])),
+                november=_parse_decimal(grid.value(row_idx, col_map["november"])),
+                december=_parse_decimal(grid.value(row_idx, col_map["december"])),
+                total=_parse_decimal(grid.value(row_idx, col_map["total"])),
                 raw_payload=raw_payload,
             )
         )
@@ -925,16 +941,15 @@ def _parse_month_start(value: object) -> date | None:
     return None
 
 
-def _parse_percent_cell(ws, row_idx: int, col_idx: int) -> Decimal:
-    cell = ws.cell(row=row_idx, column=col_idx)
-    parsed = _parse_decimal(cell.value)
-    if "%" in str(cell.number_format or "") and abs(parsed) <= Decimal("3"):
+def _parse_percent_cell(grid: SheetGrid, row_idx: int, col_idx: int) -> Decimal:
+    parsed = _parse_decimal(grid.value(row_idx, col_idx))
+    if "%" in str(grid.number_format(row_idx, col_idx) or "") and abs(parsed) <= Decimal("3"):
         parsed = (parsed * Decimal("100")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
     return parsed
 
 
-def _parse_int_cell(ws, row_idx: int, col_idx: int) -> int:
-    parsed = _parse_decimal(ws.cell(row=row_idx, column=col_idx).value)
+def _parse_int_cell(grid: SheetGrid, row_idx: int, col_idx: int) -> int:
+    parsed = _parse_decimal(grid.value(row_idx, col_idx))
     return int(parsed.to_integral_value(rounding=ROUND_HALF_UP))
 
 
@@ -943,19 +958,20 @@ def extract_bonus_dynamik_months(wb) -> list[BonusDynamikRow]:
         return []
 
     ws = wb[BONUS_DYNAMIK_SHEET]
-    max_col = int(ws.max_column or 0)
-    max_row = int(ws.max_row or 0)
-    if max_col < 10 or max_row < 3:
+    if int(ws.max_column or 0) < 10 or int(ws.max_row or 0) < 3:
         return []
+    grid = SheetGrid(ws, number_formats=True)
+    max_col = grid.max_col
+    max_row = grid.max_row
 
     expected_headers = ["DAYS", "KM", "%KM", "CT", "%CT", "BONUS", "PENALTY", "FINAL"]
     month_blocks: list[tuple[int, date]] = []
     seen_months: set[tuple[int, int]] = set()
     for start_col in range(3, max_col - 7 + 1):
-        sequence = [_bonus_header_token(ws.cell(row=2, column=start_col + off).value) for off in range(8)]
+        sequence = [_bonus_header_token(grid.value(2, start_col + off)) for off in range(8)]
         if sequence != expected_headers:
             continue
-        month_start = _parse_month_start(ws.cell(row=1, column=start_col).value)
+        month_start = _parse_month_start(grid.value(1, start_col))
         if not month_start:
             continue
         month_key = (month_start.year, month_start.month)
@@ -969,8 +985,8 @@ def extract_bonus_dynamik_months(wb) -> list[BonusDynamikRow]:
 
     by_key: dict[tuple[int, int, str], BonusDynamikRow] = {}
     for row_idx in range(3, max_row + 1):
-        fahrer_id = _clean_text(ws.cell(row=row_idx, column=1).value) or ""
-        fahrer_name = _clean_text(ws.cell(row=row_idx, column=2).value) or ""
+        fahrer_id = _clean_text(grid.value(row_idx, 1)) or ""
+        fahrer_name = _clean_text(grid.value(row_idx, 2)) or ""
         if not fahrer_id and not fahrer_name:
             continue
         if not fahrer_id:
@@ -984,14 +1000,14 @@ def extract_bonus_dynamik_months(wb) -> list[BonusDynamikRow]:
                 month_start=month_start,
                 fahrer_id=fahrer_id,
                 fahrer_name=fahrer_name,
-                days=_parse_int_cell(ws, row_idx, start_col),
-                km=_parse_decimal(ws.cell(row=row_idx, column=start_col + 1).value),
-                pct_km=_parse_percent_cell(ws, row_idx, start_col + 2),
-                ct=_parse_int_cell(ws, row_idx, start_col + 3),
-                pct_ct=_parse_percent_cell(ws, row_idx, start_col + 4),
-                bonus=_parse_decimal(ws.cell(row=row_idx, column=start_col + 5).value),
-                penalty=_parse_decimal(ws.cell(row=row_idx, column=start_col + 6).value),
-                final=_parse_decimal(ws.cell(row=row_idx, column=start_col + 7).value),
+                days=_parse_int_cell(grid, row_idx, start_col),
+                km=_parse_decimal(grid.value(row_idx, start_col + 1)),
+                pct_km=_parse_percent_cell(grid, row_idx, start_col + 2),
+                ct=_parse_int_cell(grid, row_idx, start_col + 3),
+                pct_ct=_parse_percent_cell(grid, row_idx, start_col + 4),
+                bonus=_parse_decimal(grid.value(row_idx, start_col + 5)),
+                penalty=_parse_decimal(grid.value(row_idx, start_col + 6)),
+                final=_parse_decimal(grid.value(row_idx, start_col + 7)),
                 raw_payload={
                     "sheet": BONUS_DYNAMIK_SHEET,
                     "row": row_idx,
@@ -1001,11 +1017,11 @@ def extract_bonus_dynamik_months(wb) -> list[BonusDynamikRow]:
     return [by_key[k] for k in sorted(by_key.keys())]
 
 
-def _effective_header_values(ws, row_idx: int) -> list[str]:
+def _effective_header_values(grid: SheetGrid, row_idx: int) -> list[str]:
     values: list[str] = []
     last = ""
-    for col_idx in range(1, int(ws.max_column or 0) + 1):
-        raw = _clean_text(ws.cell(row=row_idx, column=col_idx).value) or ""
+    for col_idx in range(1, grid.max_col + 1):
+        raw = _clean_text(grid.value(row_idx, col_idx)) or ""
         if raw:
             last = raw
         values.append(last)
@@ -1231,13 +1247,14 @@ def extract_diesel_months(wb) -> list[DieselMonthRow]:
         return []
 
     ws = wb[DIESEL_SHEET]
-    max_row = int(ws.max_row or 0)
-    max_col = int(ws.max_column or 0)
-    if max_row < 3 or max_col < 17:
+    if int(ws.max_row or 0) < 3 or int(ws.max_column or 0) < 17:
         return []
+    grid = SheetGrid(ws, max_col=int(ws.max_column))
+    max_row = grid.max_row
+    max_col = grid.max_col
 
-    top_headers = _effective_header_values(ws, 1)
-    sub_headers = [str(ws.cell(row=2, column=col_idx).value or "").strip() for col_idx in range(1, max_col + 1)]
+    top_headers = _effective_header_values(grid, 1)
+    sub_headers = [str(grid.value(2, col_idx) or "").strip() for col_idx in range(1, max_col + 1)]
 
     col_month = _find_first_diesel_column(top_headers, sub_headers, "Diesel", "Month")
     col_year = _find_first_diesel_column(top_headers, sub_headers, "Diesel", "Year")
@@ -1275,8 +1292,8 @@ def extract_diesel_months(wb) -> list[DieselMonthRow]:
 
     rows: list[DieselMonthRow] = []
     for row_idx in range(3, max_row + 1):
-        month_index = _parse_int_like(ws.cell(row=row_idx, column=col_month).value)
-        report_year = _parse_int_like(ws.cell(row=row_idx, column=col_year).value)
+        month_index = _parse_int_like(grid.value(row_idx, col_month))
+        report_year = _parse_int_like(grid.value(row_idx, col_year))
         if not month_index or not report_year or month_index < 1 or month_index > 12:
             continue
 
@@ -1284,25 +1301,25 @@ def extract_diesel_months(wb) -> list[DieselMonthRow]:
         for col_idx in range(1, max_col + 1):
             top_label = top_headers[col_idx - 1] or "col"
             sub_label = sub_headers[col_idx - 1] or str(col_idx)
-            raw_payload[f"c{col_idx}:{top_label}::{sub_label}"] = ws.cell(row=row_idx, column=col_idx).value
+            raw_payload[f"c{col_idx}:{top_label}::{sub_label}"] = grid.value(row_idx, col_idx)
 
         rows.append(
             DieselMonthRow(
                 report_year=report_year,
                 month_index=month_index,
                 month_name=MONTH_NAMES_DE[month_index - 1],
-                liter_staack=_parse_decimal(ws.cell(row=row_idx, column=col_liter_staack).value),
-                liter_shell=_parse_decimal(ws.cell(row=row_idx, column=col_liter_shell).value),
-                liter_dkv=_parse_decimal(ws.cell(row=row_idx, column=col_liter_dkv).value),
-                liter_total=_parse_decimal(ws.cell(row=row_idx, column=col_liter_total).value),
-                euro_staack=_parse_decimal(ws.cell(row=row_idx, column=col_euro_staack).value),
-                euro_shell=_parse_decimal(ws.cell(row=row_idx, column=col_euro_shell).value),
-                euro_dkv=_parse_decimal(ws.cell(row=row_idx, column=col_euro_dkv).value),
-                euro_total=_parse_decimal(ws.cell(row=row_idx, column=col_euro_total).value),
-                euro_per_liter_staack=_parse_decimal(ws.cell(row=row_idx, column=col_eurpl_staack).value),
-                euro_per_liter_shell=_parse_decimal(ws.cell(row=row_idx, column=col_eurpl_shell).value),
-                euro_per_liter_dkv=_parse_decimal(ws.cell(row=row_idx, column=col_eurpl_dkv).value),
-                euro_per_liter_avg=_parse_decimal(ws.cell(row=row_idx, column=col_eurpl_avg).value),
+                liter_staack=_parse_decimal(grid.value(row_idx, col_liter_staack)),
+                liter_shell=_parse_decimal(grid.value(row_idx, col_liter_shell)),
+                liter_dkv=_parse_decimal(grid.value(row_idx, col_liter_dkv)),
+                liter_total=_parse_decimal(grid.value(row_idx, col_liter_total)),
+                euro_staack=_parse_decimal(grid.value(row_idx, col_euro_staack)),
+                euro_shell=_parse_decimal(grid.value(row_idx, col_euro_shell)),
+                euro_dkv=_parse_decimal(grid.value(row_idx, col_euro_dkv)),
+                euro_total=_parse_decimal(grid.value(row_idx, col_euro_total)),
+                euro_per_liter_staack=_parse_decimal(grid.value(row_idx, col_eurpl_staack)),
+                euro_per_liter_shell=_parse_decimal(grid.value(row_idx, col_eurpl_shell)),
+                euro_per_liter_dkv=_parse_decimal(grid.value(row_idx, col_eurpl_dkv)),
+                euro_per_liter_avg=_parse_decimal(grid.value(row_idx, col_eurpl_avg)),
                 raw_payload=raw_payload,
             )
         )
@@ -1329,14 +1346,14 @@ def extract_tankkarten_driver_cards(wb) -> list[TankkartenDriverCardRow]:
     if TANKKARTEN_SHEET not in wb.sheetnames:
         return []
 
-    ws = wb[TANKKARTEN_SHEET]
+    grid = SheetGrid(wb[TANKKARTEN_SHEET], min_row=3, max_col=7)
     rows: list[TankkartenDriverCardRow] = []
-    for row_idx in range(3, ws.max_row + 1):
-        card_number = _clean_text(ws.cell(row=row_idx, column=2).value) or ""
-        tankstelle = _clean_text(ws.cell(row=row_idx, column=3).value) or ""
-        pin = _clean_text(ws.cell(row=row_idx, column=5).value) or ""
-        lkw_number = _clean_text(ws.cell(row=row_idx, column=6).value) or ""
-        wo_gespeichert = _clean_text(ws.cell(row=row_idx, column=7).value) or ""
+    for row_idx, _ in grid.iter_rows():
+        card_number = _clean_text(grid.value(row_idx, 2)) or ""
+        tankstelle = _clean_text(grid.value(row_idx, 3)) or ""
+        pin = _clean_text(grid.value(row_idx, 5)) or ""
+        lkw_number = _clean_text(grid.value(row_idx, 6)) or ""
+        wo_gespeichert = _clean_text(grid.value(row_idx, 7)) or ""
 
         if not any((card_number, tankstelle, pin, lkw_number, wo_gespeichert)):
             continue
@@ -1557,17 +1574,181 @@ def _prepare_readable_xlsm(source_path: Path) -> tuple[Path, bool]:
     )
 
 
-def _upsert_company(cur, name: str) -> int:
-    cur.execute(
+def _upsert_companies(cur, names: list[str]) -> dict[str, int]:
+    """Upserts every company in one pipelined, prepared batch; returns {name: id}."""
+    ids = etl_db.execute_batch(
+        cur,
         """
         INSERT INTO companies (name)
         VALUES (%s)
         ON CONFLICT (name) DO UPDATE SET updated_at = NOW()
         RETURNING id
         """,
-        (name,),
+        [(name,) for name in names],
+        returning=True,
+    )
+    return {name: int(row[0]) for name, row in zip(names, ids)}
+
+
+def _dedupe_by_external_id(rows: list) -> list:
+    # One statement cannot upsert the same key twice; keep the last sheet row per ID.
+    by_id: dict[str, object] = {}
+    for row in rows:
+        by_id[row.external_id] = row
+    return list(by_id.values())
+
+
+def _master_row_hash(row: TruckRow | DriverRow, company_id: int | None) -> str:
+    # Stable across runs: every normalized field plus the resolved company.
+    data = asdict(row)
+    data["company_id"] = company_id
+    encoded = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _load_source_row_hashes(cur, table_name: str, external_ids: list[str]) -> dict[str, str | None]:
+    cur.execute(
+        f"SELECT external_id, source_row_hash FROM {table_name} WHERE external_id = ANY(%s::text[])",
+        (external_ids,),
+    )
+    return {external_id: row_hash for external_id, row_hash in cur.fetchall()}
+
+
+def _changed_master_rows(
+    cur, table_name: str, rows: list, company_ids: dict[str, int]
+) -> tuple[list, list[str]]:
+    """
+    Dedupes rows and keeps only those whose hash differs from the stored
+    source_row_hash (new rows included). Returns (rows, hashes).
+    """
+    rows = _dedupe_by_external_id(rows)
+    if not rows:
+        return [], []
+    hashes = [_master_row_hash(r, company_ids.get(r.company_name or "")) for r in rows]
+    stored = _load_source_row_hashes(cur, table_name, [r.external_id for r in rows])
+    changed = [(r, h) for r, h in zip(rows, hashes) if stored.get(r.external_id) != h]
+    return [r for r, _ in changed], [h for _, h in changed]
+
+
+def _upsert_trucks(cur, trucks: list[TruckRow], company_ids: dict[str, int]) -> tuple[int, int, int]:
+    """
+    Upsert new/changed trucks in one statement via unnest over typed arrays.
+    Rows whose source_row_hash is unchanged are not sent (and the ON CONFLICT
+    WHERE skips any that changed underneath us). Returns (inserted, updated, unchanged).
+    """
+    total = len(_dedupe_by_external_id(trucks))
+    rows, hashes = _changed_master_rows(cur, "trucks", trucks, company_ids)
+    if not rows:
+        return 0, 0, total
+    cur.execute(
+        """
+        WITH src AS (
+            SELECT *
+            FROM unnest(
+                %s::text[], %s::text[], %s::text[], %s::bigint[],
+                %s::text[], %s::date[], %s::boolean[], %s::text[], %s::text[]
+            ) AS s(
+                external_id, plate_number, truck_type, company_id, status, status_since,
+                is_active, source_row_hash, raw_payload
+            )
+        ),
+        upserted AS (
+            INSERT INTO trucks (
+                external_id, plate_number, truck_type, company_id, status, status_since,
+                is_active, source_row_hash, raw_payload, updated_at
+            )
+            SELECT
+                external_id, plate_number, truck_type, company_id, status, status_since,
+                is_active, source_row_hash, raw_payload::jsonb, NOW()
+            FROM src
+            ON CONFLICT (external_id) DO UPDATE SET
+                plate_number = EXCLUDED.plate_number,
+                truck_type = EXCLUDED.truck_type,
+                company_id = EXCLUDED.company_id,
+                status = EXCLUDED.status,
+                status_since = EXCLUDED.status_since,
+                is_active = EXCLUDED.is_active,
+                source_row_hash = EXCLUDED.source_row_hash,
+                raw_payload = EXCLUDED.raw_payload,
+                updated_at = NOW()
+            WHERE trucks.source_row_hash IS DISTINCT FROM EXCLUDED.source_row_hash
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            COUNT(*) FILTER (WHERE inserted),
+            COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+        """,
+        (
+            [t.external_id for t in rows],
+            [t.plate_number for t in rows],
+            [t.truck_type for t in rows],
+            [company_ids.get(t.company_name or "") for t in rows],
+            [t.status for t in rows],
+            [t.status_since for t in rows],
+            [t.is_active for t in rows],
+            hashes,
+            [json.dumps(t.raw_payload, ensure_ascii=False) for t in rows],
+        ),
+    )
+    inserted, updated = (int(v or 0) for v in cur.fetchone())
+    return inserted, updated, total - inserted - updated
+
+
+def _upsert_drivers(cur, drivers: list[DriverRow], company_ids: dict[str, int]) -> tuple[int, int, int]:
+    """
+    Upsert new/changed drivers in one statement via unnest over typed arrays.
+    Returns (inserted, updated, unchanged); see _upsert_trucks.
+    """
+    total = len(_dedupe_by_external_id(drivers))
+    rows, hashes = _changed_master_rows(cur, "drivers", drivers, company_ids)
+    if not rows:
+        return 0, 0, total
+    cur.execute(
+        """
+        WITH src AS (
+            SELECT *
+            FROM unnest(
+                %s::text[], %s::text[], %s::text[], %s::bigint[], %s::boolean[], %s::text[], %s::text[]
+            ) AS s(external_id, full_name, phone, company_id, is_active, source_row_hash, raw_payload)
+        ),
+        upserted AS (
+            INSERT INTO drivers (
+                external_id, full_name, phone, company_id, is_active,
+                source_row_hash, raw_payload, updated_at
+            )
+            SELECT
+                external_id, full_name, phone, company_id, is_active,
+                source_row_hash, raw_payload::jsonb, NOW()
+            FROM src
+            ON CONFLICT (external_id) DO UPDATE SET
+                full_name = EXCLUDED.full_name,
+                phone = EXCLUDED.phone,
+                company_id = EXCLUDED.company_id,
+                is_active = EXCLUDED.is_active,
+                source_row_hash = EXCLUDED.source_row_hash,
+                raw_payload = EXCLUDED.raw_payload,
+                updated_at = NOW()
+            WHERE drivers.source_row_hash IS DISTINCT FROM EXCLUDED.source_row_hash
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            COUNT(*) FILTER (WHERE inserted),
+            COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+        """,
+        (
+            [d.external_id for d in rows],
+            [d.full_name for d in rows],
+            [d.phone for d in rows],
+            [company_ids.get(d.company_name or "") for d in rows],
+            [d.is_active for d in rows],
+            hashes,
+            [json.dumps(d.raw_payload, ensure_ascii=False) for d in rows],
+        ),
     )
-    return int(cur.fetchone()[0])
+    inserted, updated = (int(v or 0) for v in cur.fetchone())
+    return inserted, updated, total - inserted - updated
 
 
 def _ensure_einnahmen_table(cur) -> None:
@@ -1793,19 +1974,30 @@ def _ensure_yf_lkw_table(cur) -> None:
         )
         """
     )
+    # Migrate older tables only when needed: ALTER TABLE locks out readers of the live table.
     cur.execute(
         """
-        ALTER TABLE report_yf_lkw_daily
-        ADD COLUMN IF NOT EXISTS source_row INTEGER NOT NULL DEFAULT 0
-        """
-    )
-    cur.execute("ALTER TABLE report_yf_lkw_daily DROP CONSTRAINT IF EXISTS report_yf_lkw_daily_pkey")
-    cur.execute(
-        """
-        ALTER TABLE report_yf_lkw_daily
-        ADD PRIMARY KEY (report_year, iso_week, lkw_nummer, report_date, source_row)
+        SELECT pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = 'report_yf_lkw_daily'::regclass AND contype = 'p'
         """
     )
+    pk_row = cur.fetchone()
+    pk_def = str(pk_row[0]) if pk_row else ""
+    if pk_def != "PRIMARY KEY (report_year, iso_week, lkw_nummer, report_date, source_row)":
+        cur.execute(
+            """
+            ALTER TABLE report_yf_lkw_daily
+            ADD COLUMN IF NOT EXISTS source_row INTEGER NOT NULL DEFAULT 0
+            """
+        )
+        cur.execute("ALTER TABLE report_yf_lkw_daily DROP CONSTRAINT IF EXISTS report_yf_lkw_daily_pkey")
+        cur.execute(
+            """
+            ALTER TABLE report_yf_lkw_daily
+            ADD PRIMARY KEY (report_year, iso_week, lkw_nummer, report_date, source_row)
+            """
+        )
     cur.execute(
         """
         CREATE INDEX IF NOT EXISTS idx_report_yf_lkw_lookup
@@ -1894,8 +2086,8 @@ REPORT_REPLACE_TABLES = (
 )
 
 
-def _ensure_report_staging_tables(cur) -> None:
-    for table_name in REPORT_REPLACE_TABLES:
+def _ensure_report_staging_tables(cur, tables: Iterable[str] = REPORT_REPLACE_TABLES) -> None:
+    for table_name in tables:
         cur.execute(
             f"""
             CREATE TEMP TABLE tmp_{table_name}
@@ -1905,22 +2097,438 @@ def _ensure_report_staging_tables(cur) -> None:
         )
 
 
-def _swap_report_staging_tables(cur) -> int:
+SWAP_MODE_RENAME = "rename"
+SWAP_MODE_DELETE = "delete"
+SWAP_MODES = (SWAP_MODE_RENAME, SWAP_MODE_DELETE)
+_INDEX_DEF_RE = re.compile(r"^(CREATE (?:UNIQUE )?INDEX) (\S+) ON (?:ONLY )?(\S+) (USING .+)$", re.S)
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _report_table_indexes(cur, table_name: str) -> list[tuple[str, str, bool]]:
+    cur.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(x.indexrelid), x.indisprimary
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass
+        ORDER BY i.relname
+        """,
+        (table_name,),
+    )
+    return [(str(name), str(definition), bool(is_primary)) for name, definition, is_primary in cur.fetchall()]
+
+
+def _shadow_index_sql(index_def: str, index_name: str, shadow_name: str) -> str:
+    match = _INDEX_DEF_RE.match(index_def.strip())
+    if not match:
+        raise RuntimeError(f"Unsupported index definition for shadow table: {index_def}")
+    return f"{match.group(1)} {index_name}__next ON {shadow_name} {match.group(4)}"
+
+
+def _build_report_shadow_table(cur, table_name: str) -> list[tuple[str, str, bool]]:
+    """
+    Build {table_name}__next from tmp_{table_name}: loaded unlogged, then switched
+    to logged, then indexed like the live table (primary key included).
+    Returns the live table's indexes so the swap can rename them.
+    """
+    shadow = f"{table_name}__next"
+    indexes = _report_table_indexes(cur, table_name)
+    cur.execute(f"DROP TABLE IF EXISTS {shadow}")
+    cur.execute(
+        f"""
+        CREATE UNLOGGED TABLE {shadow}
+        (LIKE {table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        """
+    )
+    cur.execute(f"INSERT INTO {shadow} SELECT * FROM tmp_{table_name}")
+    cur.execute(f"ALTER TABLE {shadow} SET LOGGED")
+    for index_name, index_def, is_primary in indexes:
+        cur.execute(_shadow_index_sql(index_def, index_name, shadow))
+        if is_primary:
+            cur.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {index_name}__next PRIMARY KEY USING INDEX {index_name}__next")
+
+    cur.execute(
+        """
+        SELECT grantee, privilege_type
+        FROM information_schema.role_table_grants
+        WHERE table_schema = current_schema()
+          AND table_name = %s
+          AND grantee <> current_user
+        """,
+        (table_name,),
+    )
+    for grantee, privilege in cur.fetchall():
+        target = "PUBLIC" if str(grantee).upper() == "PUBLIC" else _quote_ident(str(grantee))
+        cur.execute(f"GRANT {privilege} ON {shadow} TO {target}")
+    return indexes
+
+
+def _swap_report_staging_tables(
+    cur,
+    swap_mode: str = SWAP_MODE_DELETE,
+    retire_suffix: str = "old",
+    tables: Iterable[str] = REPORT_REPLACE_TABLES,
+) -> int:
+    """
+    Replace every report table with the content of its tmp_ staging table.
+
+    "delete" rewrites the live tables in place (DELETE + INSERT SELECT).
+    "rename" builds shadow tables first and then only renames: live tables are
+    retired as {table}__{retire_suffix} and dropped after commit.
+    Returns the number of replaced (old) rows.
+    """
+    tables = tuple(tables)
     deleted_count = 0
-    for table_name in REPORT_REPLACE_TABLES:
-        cur.execute(f"DELETE FROM {table_name}")
-        deleted_count += int(cur.rowcount or 0)
-        cur.execute(f"INSERT INTO {table_name} SELECT * FROM tmp_{table_name}")
+    if swap_mode == SWAP_MODE_DELETE:
+        for table_name in tables:
+            cur.execute(f"DELETE FROM {table_name}")
+            deleted_count += int(cur.rowcount or 0)
+            cur.execute(f"INSERT INTO {table_name} SELECT * FROM tmp_{table_name}")
+        return deleted_count
+    if swap_mode != SWAP_MODE_RENAME:
+        raise ValueError(f"Unknown swap mode: {swap_mode!r} (expected one of {', '.join(SWAP_MODES)})")
+
+    shadow_indexes = {table_name: _build_report_shadow_table(cur, table_name) for table_name in tables}
+    for table_name in tables:
+        cur.execute(f"SELECT COUNT(*) FROM {table_name}")
+        deleted_count += int(cur.fetchone()[0] or 0)
+
+    # RENAME takes ACCESS EXCLUSIVE locks held until commit, so this runs last.
+    for table_name, indexes in shadow_indexes.items():
+        cur.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}__{retire_suffix}")
+        for index_name, _, _ in indexes:
+            cur.execute(f"ALTER INDEX {index_name} RENAME TO {index_name}__{retire_suffix}")
+        cur.execute(f"ALTER TABLE {table_name}__next RENAME TO {table_name}")
+        for index_name, _, _ in indexes:
+            cur.execute(f"ALTER INDEX {index_name}__next RENAME TO {index_name}")
     return deleted_count
 
 
-def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
+def _drop_retired_report_tables(conn, lock_timeout: str = "5s") -> int:
+    """
+    Best-effort cleanup after a rename swap. Each retired table is dropped in its
+    own short transaction; tables still read by open sessions stay for the next run.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = current_schema()")
+            existing = [str(r[0]) for r in cur.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        return 0
+
+    retired = [
+        name
+        for name in existing
+        if any(name.startswith(f"{table_name}__old") for table_name in REPORT_REPLACE_TABLES)
+    ]
+    dropped = 0
+    for name in sorted(retired):
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+                cur.execute(f"DROP TABLE IF EXISTS {name}")
+            conn.commit()
+            dropped += 1
+        except Exception:
+            conn.rollback()
+    return dropped
+
+
+REPORT_ROW_TYPES = {
+    "report_fahrer_weekly_status": FahrerWeekStatusRow,
+    "report_einnahmen_monthly": EinnahmenMonthRow,
+    "report_einnahmen_firm_monthly": EinnahmenFirmRow,
+    "report_bonus_dynamik_monthly": BonusDynamikRow,
+    "report_diesel_monthly": DieselMonthRow,
+    "report_tankkarten_driver_cards": TankkartenDriverCardRow,
+    "report_lkw_fuel_transactions": LkwFuelTransactionRow,
+    "report_lkw_revenue_records": LkwRevenueRow,
+    "report_yf_fahrer_monthly": YFFahrerMonthRow,
+    "report_yf_lkw_daily": YFLkwDayRow,
+    "report_repair_records": RepairRow,
+}
+LOAD_MODE_COPY = "copy"
+LOAD_MODE_ROWS = "rows"
+LOAD_MODES = (LOAD_MODE_COPY, LOAD_MODE_ROWS)
+
+
+def _staging_columns(table_name: str) -> tuple[str, ...]:
+    # Row dataclass fields are named after the report table columns;
+    # updated_at is left to the column default (NOW() of the transaction).
+    return tuple(f.name for f in fields(REPORT_ROW_TYPES[table_name]))
+
+
+def _staging_values(rec, columns: tuple[str, ...]) -> tuple[object, ...]:
+    values: list[object] = []
+    for column in columns:
+        value = getattr(rec, column)
+        if column == "raw_payload":
+            value = json.dumps(value, ensure_ascii=False, default=str)
+        values.append(value)
+    return tuple(values)
+
+
+def _stage_report_rows(cur, table_name: str, rows: list, load_mode: str = LOAD_MODE_COPY) -> int:
+    """
+    Fill tmp_{table_name} with extracted rows.
+
+    "copy" streams all rows through one COPY ... FROM STDIN,
+    "rows" sends one INSERT per row (kept for comparison runs).
+    """
+    if not rows:
+        return 0
+    columns = _staging_columns(table_name)
+    column_list = ", ".join(columns)
+    if load_mode == LOAD_MODE_COPY:
+        with cur.copy(f"COPY tmp_{table_name} ({column_list}) FROM STDIN") as copy:
+            for rec in rows:
+                copy.write_row(_staging_values(rec, columns))
+    elif load_mode == LOAD_MODE_ROWS:
+        placeholders = ", ".join("%s::jsonb" if c == "raw_payload" else "%s" for c in columns)
+        sql = f"INSERT INTO tmp_{table_name} ({column_list}) VALUES ({placeholders})"
+        for rec in rows:
+            cur.execute(sql, _staging_values(rec, columns))
+    else:
+        raise ValueError(f"Unknown load mode: {load_mode!r} (expected one of {', '.join(LOAD_MODES)})")
+    return len(rows)
+
+
+REPORT_TABLE_SHEETS = {
+    "report_fahrer_weekly_status": (FAHRER_SHEET,),
+    "report_einnahmen_monthly": (BERICHT_DISPO_SHEET,),
+    "report_einnahmen_firm_monthly": (BERICHT_DISPO_SHEET,),
+    "report_bonus_dynamik_monthly": (BONUS_DYNAMIK_SHEET,),
+    "report_diesel_monthly": (DIESEL_SHEET,),
+    "report_tankkarten_driver_cards": (TANKKARTEN_SHEET,),
+    "report_lkw_fuel_transactions": (STAACK_SHEET, SHELL_SHEET),
+    "report_lkw_revenue_records": (CARLO_SHEET, CONTADO_SHEET),
+    "report_yf_fahrer_monthly": (YF_FAHRER_SHEET,),
+    "report_yf_lkw_daily": (YF_SHEET,),
+    "report_repair_records": (REPAIR_SHEET,),
+}
+FINGERPRINT_SHEETS = tuple(
+    dict.fromkeys([LKW_SHEET, FAHRER_SHEET, *(s for sheets in REPORT_TABLE_SHEETS.values() for s in sheets)])
+)
+# Any change to the extraction code must invalidate stored fingerprints;
+# xlsx_package does the cell decoding (shared strings, dates, number formats).
+EXTRACTOR_SOURCES = (Path(__file__), Path(xlsx_package.__file__))
+
+
+def _extractor_version(paths: Iterable[Path]) -> str:
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+EXTRACTOR_VERSION = _extractor_version(EXTRACTOR_SOURCES)
+
+
+def _ensure_sheet_fingerprints_table(cur) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS etl_sheet_fingerprints (
+            source_name TEXT NOT NULL,
+            sheet_name TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            etl_log_id BIGINT REFERENCES etl_log(id) ON DELETE SET NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (source_name, sheet_name)
+        )
+        """
+    )
+
+
+def _sheet_fingerprints(xlsm_path: Path) -> dict[str, str]:
+    raw = xlsx_package.sheet_fingerprints(xlsm_path, FINGERPRINT_SHEETS)
+    return {
+        name: hashlib.sha1(f"{EXTRACTOR_VERSION}|{fp}".encode("ascii")).hexdigest()
+        for name, fp in raw.items()
+    }
+
+
+def _load_sheet_fingerprints(cur, source_name: str = XLSM_SOURCE_NAME) -> dict[str, str]:
+    cur.execute(
+        "SELECT sheet_name, fingerprint FROM etl_sheet_fingerprints WHERE source_name = %s",
+        (source_name,),
+    )
+    return {str(name): str(fp) for name, fp in cur.fetchall()}
+
+
+def _save_sheet_fingerprints(cur, fingerprints: dict[str, str], log_id: int | None, source_name: str = XLSM_SOURCE_NAME) -> None:
+    if not fingerprints:
+        return
+    names = sorted(fingerprints)
+    cur.execute(
+        """
+        INSERT INTO etl_sheet_fingerprints (source_name, sheet_name, fingerprint, etl_log_id, updated_at)
+        SELECT %s, sheet_name, fingerprint, %s, NOW()
+        FROM unnest(%s::text[], %s::text[]) AS s(sheet_name, fingerprint)
+        ON CONFLICT (source_name, sheet_name) DO UPDATE SET
+            fingerprint = EXCLUDED.fingerprint,
+            etl_log_id = EXCLUDED.etl_log_id,
+            updated_at = NOW()
+        """,
+        (source_name, log_id, names, [fingerprints[n] for n in names]),
+    )
+
+
+def _tables_to_refresh(changed_sheets: set[str]) -> list[str]:
+    return [t for t in REPORT_REPLACE_TABLES if changed_sheets.intersection(REPORT_TABLE_SHEETS[t])]
+
+
+# name -> (extractor, what it feeds: "trucks"/"drivers" master data or a report table)
+EXTRACTORS: dict[str, tuple[Callable[[object], list], str]] = {
+    "trucks": (extract_trucks, "trucks"),
+    "drivers": (extract_drivers, "drivers"),
+    "fahrer_weekly_rows": (extract_fahrer_weekly_statuses, "report_fahrer_weekly_status"),
+    "einnahmen_rows": (extract_einnahmen_months, "report_einnahmen_monthly"),
+    "einnahmen_firm_rows": (extract_einnahmen_firm_rows, "report_einnahmen_firm_monthly"),
+    "bonus_rows": (extract_bonus_dynamik_months, "report_bonus_dynamik_monthly"),
+    "diesel_rows": (extract_diesel_months, "report_diesel_monthly"),
+    "tankkarten_rows": (extract_tankkarten_driver_cards, "report_tankkarten_driver_cards"),
+    "lkw_fuel_rows": (extract_lkw_fuel_transactions, "report_lkw_fuel_transactions"),
+    "lkw_revenue_rows": (extract_lkw_revenue_rows, "report_lkw_revenue_records"),
+    "yf_fahrer_rows": (extract_yf_fahrer_months, "report_yf_fahrer_monthly"),
+    "yf_lkw_rows": (extract_yf_lkw_days, "report_yf_lkw_daily"),
+    "repair_rows": (extract_repairs, "report_repair_records"),
+}
+
+
+def _default_extract_workers() -> int:
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+READER_ENGINE_OPENPYXL = "openpyxl"
+READER_ENGINE_STREAMING = "streaming"
+READER_ENGINES = (READER_ENGINE_OPENPYXL, READER_ENGINE_STREAMING)
+
+
+def _open_workbook(xlsm_path: Path, engine: str = READER_ENGINE_OPENPYXL):
+    """
+    openpyxl: read-only openpyxl workbook.
+    streaming: xlsx_package.StreamingWorkbook, same values without building cell objects.
+    """
+    if engine == READER_ENGINE_OPENPYXL:
+        return openpyxl.load_workbook(xlsm_path, read_only=True, data_only=True, keep_vba=False)
+    if engine == READER_ENGINE_STREAMING:
+        return xlsx_package.StreamingWorkbook(xlsm_path)
+    raise ValueError(f"Unknown reader engine: {engine!r} (expected one of {', '.join(READER_ENGINES)})")
+
+
+# Sheets whose number formats extractors look at (percent detection).
+FORMATTED_SHEETS = (BONUS_DYNAMIK_SHEET,)
+
+
+def _extractor_sheets(name: str) -> tuple[str, ...]:
+    target = EXTRACTORS[name][1]
+    if target == "trucks":
+        return (LKW_SHEET,)
+    if target == "drivers":
+        return (FAHRER_SHEET,)
+    return REPORT_TABLE_SHEETS[target]
+
+
+def _extract_in_worker(
+    xlsm_path: str, names: tuple[str, ...], engine: str = READER_ENGINE_OPENPYXL
+) -> dict[str, list]:
+    # Runs in a pool process: every worker opens its own read-only workbook.
+    # Extractors read through a SheetCache so a sheet shared by several of
+    # them (Fahrer, Bericht_Dispo) is parsed once and dropped after its last one.
+    consumers: dict[str, int] = {}
+    for name in names:
+        for sheet in _extractor_sheets(name):
+            consumers[sheet] = consumers.get(sheet, 0) + 1
+    cache = xlsx_package.SheetCache(
+        _open_workbook(Path(xlsm_path), engine), consumers, formatted_sheets=FORMATTED_SHEETS
+    )
+    try:
+        result: dict[str, list] = {}
+        for name in names:
+            result[name] = EXTRACTORS[name][0](cache)
+            cache.release(_extractor_sheets(name))
+        return result
+    finally:
+        cache.close()
+
+
+def _extraction_groups(names: list[str]) -> list[tuple[str, ...]]:
+    """Extractors that share a sheet go to the same worker, so it is parsed once."""
+    groups: list[tuple[list[str], set[str]]] = []
+    for name in names:
+        sheets = set(_extractor_sheets(name))
+        merged = [g for g in groups if g[1] & sheets]
+        members = [n for g in merged for n in g[0]] + [name]
+        for g in merged:
+            sheets |= g[1]
+            groups.remove(g)
+        groups.append((members, sheets))
+    return [tuple(n for n in names if n in set(members)) for members, _ in groups]
+
+
+def _run_extractors(
+    xlsm_path: Path, names: Iterable[str], workers: int = 1, engine: str = READER_ENGINE_OPENPYXL
+) -> dict[str, list]:
+    """
+    Run the named extractors and return {name: rows}.
+
+    workers <= 1 runs them sequentially over one workbook; otherwise each
+    group of extractors sharing a sheet runs in a ProcessPoolExecutor worker.
+    Extractors are pure, so both modes return the same rows.
+    """
+    names = [name for name in EXTRACTORS if name in set(names)]
+    if not names:
+        return {}
+    groups = _extraction_groups(names)
+    if workers <= 1 or len(groups) == 1:
+        return _extract_in_worker(str(xlsm_path), tuple(names), engine)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+        futures = [pool.submit(_extract_in_worker, str(xlsm_path), group, engine) for group in groups]
+        merged: dict[str, list] = {}
+        for future in futures:
+            merged.update(future.result())
+        return {name: merged[name] for name in names}
+
+
+def run_etl(
+    database_url: str,
+    xlsm_path: Path,
+    load_mode: str = LOAD_MODE_COPY,
+    swap_mode: str = SWAP_MODE_RENAME,
+    full_refresh: bool = False,
+    extract_workers: int | None = None,
+    reader_engine: str = READER_ENGINE_OPENPYXL,
+    conn=None,
+    lookups: dict | None = None,
+) -> dict[str, int]:
+    """
+    Sheets whose fingerprint matches the last successful run are neither
+    extracted nor reloaded; full_refresh=True ignores stored fingerprints.
+    extract_workers > 1 extracts sheets in parallel processes; reader_engine
+    picks the workbook reader (see _open_workbook).
+    conn reuses an open connection (left open); lookups, when given, receives
+    the truck/driver lookup rows read in the master-data transaction.
+    """
+    if extract_workers is None:
+        extract_workers = _default_extract_workers()
+    if load_mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode: {load_mode!r} (expected one of {', '.join(LOAD_MODES)})")
+    if swap_mode not in SWAP_MODES:
+        raise ValueError(f"Unknown swap mode: {swap_mode!r} (expected one of {', '.join(SWAP_MODES)})")
+    if reader_engine not in READER_ENGINES:
+        raise ValueError(f"Unknown reader engine: {reader_engine!r} (expected one of {', '.join(READER_ENGINES)})")
     psycopg = _lazy_import_psycopg()
     created_copy = False
     readable_path = xlsm_path
     log_id = None
 
-    with psycopg.connect(database_url) as conn:
+    with etl_db.connection(psycopg, database_url, conn) as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -1928,28 +2536,52 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                 VALUES (%s, 'running', %s::jsonb)
                 RETURNING id
                 """,
-                ("xlsm_lkw_fahrer_data", json.dumps({"source_path": str(xlsm_path)}, ensure_ascii=False)),
+                (XLSM_SOURCE_NAME, json.dumps({"source_path": str(xlsm_path)}, ensure_ascii=False)),
             )
             log_id = int(cur.fetchone()[0])
+            etl_db.ensure_source_status_table(cur)
         conn.commit()
 
         try:
             readable_path, created_copy = _prepare_readable_xlsm(xlsm_path)
-            wb = openpyxl.load_workbook(readable_path, read_only=True, data_only=True, keep_vba=False)
-            trucks = extract_trucks(wb)
-            drivers = extract_drivers(wb)
-            fahrer_weekly_rows = extract_fahrer_weekly_statuses(wb)
-            einnahmen_rows = extract_einnahmen_months(wb)
-            einnahmen_firm_rows = extract_einnahmen_firm_rows(wb)
-            bonus_rows = extract_bonus_dynamik_months(wb)
-            diesel_rows = extract_diesel_months(wb)
-            tankkarten_rows = extract_tankkarten_driver_cards(wb)
-            lkw_fuel_rows = extract_lkw_fuel_transactions(wb)
-            lkw_revenue_rows = extract_lkw_revenue_rows(wb)
-            yf_fahrer_rows = extract_yf_fahrer_months(wb)
-            yf_lkw_rows = extract_yf_lkw_days(wb)
-            repair_rows = extract_repairs(wb)
-            wb.close()
+            sheet_fingerprints = _sheet_fingerprints(readable_path)
+            with conn.cursor() as cur:
+                _ensure_sheet_fingerprints_table(cur)
+                stored_fingerprints = {} if full_refresh else _load_sheet_fingerprints(cur)
+            conn.commit()
+            changed_fingerprints = {
+                name: fp for name, fp in sheet_fingerprints.items() if stored_fingerprints.get(name) != fp
+            }
+            changed_sheets = set(changed_fingerprints)
+            refresh_tables = _tables_to_refresh(changed_sheets)
+            skipped_tables = [t for t in REPORT_REPLACE_TABLES if t not in refresh_tables]
+
+            refresh_targets = set(refresh_tables)
+            if LKW_SHEET in changed_sheets:
+                refresh_targets.add("trucks")
+            if FAHRER_SHEET in changed_sheets:
+                refresh_targets.add("drivers")
+            extract_started = time.perf_counter()
+            extracted = _run_extractors(
+                readable_path,
+                [name for name, (_, target) in EXTRACTORS.items() if target in refresh_targets],
+                workers=extract_workers,
+                engine=reader_engine,
+            )
+            extract_sec = round(time.perf_counter() - extract_started, 3)
+            trucks: list[TruckRow] = extracted.get("trucks", [])
+            drivers: list[DriverRow] = extracted.get("drivers", [])
+            fahrer_weekly_rows: list[FahrerWeekStatusRow] = extracted.get("fahrer_weekly_rows", [])
+            einnahmen_rows: list[EinnahmenMonthRow] = extracted.get("einnahmen_rows", [])
+            einnahmen_firm_rows: list[EinnahmenFirmRow] = extracted.get("einnahmen_firm_rows", [])
+            bonus_rows: list[BonusDynamikRow] = extracted.get("bonus_rows", [])
+            diesel_rows: list[DieselMonthRow] = extracted.get("diesel_rows", [])
+            tankkarten_rows: list[TankkartenDriverCardRow] = extracted.get("tankkarten_rows", [])
+            lkw_fuel_rows: list[LkwFuelTransactionRow] = extracted.get("lkw_fuel_rows", [])
+            lkw_revenue_rows: list[LkwRevenueRow] = extracted.get("lkw_revenue_rows", [])
+            yf_fahrer_rows: list[YFFahrerMonthRow] = extracted.get("yf_fahrer_rows", [])
+            yf_lkw_rows: list[YFLkwDayRow] = extracted.get("yf_lkw_rows", [])
+            repair_rows: list[RepairRow] = extracted.get("repair_rows", [])
 
             company_names = sorted(
                 {
@@ -1960,9 +2592,7 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
             )
 
             with conn.cursor() as cur:
-                company_ids: dict[str, int] = {}
-                for name in company_names:
-                    company_ids[name] = _upsert_company(cur, name)
+                company_ids = _upsert_companies(cur, company_names)
 
                 _ensure_einnahmen_table(cur)
                 _ensure_einnahmen_firm_table(cur)
@@ -1975,77 +2605,19 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                 _ensure_yf_lkw_table(cur)
                 _ensure_fahrer_weekly_status_table(cur)
                 _ensure_repair_table(cur)
-                _ensure_report_staging_tables(cur)
+                _ensure_report_staging_tables(cur, refresh_tables)
 
                 rows_inserted = 0
                 rows_updated = 0
                 rows_deleted = 0
 
-                for t in trucks:
-                    company_id = company_ids.get(t.company_name or "")
-                    cur.execute(
-                        """
-                        INSERT INTO trucks (
-                            external_id, plate_number, truck_type, company_id, status, status_since,
-                            is_active, source_row_hash, raw_payload, updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, NULL, %s::jsonb, NOW())
-                        ON CONFLICT (external_id) DO UPDATE SET
-                            plate_number = EXCLUDED.plate_number,
-                            truck_type = EXCLUDED.truck_type,
-                            company_id = EXCLUDED.company_id,
-                            status = EXCLUDED.status,
-                            status_since = EXCLUDED.status_since,
-                            is_active = EXCLUDED.is_active,
-                            raw_payload = EXCLUDED.raw_payload,
-                            updated_at = NOW()
-                        RETURNING (xmax = 0) AS inserted
-                        """,
-                        (
-                            t.external_id,
-                            t.plate_number,
-                            t.truck_type,
-                            company_id,
-                            t.status,
-                            t.status_since,
-                            t.is_active,
-                            json.dumps(t.raw_payload, ensure_ascii=False),
-                        ),
-                    )
-                    inserted = bool(cur.fetchone()[0])
-                    rows_inserted += 1 if inserted else 0
-                    rows_updated += 0 if inserted else 1
+                inserted, updated, trucks_unchanged = _upsert_trucks(cur, trucks, company_ids)
+                rows_inserted += inserted
+                rows_updated += updated
 
-                for d in drivers:
-                    company_id = company_ids.get(d.company_name or "")
-                    cur.execute(
-                        """
-                        INSERT INTO drivers (
-                            external_id, full_name, phone, company_id, is_active,
-                            source_row_hash, raw_payload, updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, NULL, %s::jsonb, NOW())
-                        ON CONFLICT (external_id) DO UPDATE SET
-                            full_name = EXCLUDED.full_name,
-                            phone = EXCLUDED.phone,
-                            company_id = EXCLUDED.company_id,
-                            is_active = EXCLUDED.is_active,
-                            raw_payload = EXCLUDED.raw_payload,
-                            updated_at = NOW()
-                        RETURNING (xmax = 0) AS inserted
-                        """,
-                        (
-                            d.external_id,
-                            d.full_name,
-                            d.phone,
-                            company_id,
-                            d.is_active,
-                            json.dumps(d.raw_payload, ensure_ascii=False),
-                        ),
-                    )
-                    inserted = bool(cur.fetchone()[0])
-                    rows_inserted += 1 if inserted else 0
-                    rows_updated += 0 if inserted else 1
+                inserted, updated, drivers_unchanged = _upsert_drivers(cur, drivers, company_ids)
+                rows_inserted += inserted
+                rows_updated += updated
 
                 truck_external_ids = [t.external_id for t in trucks]
                 if truck_external_ids:
@@ -2055,6 +2627,7 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                         SET
                             is_active = FALSE,
                             status = COALESCE(NULLIF(status, ''), 'inactive'),
+                            source_row_hash = NULL,
                             updated_at = NOW()
                         WHERE external_id IS NOT NULL
                           AND upper(external_id) LIKE 'L%%'
@@ -2072,6 +2645,7 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                         UPDATE drivers
                         SET
                             is_active = FALSE,
+                            source_row_hash = NULL,
                             updated_at = NOW()
                         WHERE external_id IS NOT NULL
                           AND upper(external_id) LIKE 'F%%'
@@ -2082,406 +2656,30 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                     )
                     rows_updated += cur.rowcount
 
-                for rec in fahrer_weekly_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_fahrer_weekly_status (
-                            report_year,
-                            iso_week,
-                            week_start,
-                            week_end,
-                            fahrer_id,
-                            fahrer_name,
-                            company_name,
-                            status_entlassen,
-                            datum_entlassen,
-                            week_code,
-                            is_active_in_week,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
-                        (
-                            rec.report_year,
-                            rec.iso_week,
-                            rec.week_start,
-                            rec.week_end,
-                            rec.fahrer_id,
-                            rec.fahrer_name,
-                            rec.company_name,
-                            rec.status_entlassen,
-                            rec.datum_entlassen,
-                            rec.week_code,
-                            rec.is_active_in_week,
-                            json.dumps(rec.raw_payload, ensure_ascii=False, default=str),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in einnahmen_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_einnahmen_monthly (
-                            month_index,
-                            month_name,
-                            nahverkehr,
-                            logistics,
-                            gesamt,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
-                        (
-                            rec.month_index,
-                            rec.month_name,
-                            rec.nahverkehr,
-                            rec.logistics,
-                            rec.gesamt,
-                            json.dumps(rec.raw_payload, ensure_ascii=False),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in einnahmen_firm_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_einnahmen_firm_monthly (
-                            row_index,
-                            firm_name,
-                            january,
-                            february,
-                            march,
-                            april,
-                            may,
-                            june,
-                            july,
-                            august,
-                            september,
-                            october,
-                            november,
-                            december,
-                            total,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW()
-                        )
-                        """,
-                        (
-                            rec.row_index,
-                            rec.firm_name,
-                            rec.january,
-                            rec.february,
-                            rec.march,
-                            rec.april,
-                            rec.may,
-                            rec.june,
-                            rec.july,
-                            rec.august,
-                            rec.september,
-                            rec.october,
-                            rec.november,
-                            rec.december,
-                            rec.total,
-                            json.dumps(rec.raw_payload, ensure_ascii=False),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in bonus_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_bonus_dynamik_monthly (
-                            report_year,
-                            report_month,
-                            month_start,
-                            fahrer_id,
-                            fahrer_name,
-                            days,
-                            km,
-                            pct_km,
-                            ct,
-                            pct_ct,
-                            bonus,
-                            penalty,
-                            final,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW()
-                        )
-                        """,
-                        (
-                            rec.report_year,
-                            rec.report_month,
-                            rec.month_start,
-                            rec.fahrer_id,
-                            rec.fahrer_name,
-                            rec.days,
-                            rec.km,
-                            rec.pct_km,
-                            rec.ct,
-                            rec.pct_ct,
-                            rec.bonus,
-                            rec.penalty,
-                            rec.final,
-                            json.dumps(rec.raw_payload, ensure_ascii=False),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in diesel_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_diesel_monthly (
-                            report_year,
-                            month_index,
-                            month_name,
-                            liter_staack,
-                            liter_shell,
-                            liter_dkv,
-                            liter_total,
-                            euro_staack,
-                            euro_shell,
-                            euro_dkv,
-                            euro_total,
-                            euro_per_liter_staack,
-                            euro_per_liter_shell,
-                            euro_per_liter_dkv,
-                            euro_per_liter_avg,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW()
-                        )
-                        """,
-                        (
-                            rec.report_year,
-                            rec.month_index,
-                            rec.month_name,
-                            rec.liter_staack,
-                            rec.liter_shell,
-                            rec.liter_dkv,
-                            rec.liter_total,
-                            rec.euro_staack,
-                            rec.euro_shell,
-                            rec.euro_dkv,
-                            rec.euro_total,
-                            rec.euro_per_liter_staack,
-                            rec.euro_per_liter_shell,
-                            rec.euro_per_liter_dkv,
-                            rec.euro_per_liter_avg,
-                            json.dumps(rec.raw_payload, ensure_ascii=False),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in tankkarten_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_tankkarten_driver_cards (
-                            source_row,
-                            card_number,
-                            tankstelle,
-                            pin,
-                            lkw_number,
-                            wo_gespeichert,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
-                        (
-                            rec.source_row,
-                            rec.card_number,
-                            rec.tankstelle,
-                            rec.pin,
-                            rec.lkw_number,
-                            rec.wo_gespeichert,
-                            json.dumps(rec.raw_payload, ensure_ascii=False, default=str),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in lkw_fuel_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_lkw_fuel_transactions (
-                            source,
-                            source_row,
-                            report_year,
-                            report_month,
-                            iso_week,
-                            transaction_date,
-                            lkw_number,
-                            product_name,
-                            quantity_liters,
-                            total_net,
-                            driver_name,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
-                        (
-                            rec.source,
-                            rec.source_row,
-                            rec.report_year,
-                            rec.report_month,
-                            rec.iso_week,
-                            rec.transaction_date,
-                            rec.lkw_number,
-                            rec.product_name,
-                            rec.quantity_liters,
-                            rec.total_net,
-                            rec.driver_name,
-                            json.dumps(rec.raw_payload, ensure_ascii=False, default=str),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in lkw_revenue_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_lkw_revenue_records (
-                            source,
-                            source_row,
-                            report_year,
-                            report_month,
-                            iso_week,
-                            lkw_number,
-                            revenue_amount,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
-                        (
-                            rec.source,
-                            rec.source_row,
-                            rec.report_year,
-                            rec.report_month,
-                            rec.iso_week,
-                            rec.lkw_number,
-                            rec.revenue_amount,
-                            json.dumps(rec.raw_payload, ensure_ascii=False, default=str),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in yf_fahrer_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_yf_fahrer_monthly (
-                            month_index,
-                            fahrer_name,
-                            distanz_km,
-                            aktivitaet_total_minutes,
-                            fahrzeit_total_minutes,
-                            inaktivitaet_total_minutes,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
-                        (
-                            rec.month_index,
-                            rec.fahrer_name,
-                            rec.distanz_km,
-                            rec.aktivitaet_total_minutes,
-                            rec.fahrzeit_total_minutes,
-                            rec.inaktivitaet_total_minutes,
-                            json.dumps(rec.raw_payload, ensure_ascii=False, default=str),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in yf_lkw_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_yf_lkw_daily (
-                            report_year,
-                            month_index,
-                            month_name,
-                            iso_week,
-                            lkw_nummer,
-                            report_date,
-                            source_row,
-                            dayweek,
-                            strecke_km,
-                            km_start,
-                            km_end,
-                            drivers_final,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
-                        (
-                            rec.report_year,
-                            rec.month_index,
-                            rec.month_name,
-                            rec.iso_week,
-                            rec.lkw_nummer,
-                            rec.report_date,
-                            rec.source_row,
-                            rec.dayweek,
-                            rec.strecke_km,
-                            rec.km_start,
-                            rec.km_end,
-                            rec.drivers_final,
-                            json.dumps(rec.raw_payload, ensure_ascii=False, default=str),
-                        ),
-                    )
-                    rows_inserted += 1
-
-                for rec in repair_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO tmp_report_repair_records (
-                            source_row,
-                            report_year,
-                            report_month,
-                            iso_week,
-                            invoice_date,
-                            truck_number,
-                            original_truck_number,
-                            repair_name,
-                            total_price,
-                            invoice,
-                            seller,
-                            buyer,
-                            kategorie,
-                            raw_payload,
-                            updated_at
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
-                        """,
-                        (
-                            rec.source_row,
-                            rec.report_year,
-                            rec.report_month,
-                            rec.iso_week,
-                            rec.invoice_date,
-                            rec.truck_number,
-                            rec.original_truck_number,
-                            rec.repair_name,
-                            rec.total_price,
-                            rec.invoice,
-                            rec.seller,
-                            rec.buyer,
-                            rec.kategorie,
-                            json.dumps(rec.raw_payload, ensure_ascii=False, default=str),
-                        ),
-                    )
-                    rows_inserted += 1
+                master_lookups = etl_db.fetch_master_lookups(cur) if lookups is not None else None
+
+                report_rows: dict[str, list] = {
+                    "report_fahrer_weekly_status": fahrer_weekly_rows,
+                    "report_einnahmen_monthly": einnahmen_rows,
+                    "report_einnahmen_firm_monthly": einnahmen_firm_rows,
+                    "report_bonus_dynamik_monthly": bonus_rows,
+                    "report_diesel_monthly": diesel_rows,
+                    "report_tankkarten_driver_cards": tankkarten_rows,
+                    "report_lkw_fuel_transactions": lkw_fuel_rows,
+                    "report_lkw_revenue_records": lkw_revenue_rows,
+                    "report_yf_fahrer_monthly": yf_fahrer_rows,
+                    "report_yf_lkw_daily": yf_lkw_rows,
+                    "report_repair_records": repair_rows,
+                }
+                staging_started = time.perf_counter()
+                for table_name in refresh_tables:
+                    rows_inserted += _stage_report_rows(cur, table_name, report_rows[table_name], load_mode)
+                staging_load_sec = round(time.perf_counter() - staging_started, 3)
 
-                rows_deleted += _swap_report_staging_tables(cur)
+                rows_deleted += _swap_report_staging_tables(
+                    cur, swap_mode, retire_suffix=f"old_{log_id}", tables=refresh_tables
+                )
+                _save_sheet_fingerprints(cur, changed_fingerprints, log_id)
 
                 cur.execute(
                     """
@@ -2506,6 +2704,8 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                                 "companies": len(company_names),
                                 "trucks": len(trucks),
                                 "drivers": len(drivers),
+                                "trucks_unchanged": trucks_unchanged,
+                                "drivers_unchanged": drivers_unchanged,
                                 "fahrer_weekly_rows": len(fahrer_weekly_rows),
                                 "einnahmen_months": len(einnahmen_rows),
                                 "einnahmen_firms": len(einnahmen_firm_rows),
@@ -2518,13 +2718,27 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                                 "yf_lkw_rows": len(yf_lkw_rows),
                                 "repair_rows": len(repair_rows),
                                 "workbook_used": str(readable_path),
+                                "load_mode": load_mode,
+                                "staging_load_sec": staging_load_sec,
+                                "swap_mode": swap_mode,
+                                "full_refresh": full_refresh,
+                                "extract_workers": extract_workers,
+                                "reader_engine": reader_engine,
+                                "extract_sec": extract_sec,
+                                "changed_sheets": sorted(changed_sheets),
+                                "skipped_tables": skipped_tables,
                             },
                             ensure_ascii=False,
                         ),
                         log_id,
                     ),
                 )
+                etl_db.record_source_success(cur, log_id)
             conn.commit()
+            if master_lookups is not None:
+                lookups["master"] = master_lookups
+            if swap_mode == SWAP_MODE_RENAME:
+                _drop_retired_report_tables(conn)
 
             return {
                 "companies": len(company_names),
@@ -2541,9 +2755,12 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                 "yf_fahrer_rows": len(yf_fahrer_rows),
                 "yf_lkw_rows": len(yf_lkw_rows),
                 "repair_rows": len(repair_rows),
+                "skipped_tables": len(skipped_tables),
+                "master_unchanged": trucks_unchanged + drivers_unchanged,
             }
 
         except Exception as exc:
+            conn.rollback()
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -2563,22 +2780,76 @@ def run_etl(database_url: str, xlsm_path: Path) -> dict[str, int]:
                     pass
 
 
-def main() -> int:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Import LKW/Fahrer master data from XLSM to PostgreSQL.")
     parser.add_argument("--database-url", default="", help="Override DATABASE_URL from env")
     parser.add_argument("--xlsm-path", default="", help="Override EXCEL_FILE_PATH from env")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--load-mode",
+        default="",
+        choices=("", *LOAD_MODES),
+        help="Staging load mode: copy (default) or rows; overrides ETL_XLSM_LOAD_MODE",
+    )
+    parser.add_argument(
+        "--swap-mode",
+        default="",
+        choices=("", *SWAP_MODES),
+        help="Report table swap: rename (default) or delete; overrides ETL_XLSM_SWAP_MODE",
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Ignore stored sheet fingerprints and reload every sheet",
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=None,
+        help="Parallel extraction processes (1 = sequential); overrides ETL_XLSM_EXTRACT_WORKERS",
+    )
+    parser.add_argument(
+        "--reader-engine",
+        default="",
+        choices=("", *READER_ENGINES),
+        help="Workbook reader: openpyxl (default) or streaming; overrides ETL_XLSM_READER_ENGINE",
+    )
+    return parser.parse_args(argv)
 
-    load_dotenv(override=True)
+
+def run_kwargs(args: argparse.Namespace) -> dict[str, object]:
+    """run_etl keyword arguments from CLI args with env fallbacks (call after load_dotenv)."""
     database_url = (args.database_url or os.getenv("DATABASE_URL", "")).strip()
     xlsm_raw = (args.xlsm_path or os.getenv("EXCEL_FILE_PATH", "")).strip()
+    load_mode = (args.load_mode or os.getenv("ETL_XLSM_LOAD_MODE", "") or LOAD_MODE_COPY).strip().lower()
+    swap_mode = (args.swap_mode or os.getenv("ETL_XLSM_SWAP_MODE", "") or SWAP_MODE_RENAME).strip().lower()
+    extract_workers = args.extract_workers
+    if extract_workers is None:
+        raw_workers = os.getenv("ETL_XLSM_EXTRACT_WORKERS", "").strip()
+        extract_workers = int(raw_workers) if raw_workers.isdigit() else _default_extract_workers()
+    reader_engine = (
+        args.reader_engine or os.getenv("ETL_XLSM_READER_ENGINE", "") or READER_ENGINE_OPENPYXL
+    ).strip().lower()
 
     if not database_url:
         raise RuntimeError("DATABASE_URL is empty. Set it in .env or pass --database-url.")
     if not xlsm_raw:
         raise RuntimeError("EXCEL_FILE_PATH is empty. Set it in .env or pass --xlsm-path.")
 
-    result = run_etl(database_url=database_url, xlsm_path=Path(xlsm_raw))
+    return {
+        "database_url": database_url,
+        "xlsm_path": Path(xlsm_raw),
+        "load_mode": load_mode,
+        "swap_mode": swap_mode,
+        "full_refresh": args.full_refresh,
+        "extract_workers": extract_workers,
+        "reader_engine": reader_engine,
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    load_dotenv(override=True)
+    result = run_etl(**run_kwargs(args))
     print(
         f"ETL success: companies={result['companies']} "
         f"trucks={result['trucks']} drivers={result['drivers']} "
@@ -2592,7 +2863,9 @@ def main() -> int:
         f"lkw_revenue_rows={result['lkw_revenue_rows']} "
         f"yf_fahrer_rows={result['yf_fahrer_rows']} "
         f"yf_lkw_rows={result['yf_lkw_rows']} "
-        f"repair_rows={result['repair_rows']}"
+        f"repair_rows={result['repair_rows']} "
+        f"skipped_tables={result['skipped_tables']} "
+        f"master_unchanged={result['master_unchanged']}"
     )
     return 0
 
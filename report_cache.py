@@ -0,0 +1,175 @@
+"""
+On-disk cache of rendered reports (PDF + XLSX).
+
+Entries are content-addressed: the key hashes report type, parameters,
+the report_config entry and a data-version token, which is the newest
+etl_log id that loaded data (etl_source_status) plus a fingerprint of the
+source workbook (EXCEL_FILE_PATH: sheet data and VBA parts). Any ETL
+import or workbook edit therefore produces new keys; stale entries are
+never served, they just age out.
+
+Eviction: entries older than REPORT_CACHE_MAX_AGE_HOURS go first, then
+least recently used ones until the directory fits REPORT_CACHE_MAX_MB.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import db_pool
+import etl_db
+import xlsx_package
+
+logger = logging.getLogger("lkw_report_bot.report_cache")
+
+# Parts of the source workbook that can change a rendered report.
+WORKBOOK_FINGERPRINT_PARTS = (*xlsx_package.EXTRACTION_PART_PREFIXES, "xl/vbaProject")
+MANIFEST = "manifest.json"
+
+
+def _env_number(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+class ReportCache:
+    def __init__(self, root: Path, max_bytes: int, max_age_sec: float):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        self._fingerprints: dict[tuple[str, int, int], str] = {}
+
+    @classmethod
+    def from_env(cls) -> "ReportCache | None":
+        if str(os.getenv("REPORT_CACHE_ENABLED", "true")).strip().lower() in {"0", "false", "no", "off"}:
+            return None
+        root = os.path.expandvars(os.getenv("REPORT_CACHE_DIR", "") or r"%TEMP%\lkw_report_cache").strip()
+        return cls(
+            Path(root),
+            max_bytes=int(_env_number("REPORT_CACHE_MAX_MB", 500) * 1024 * 1024),
+            max_age_sec=_env_number("REPORT_CACHE_MAX_AGE_HOURS", 168) * 3600,
+        )
+
+    # --- keys ------------------------------------------------------------
+
+    def workbook_fingerprint(self, path: Path) -> str:
+        """Content fingerprint of the source workbook, recomputed only when its size/mtime change."""
+        st = path.stat()
+        stat_key = (str(path), int(st.st_size), int(st.st_mtime_ns))
+        fingerprint = self._fingerprints.get(stat_key)
+        if fingerprint is None:
+            fingerprint = xlsx_package.content_fingerprint(path, WORKBOOK_FINGERPRINT_PARTS)
+            self._fingerprints = {stat_key: fingerprint}
+        return fingerprint
+
+    async def data_version(self) -> str | None:
+        """None when the version cannot be established; callers must then bypass the cache."""
+        pool = db_pool.get_pool()
+        source = (os.getenv("EXCEL_FILE_PATH") or "").strip()
+        if pool is None or not source:
+            return None
+        try:
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(etl_db.DATA_VERSION_SQL)
+                    row = await cur.fetchone()
+            fingerprint = await asyncio.to_thread(self.workbook_fingerprint, Path(source))
+        except Exception as exc:
+            logger.warning("Report cache bypassed: data version unavailable (%s)", exc)
+            return None
+        return f"etl:{int(row[0]) if row else 0}|wb:{fingerprint}"
+
+    @staticmethod
+    def key(report_type: str, year: int, week: int, data_version: str) -> str:
+        from report_config import get_report_config
+
+        try:
+            config = json.dumps(get_report_config(report_type), sort_keys=True, default=str)
+        except KeyError:
+            config = ""
+        raw = f"{report_type}|{int(year)}|{int(week)}|{data_version}|{config}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- entries ---------------------------------------------------------
+
+    def get(self, key: str) -> tuple[str, str] | None:
+        entry = self.root / key
+        try:
+            manifest = json.loads((entry / MANIFEST).read_text(encoding="utf-8"))
+            if time.time() - float(manifest["created_at"]) > self.max_age_sec:
+                return None
+            xlsx, pdf = entry / manifest["xlsx"], entry / manifest["pdf"]
+            if not (xlsx.exists() and pdf.exists()):
+                return None
+            os.utime(entry / MANIFEST)  # LRU clock
+        except (OSError, ValueError, KeyError):
+            return None
+        return str(xlsx), str(pdf)
+
+    def put(self, key: str, xlsx_path: str, pdf_path: str, meta: dict | None = None) -> tuple[str, str]:
+        """Moves the rendered files into the cache and returns their cached paths."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".tmp-{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            names = {}
+            for kind, src in (("xlsx", xlsx_path), ("pdf", pdf_path)):
+                names[kind] = os.path.basename(src)
+                shutil.move(src, staging / names[kind])
+            manifest = {"created_at": time.time(), **names, **(meta or {})}
+            (staging / MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+            entry = self.root / key
+            if entry.exists():
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(staging, entry)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.evict()
+        return str(entry / names["xlsx"]), str(entry / names["pdf"])
+
+    def evict(self) -> int:
+        """Drops expired entries, then least recently used ones until under max_bytes. Returns the count removed."""
+        if not self.root.exists():
+            return 0
+        now = time.time()
+        entries = []
+        removed = 0
+        for entry in self.root.iterdir():
+            if not entry.is_dir():
+                continue
+            try:
+                files = [p for p in entry.iterdir() if p.is_file()]
+                used_at = (entry / MANIFEST).stat().st_mtime
+                created_at = float(json.loads((entry / MANIFEST).read_text(encoding="utf-8"))["created_at"])
+            except (OSError, ValueError, KeyError):
+                # Half-written staging dir or a broken entry: drop once it is clearly abandoned.
+                if now - entry.stat().st_mtime > 3600:
+                    shutil.rmtree(entry, ignore_errors=True)
+                    removed += 1
+                continue
+            if now - created_at > self.max_age_sec:
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+                continue
+            entries.append((used_at, sum(p.stat().st_size for p in files), entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _used_at, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,481 @@
+"""
+Report job queue on top of reports_log.
+
+Every request (bot menu, Mini App /api/generate, scheduler) becomes a
+reports_log row. Requests for the same (report_type, year, week) that are
+still queued share one job, so N waiting chats cost one Excel run and the
+result fans out to all of them. A single worker runs jobs in FIFO order
+under the Excel lock and records status, duration_ms and output_key per
+row. Each row carries the owning queue's instance id and a heartbeat
+the owner refreshes every HEARTBEAT_SEC; recover() (and the heartbeat of
+a queue that can deliver, i.e. has .bot) only claims rows whose owner
+stopped heartbeating for STALE_AFTER_SEC, so several processes with their
+own queues never run or deliver each other's requests twice.
+
+With a ReportCache, a request whose report is already rendered for the
+current data version is answered straight from disk at submit time,
+without waiting behind the Excel worker.
+
+reports_log writes go through the shared db_pool and are best effort:
+without a DB the queue still works, it just does not persist.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import db_pool
+from report_cache import ReportCache
+from telegram_file_cache import get_file_cache
+from telegram_sender import get_sender
+
+logger = logging.getLogger("lkw_report_bot.queue")
+
+REPORT_TIMEOUT_SEC = 30 * 60
+RECOVER_MAX_AGE_HOURS = 24
+HEARTBEAT_SEC = 30
+STALE_AFTER_SEC = 120
+
+OWNER_COLUMNS_DDL = """
+ALTER TABLE reports_log
+    ADD COLUMN IF NOT EXISTS owner_id TEXT,
+    ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ
+"""
+
+JobKey = tuple[str, int, int]
+
+
+@dataclass
+class ReportResult:
+    report_type: str
+    year: int
+    week: int
+    xlsx_path: str | None = None
+    pdf_path: str | None = None
+    error: BaseException | None = None
+    duration_ms: int = 0
+    cached: bool = False  # paths live in the report cache: serve, never delete
+
+
+@dataclass
+class ReportWaiter:
+    user_id: int
+    chat_id: int
+    log_id: int | None = None
+    on_start: Callable[["ReportWaiter"], Awaitable[None]] | None = None
+    on_done: Callable[["ReportWaiter", ReportResult], Awaitable[None]] | None = None
+    caption: str | None = None
+
+
+@dataclass
+class ReportTicket:
+    log_id: int | None
+    position: int  # 1 = next to run (or running), 0 = served from the report cache
+    coalesced: bool
+
+
+@dataclass
+class _Job:
+    key: JobKey
+    waiters: list[ReportWaiter] = field(default_factory=list)
+
+
+class ReportQueue:
+    def __init__(
+        self,
+        run_report_fn: Callable[[str, int, int], tuple],
+        excel_lock: asyncio.Lock | None = None,
+        timeout_sec: float = REPORT_TIMEOUT_SEC,
+        cache: ReportCache | None = None,
+    ):
+        self.run_report_fn = run_report_fn
+        self.excel_lock = excel_lock
+        self.cache = cache
+        self.timeout_sec = timeout_sec
+        self.bot = None  # used to deliver results of recovered jobs (no live on_done)
+        self._queued: OrderedDict[JobKey, _Job] = OrderedDict()
+        self._running: _Job | None = None
+        self._wakeup = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self._heartbeat: asyncio.Task | None = None
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._schema_ready = False
+
+    # --- enqueue ---------------------------------------------------------
+
+    def position(self, key: JobKey) -> int:
+        if self._running is not None and self._running.key == key:
+            return 1
+        offset = 1 if self._running is not None else 0
+        for index, queued_key in enumerate(self._queued, start=1):
+            if queued_key == key:
+                return offset + index
+        return 0
+
+    def _attach(self, key: JobKey, waiter: ReportWaiter) -> bool:
+        job = self._queued.get(key)
+        coalesced = job is not None
+        if job is None:
+            job = self._queued[key] = _Job(key)
+        job.waiters.append(waiter)
+        self._wakeup.set()
+        self._ensure_worker()
+        return coalesced
+
+    async def submit(
+        self,
+        user_id: int,
+        chat_id: int,
+        report_type: str,
+        year: int,
+        week: int,
+        on_start: Callable[[ReportWaiter], Awaitable[None]] | None = None,
+        on_done: Callable[[ReportWaiter, ReportResult], Awaitable[None]] | None = None,
+        caption: str | None = None,
+        source: str = "bot",
+    ) -> ReportTicket:
+        key = (report_type, int(year), int(week))
+        started = time.perf_counter()
+        hit = await self._cache_lookup(key)
+        if hit is not None:
+            hit.duration_ms = int((time.perf_counter() - started) * 1000)
+            log_id = await self._log_cache_hit(user_id, chat_id, key, hit, {"source": source, "caption": caption})
+            waiter = ReportWaiter(user_id, chat_id, log_id, on_start, on_done, caption)
+            logger.info("REPORT CACHE HIT log_id=%s user=%s key=%s ms=%s", log_id, user_id, key, hit.duration_ms)
+            asyncio.get_running_loop().create_task(self._call(on_done or self._deliver, waiter, hit))
+            return ReportTicket(log_id, 0, False)
+
+        log_id = await self._log_queued(user_id, chat_id, key, {"source": source, "caption": caption})
+        waiter = ReportWaiter(user_id, chat_id, log_id, on_start, on_done, caption)
+        coalesced = self._attach(key, waiter)
+        position = self.position(key)
+        logger.info(
+            "REPORT QUEUED log_id=%s user=%s key=%s position=%s coalesced=%s",
+            log_id, user_id, key, position, coalesced,
+        )
+        return ReportTicket(log_id, position, coalesced)
+
+    async def recover(self) -> int:
+        """Re-enqueue reports_log rows left queued/running by a process that stopped heartbeating."""
+        if db_pool.get_pool() is None:
+            return 0
+        await self._execute(
+            """
+            UPDATE reports_log
+            SET status = 'failed', completed_at = NOW(), error_message = 'expired after restart'
+            WHERE status IN ('queued', 'running')
+              AND requested_at < NOW() - make_interval(hours => %s)
+            """,
+            (RECOVER_MAX_AGE_HOURS,),
+        )
+        self._ensure_heartbeat()
+        return await self._claim_stale()
+
+    async def _claim_stale(self) -> int:
+        pool = db_pool.get_pool()
+        if pool is None or not await self._ensure_schema():
+            return 0
+        try:
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    # SKIP LOCKED: two live queues claiming at once split the rows instead of both taking them.
+                    await cur.execute(
+                        """
+                        UPDATE reports_log
+                        SET status = 'queued', owner_id = %s, heartbeat_at = NOW()
+                        WHERE id IN (
+                            SELECT id FROM reports_log
+                            WHERE status IN ('queued', 'running')
+                              AND owner_id IS DISTINCT FROM %s
+                              AND (heartbeat_at IS NULL OR heartbeat_at < NOW() - make_interval(secs => %s))
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING id, user_id, chat_id, report_type, iso_year, iso_week, params
+                        """,
+                        (self.instance_id, self.instance_id, STALE_AFTER_SEC),
+                    )
+                    rows = await cur.fetchall()
+        except Exception:
+            logger.exception("Failed to recover pending reports")
+            return 0
+        for log_id, user_id, chat_id, report_type, year, week, params in sorted(rows):
+            caption = (params or {}).get("caption") if isinstance(params, dict) else None
+            self._attach((report_type, int(year), int(week)), ReportWaiter(user_id, chat_id, log_id, caption=caption))
+        if rows:
+            logger.info("Recovered %s pending report requests into %s jobs", len(rows), len(self._queued))
+        return len(rows)
+
+    def _ensure_heartbeat(self) -> None:
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.get_running_loop().create_task(self._heartbeat_forever())
+
+    async def _heartbeat_forever(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SEC)
+            await self._execute(
+                """
+                UPDATE reports_log SET heartbeat_at = NOW()
+                WHERE owner_id = %s AND status IN ('queued', 'running')
+                """,
+                (self.instance_id,),
+            )
+            if self.bot is not None:
+                await self._claim_stale()
+
+    # --- worker ----------------------------------------------------------
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run_forever())
+        self._ensure_heartbeat()
+
+    async def close(self) -> None:
+        for task in (self._worker, self._heartbeat):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._worker = self._heartbeat = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            if not self._queued:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            _key, job = self._queued.popitem(last=False)
+            self._running = job
+            try:
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Report job crashed key=%s", job.key)
+            finally:
+                self._running = None
+
+    async def _run_job(self, job: _Job) -> None:
+        await self._log_running(job)
+        for waiter in job.waiters:
+            if waiter.on_start is not None:
+                await self._call(waiter.on_start, waiter)
+
+        version = await self.cache.data_version() if self.cache is not None else None
+        started = time.perf_counter()
+        # An earlier job may have rendered the same report while this one waited.
+        result = await self._cache_lookup(job.key, version) if version is not None else None
+        if result is None:
+            result = await self._render(job, version)
+        result.duration_ms = int((time.perf_counter() - started) * 1000)
+        await self._log_finished(job, result)
+
+        try:
+            # Fan-out runs concurrently; TelegramSender keeps it within Telegram's limits.
+            await asyncio.gather(*(self._call(w.on_done or self._deliver, w, result) for w in job.waiters))
+        finally:
+            if not result.cached:
+                for path in (result.pdf_path, result.xlsx_path):
+                    try:
+                        if path:
+                            pathlib.Path(path).unlink(missing_ok=True)
+                    except Exception:
+                        pass
+        logger.info(
+            "REPORT DONE key=%s waiters=%s duration_ms=%s ok=%s",
+            job.key, len(job.waiters), result.duration_ms, result.error is None,
+        )
+
+    async def _render(self, job: _Job, version: str | None) -> ReportResult:
+        report_type, year, week = job.key
+        result = ReportResult(report_type, year, week)
+        try:
+            if self.excel_lock is not None:
+                async with self.excel_lock:
+                    paths = await asyncio.wait_for(
+                        asyncio.to_thread(self.run_report_fn, report_type, year, week), timeout=self.timeout_sec
+                    )
+            else:
+                paths = await asyncio.wait_for(
+                    asyncio.to_thread(self.run_report_fn, report_type, year, week), timeout=self.timeout_sec
+                )
+            result.xlsx_path, result.pdf_path = paths
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("REPORT FAILED key=%s waiters=%s", job.key, len(job.waiters))
+            result.error = exc
+            return result
+
+        if self.cache is not None and version is not None:
+            try:
+                result.xlsx_path, result.pdf_path = await asyncio.to_thread(
+                    self.cache.put,
+                    self.cache.key(report_type, year, week, version),
+                    result.xlsx_path,
+                    result.pdf_path,
+                    {"report_type": report_type, "year": year, "week": week, "data_version": version},
+                )
+                result.cached = True
+            except Exception:
+                logger.exception("Failed to store report in cache key=%s", job.key)
+        return result
+
+    async def _cache_lookup(self, key: JobKey, version: str | None = None) -> ReportResult | None:
+        if self.cache is None:
+            return None
+        if version is None:
+            version = await self.cache.data_version()
+            if version is None:
+                return None
+        paths = await asyncio.to_thread(self.cache.get, self.cache.key(*key, version))
+        if paths is None:
+            return None
+        return ReportResult(*key, xlsx_path=paths[0], pdf_path=paths[1], cached=True)
+
+    @staticmethod
+    async def _call(fn, *args) -> None:
+        try:
+            await fn(*args)
+        except Exception:
+            logger.exception("Report callback failed for chat=%s", args[0].chat_id)
+
+    async def _deliver(self, waiter: ReportWaiter, result: ReportResult) -> None:
+        if self.bot is None:
+            return
+        failed = result.error is not None or not result.pdf_path or not os.path.exists(result.pdf_path)
+
+        async def send():
+            if failed:
+                await self.bot.send_message(chat_id=waiter.chat_id, text="Error generating report. Please try again.")
+            else:
+                await get_file_cache().send_document(self.bot, waiter.chat_id, result.pdf_path, caption=waiter.caption)
+
+        delivery = await get_sender().send(waiter.chat_id, send)
+        if not delivery.ok:
+            logger.warning("Delivery of job result to chat=%s failed: %s", waiter.chat_id, delivery.error)
+
+    # --- reports_log -----------------------------------------------------
+
+    async def _ensure_schema(self) -> bool:
+        """Adds owner_id/heartbeat_at on databases created before they existed (once per process)."""
+        if self._schema_ready:
+            return True
+        pool = db_pool.get_pool()
+        if pool is None:
+            return False
+        try:
+            async with pool.connection() as conn:
+                await conn.execute(OWNER_COLUMNS_DDL)
+        except Exception:
+            logger.exception("Failed to add owner columns to reports_log")
+            return False
+        self._schema_ready = True
+        return True
+
+    async def _execute(self, query: str, params: tuple, fetch: bool = False):
+        pool = db_pool.get_pool()
+        if pool is None or not await self._ensure_schema():
+            return None
+        try:
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(query, params)
+                    return await cur.fetchone() if fetch else None
+        except Exception:
+            logger.exception("reports_log write failed")
+            return None
+
+    async def _log_queued(self, user_id: int, chat_id: int, key: JobKey, params: dict) -> int | None:
+        row = await self._execute(
+            """
+            INSERT INTO reports_log (
+                user_id, chat_id, report_type, iso_year, iso_week, params, status, owner_id, heartbeat_at
+            )
+            VALUES (%s, %s, %s, %s, %s, %s::jsonb, 'queued', %s, NOW())
+            RETURNING id
+            """,
+            (
+                user_id,
+                chat_id,
+                *key,
+                json.dumps({k: v for k, v in params.items() if v is not None}, ensure_ascii=False),
+                self.instance_id,
+            ),
+            fetch=True,
+        )
+        return int(row[0]) if row else None
+
+    async def _log_cache_hit(
+        self, user_id: int, chat_id: int, key: JobKey, result: ReportResult, params: dict
+    ) -> int | None:
+        params = {**{k: v for k, v in params.items() if v is not None}, "cache_hit": True}
+        row = await self._execute(
+            """
+            INSERT INTO reports_log (
+                user_id, chat_id, report_type, iso_year, iso_week, params,
+                status, completed_at, duration_ms, output_key
+            )
+            VALUES (%s, %s, %s, %s, %s, %s::jsonb, 'success', NOW(), %s, %s)
+            RETURNING id
+            """,
+            (
+                user_id,
+                chat_id,
+                *key,
+                json.dumps(params, ensure_ascii=False),
+                result.duration_ms,
+                os.path.basename(result.pdf_path) if result.pdf_path else None,
+            ),
+            fetch=True,
+        )
+        return int(row[0]) if row else None
+
+    @staticmethod
+    def _log_ids(job: _Job) -> list[int]:
+        return [w.log_id for w in job.waiters if w.log_id is not None]
+
+    async def _log_running(self, job: _Job) -> None:
+        ids = self._log_ids(job)
+        if ids:
+            await self._execute(
+                """
+                UPDATE reports_log
+                SET status = 'running',
+                    params = params || jsonb_build_object(
+                        'queue_wait_ms', (EXTRACT(EPOCH FROM NOW() - requested_at) * 1000)::int,
+                        'job_size', %s::int
+                    )
+                WHERE id = ANY(%s)
+                """,
+                (len(job.waiters), ids),
+            )
+
+    async def _log_finished(self, job: _Job, result: ReportResult) -> None:
+        ids = self._log_ids(job)
+        if ids:
+            await self._execute(
+                """
+                UPDATE reports_log
+                SET status = %s, completed_at = NOW(), duration_ms = %s, output_key = %s, error_message = %s
+                WHERE id = ANY(%s)
+                """,
+                (
+                    "failed" if result.error is not None else "success",
+                    result.duration_ms,
+                    os.path.basename(result.pdf_path) if result.pdf_path else None,
+                    str(result.error)[:1000] if result.error is not None else None,
+                    ids,
+                ),
+            )
@@ -1,23 +1,50 @@
 """
-Run full ETL pipeline:
-1) XLSM master import
-2) XLSB plan import
+Run full ETL pipeline as a small DAG (see STEPS):
+- XLSM master import
+- XLSB plan import (after XLSM: needs trucks/drivers)
+- SIM cards import (optional, independent)
+Ready steps run concurrently, up to ETL_PIPELINE_MAX_PARALLEL at a time.
+Step timings and the critical path go to the log and to an etl_log row
+(source "etl_pipeline").
+
+Each step declares its input files; their signature (size, mtime, sha256)
+is stored with the step's last successful etl_log row, and a step whose
+inputs are unchanged (and whose dependencies did not run) is skipped with a
+'success' row that keeps freshness monitoring current. --force runs everything.
+
+ETL_PIPELINE_MODE=inprocess (default) calls each module's run_etl in this
+process, reusing one connection per worker thread, and hands the
+truck/driver lookups from the XLSM step to the XLSB step; per-step timeouts
+are enforced by a watchdog thread. ETL_PIPELINE_MODE=subprocess runs each
+script in its own interpreter (also used when the step modules cannot be imported).
 
 Logs to etl_runner.log and optionally notifies admin via Telegram on failure.
 """
 
 from __future__ import annotations
 
+import argparse
+import ctypes
+import hashlib
+import importlib
 import json
 import os
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, Iterable
 from urllib import parse, request
 
 from dotenv import load_dotenv
 
+import etl_db
+from etl_watch_sources import resolve_sources
+
 BASE_DIR = Path(__file__).resolve().parent
 LOG_FILE = BASE_DIR / "etl_runner.log"
 LOCK_FILE = Path(os.environ.get("TEMP", r"C:\Windows\Temp")) / "lkw_etl_pipeline.lock"
@@ -40,14 +67,61 @@ STEP_TIMEOUTS_SEC = {
     "sim_cards": env_int("ETL_STEP_TIMEOUT_SIM_CARDS_SEC", 10 * 60, minimum=2 * 60),
 }
 
+PIPELINE_MODE_INPROCESS = "inprocess"
+PIPELINE_MODE_SUBPROCESS = "subprocess"
+PIPELINE_MODES = (PIPELINE_MODE_INPROCESS, PIPELINE_MODE_SUBPROCESS)
+
+PIPELINE_SOURCE_NAME = etl_db.PIPELINE_SOURCE_NAME
+
+
+@dataclass(frozen=True)
+class PipelineStep:
+    name: str
+    script: str  # the in-process module is the script without ".py"
+    required: bool = True
+    depends_on: tuple[str, ...] = ()
+    source_name: str = ""  # etl_log.source_name the step writes
+    inputs: tuple[str, ...] = ()  # logical source files (etl_watch_sources.resolve_sources keys)
+
+
+# xlsb resolves plan cells against the trucks/drivers xlsm writes; sim_cards is independent.
+STEPS = (
+    PipelineStep(
+        "xlsm",
+        "etl_xlsm_to_postgres.py",
+        source_name="xlsm_lkw_fahrer_data",
+        inputs=("LKW_Fahrer_Data.xlsm",),
+    ),
+    PipelineStep(
+        "xlsb",
+        "etl_xlsb_to_postgres.py",
+        depends_on=("xlsm",),
+        source_name="xlsb_fahrer_plan",
+        inputs=("LKW_Fahrer_Plan.xlsb",),
+    ),
+    PipelineStep(
+        "sim_cards",
+        "etl_sim_cards_to_postgres.py",
+        required=False,
+        source_name="xlsx_sim_cards",
+        inputs=("LOG_INs 2.xlsx",),
+    ),
+)
+# Steps whose run_etl reads or fills the shared truck/driver lookups.
+LOOKUP_STEPS = {"xlsm", "xlsb"}
+
+
+_LOG_LOCK = threading.Lock()
+
 
 def log(msg: str) -> None:
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     line = f"[{ts}] {msg}\n"
-    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(line)
-    print(msg)
+    with _LOG_LOCK:
+        LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+        print(msg)
 
 
 def notify_admin(text: str) -> None:
@@ -70,11 +144,15 @@ def notify_admin(text: str) -> None:
         log(f"WARN: failed to notify admin: {exc}")
 
 
+def step_timeout_sec(name: str) -> int:
+    return STEP_TIMEOUTS_SEC.get(name, env_int("ETL_STEP_TIMEOUT_DEFAULT_SEC", 30 * 60, minimum=5 * 60))
+
+
 def run_step(name: str, script: str, required: bool = True) -> bool:
     py = BASE_DIR / ".venv" / "Scripts" / "python.exe"
     cmd = [str(py), str(BASE_DIR / script)]
     log(f"STEP START: {name} -> {' '.join(cmd)}")
-    timeout_sec = STEP_TIMEOUTS_SEC.get(name, env_int("ETL_STEP_TIMEOUT_DEFAULT_SEC", 30 * 60, minimum=5 * 60))
+    timeout_sec = step_timeout_sec(name)
     try:
         cp = subprocess.run(
             cmd,
@@ -104,6 +182,567 @@ def run_step(name: str, script: str, required: bool = True) -> bool:
     return True
 
 
+class StepTimeoutError(Exception):
+    """Raised inside an in-process step's thread by StepWatchdog."""
+
+
+def _raise_in_thread(thread_id: int, exc_type: type[BaseException]) -> None:
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(exc_type))
+
+
+class StepWatchdog:
+    """
+    Timer thread for an in-process step: on timeout it cancels the query
+    running on conn (if any) and raises StepTimeoutError in the thread that
+    entered the watchdog, which interrupts Python-side work too. The runner
+    turns that into a timeout error via .fired.
+    """
+
+    def __init__(self, name: str, timeout_sec: float, conn=None):
+        self.name = name
+        self.timeout_sec = timeout_sec
+        self.conn = conn
+        self.fired = False
+        self._done = False
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._thread_id: int | None = None
+
+    def _fire(self) -> None:
+        with self._lock:
+            if self._done:
+                return
+            self.fired = True
+            log(f"STEP WATCHDOG: {self.name} exceeded {self.timeout_sec} seconds, cancelling")
+            if self.conn is not None:
+                try:
+                    self.conn.cancel()
+                except Exception as exc:
+                    log(f"WARN: failed to cancel {self.name} query: {exc}")
+            if self._thread_id is not None:
+                _raise_in_thread(self._thread_id, StepTimeoutError)
+
+    def __enter__(self) -> "StepWatchdog":
+        self._thread_id = threading.get_ident()
+        self._timer = threading.Timer(self.timeout_sec, self._fire)
+        self._timer.daemon = True
+        self._timer.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        with self._lock:
+            self._done = True
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+class PipelineContext:
+    """
+    State shared by in-process steps: the master lookups and one connection
+    per worker thread (psycopg transactions must not interleave across
+    concurrently running steps; sequential steps on a thread reuse its connection).
+    """
+
+    def __init__(self, connect: Callable[[], object]):
+        self._connect = connect
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.connections: list = []
+        self.lookups: dict = {}
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self.connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        for conn in self.connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def _last_etl_log_id(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM etl_log")
+        last_id = int(cur.fetchone()[0])
+    conn.commit()
+    return last_id
+
+
+def fail_open_etl_log_rows(conn, source_name: str, after_id: int, message: str) -> int:
+    """
+    Marks source_name's 'running' etl_log rows newer than after_id 'failed'.
+    A step interrupted by StepWatchdog may never reach its own failure
+    handler (the exception can land inside it), which would leave the row
+    'running' for good.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE etl_log
+            SET status = 'failed', finished_at = NOW(), error_message = %s
+            WHERE source_name = %s AND status = 'running' AND id > %s
+            """,
+            (message, source_name, after_id),
+        )
+        count = cur.rowcount
+    conn.commit()
+    return count
+
+
+def run_step_inprocess(
+    name: str, script: str, ctx: PipelineContext, required: bool = True, source_name: str = ""
+) -> bool:
+    module = importlib.import_module(Path(script).stem)
+    timeout_sec = step_timeout_sec(name)
+    log(f"STEP START: {name} -> in-process {module.__name__}.run_etl")
+    conn = ctx.connection()
+    log_id_before = _last_etl_log_id(conn) if source_name else 0
+    watchdog = StepWatchdog(name, timeout_sec, conn)
+    try:
+        try:
+            with watchdog:
+                kwargs = module.run_kwargs(module.parse_args([]))
+                if name in LOOKUP_STEPS:
+                    kwargs["lookups"] = ctx.lookups
+                result = module.run_etl(conn=conn, **kwargs)
+        except Exception as exc:
+            if watchdog.fired:
+                raise RuntimeError(f"{name} timed out after {timeout_sec} seconds") from exc
+            raise
+    except Exception as exc:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        if watchdog.fired and source_name:
+            try:
+                fail_open_etl_log_rows(conn, source_name, log_id_before, str(exc))
+            except Exception as mark_exc:
+                log(f"WARN: failed to mark {name} etl_log row failed: {mark_exc}")
+        if required:
+            raise
+        log(f"STEP WARN: {name} failed: {exc} (optional step)")
+        return False
+    log(f"{name} result: {json.dumps(result, ensure_ascii=False, default=str)}")
+    log(f"STEP OK: {name}")
+    return True
+
+
+def pipeline_mode() -> str:
+    mode = (os.getenv("ETL_PIPELINE_MODE") or PIPELINE_MODE_INPROCESS).strip().lower()
+    if mode not in PIPELINE_MODES:
+        log(f"WARN: unknown ETL_PIPELINE_MODE={mode!r}, using {PIPELINE_MODE_INPROCESS}")
+        return PIPELINE_MODE_INPROCESS
+    return mode
+
+
+def _open_inprocess_context() -> PipelineContext | None:
+    """Imports the step modules; None means fall back to subprocesses. Connections open lazily per worker."""
+    try:
+        for step in STEPS:
+            importlib.import_module(Path(step.script).stem)
+        import psycopg  # type: ignore
+    except Exception as exc:
+        log(f"WARN: in-process ETL unavailable ({exc}), falling back to subprocess mode")
+        return None
+    database_url = (os.getenv("DATABASE_URL") or "").strip()
+    if not database_url:
+        raise RuntimeError("DATABASE_URL is empty. Set it in .env.")
+    return PipelineContext(lambda: psycopg.connect(database_url))
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def critical_path(steps: Iterable[PipelineStep], timings: dict[str, dict]) -> tuple[list[str], float]:
+    """Longest chain of finished steps by duration along depends_on edges."""
+    by_name = {step.name: step for step in steps}
+    best: dict[str, tuple[float, list[str]]] = {}
+
+    def chain(name: str) -> tuple[float, list[str]]:
+        if name not in best:
+            duration = float(timings.get(name, {}).get("duration_sec") or 0.0)
+            prev = max(
+                (chain(dep) for dep in by_name[name].depends_on if dep in timings),
+                default=(0.0, []),
+                key=lambda item: item[0],
+            )
+            best[name] = (prev[0] + duration, prev[1] + [name])
+        return best[name]
+
+    candidates = [chain(name) for name in by_name if name in timings]
+    if not candidates:
+        return [], 0.0
+    total, path = max(candidates, key=lambda item: item[0])
+    return path, round(total, 3)
+
+
+def run_dag(
+    steps: Iterable[PipelineStep], run_one: Callable[[PipelineStep], bool], max_parallel: int = 2
+) -> dict[str, dict]:
+    """
+    Runs steps as soon as all of their depends_on steps succeeded, at most
+    max_parallel at a time. A failed required step stops scheduling (running
+    steps finish) and its error is re-raised; steps depending on a failed
+    optional step are skipped. Returns per-step timings.
+    """
+    steps = list(steps)
+    known = {step.name for step in steps}
+    for step in steps:
+        missing = [dep for dep in step.depends_on if dep not in known]
+        if missing:
+            raise ValueError(f"Step {step.name} depends on unknown step(s): {', '.join(missing)}")
+
+    timings: dict[str, dict] = {}
+    pending = list(steps)
+    done: dict[str, bool] = {}
+    error: BaseException | None = None
+
+    def timed(step: PipelineStep) -> bool:
+        started = time.perf_counter()
+        timings[step.name] = {"started_at": _now_iso()}
+        ok = False
+        try:
+            ok = run_one(step)
+            return ok
+        finally:
+            timings[step.name].update(
+                finished_at=_now_iso(),
+                duration_sec=round(time.perf_counter() - started, 3),
+                status="success" if ok else "failed",
+            )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="etl-step") as pool:
+        running: dict[Future, PipelineStep] = {}
+        while pending or running:
+            if error is None:
+                for step in list(pending):
+                    if any(dep in done and not done[dep] for dep in step.depends_on):
+                        pending.remove(step)
+                        done[step.name] = False
+                        timings[step.name] = {"status": "skipped"}
+                        log(f"STEP SKIP: {step.name} (dependency failed)")
+                    elif all(done.get(dep) for dep in step.depends_on) and len(running) < max(1, max_parallel):
+                        pending.remove(step)
+                        running[pool.submit(timed, step)] = step
+            else:
+                pending.clear()
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle among steps: {', '.join(s.name for s in pending)}")
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                try:
+                    done[step.name] = bool(future.result())
+                except Exception as exc:
+                    done[step.name] = False
+                    if error is None:
+                        error = exc
+    if error is not None:
+        error.timings = timings  # type: ignore[attr-defined]
+        raise error
+    return timings
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def input_signature(paths: dict[str, Path], previous: dict | None = None) -> dict[str, dict]:
+    """
+    {logical name: {path, exists, size, mtime_ns, sha256}}. The content hash
+    is reused from previous when path, size and mtime all match, so unchanged
+    files are not re-read.
+    """
+    previous = previous or {}
+    signature: dict[str, dict] = {}
+    for logical_name, path in sorted(paths.items()):
+        if not path.exists():
+            signature[logical_name] = {"path": str(path), "exists": False}
+            continue
+        st = path.stat()
+        meta = {"path": str(path), "exists": True, "size": int(st.st_size), "mtime_ns": int(st.st_mtime_ns)}
+        prev = previous.get(logical_name) or {}
+        if all(prev.get(k) == meta[k] for k in ("path", "size", "mtime_ns")) and prev.get("sha256"):
+            meta["sha256"] = prev["sha256"]
+        else:
+            meta["sha256"] = _file_sha256(path)
+        signature[logical_name] = meta
+    return signature
+
+
+def inputs_unchanged(current: dict[str, dict], previous: dict | None) -> bool:
+    if not previous or set(current) != set(previous):
+        return False
+    for logical_name, meta in current.items():
+        prev = previous[logical_name] or {}
+        if not meta.get("exists") or meta.get("path") != prev.get("path") or meta.get("sha256") != prev.get("sha256"):
+            return False
+    return True
+
+
+class StepCache:
+    """
+    Input signatures stored in etl_log.details["input_signature"] of each
+    step's last successful row (idx_etl_log_source_success matches both
+    lookups). Unchanged steps get a 'success' row with
+    details.skipped=true, which keeps check_etl_freshness and the Mini App
+    freshness badge current. DB errors only disable skipping (the step runs).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+
+    def last_signature(self, source_name: str) -> dict | None:
+        with self._lock, self.conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT details -> 'input_signature'
+                FROM etl_log
+                WHERE source_name = %s AND status = 'success'
+                ORDER BY COALESCE(finished_at, started_at) DESC, id DESC
+                LIMIT 1
+                """,
+                (source_name,),
+            )
+            row = cur.fetchone()
+        return row[0] if row and isinstance(row[0], dict) else None
+
+    def store_signature(self, source_name: str, signature: dict) -> None:
+        with self._lock, self.conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE etl_log
+                SET details = details || jsonb_build_object('input_signature', %s::jsonb)
+                WHERE id = (
+                    SELECT id FROM etl_log
+                    WHERE source_name = %s AND status = 'success'
+                    ORDER BY COALESCE(finished_at, started_at) DESC, id DESC
+                    LIMIT 1
+                )
+                """,
+                (json.dumps(signature, ensure_ascii=False), source_name),
+            )
+
+    def record_skip(self, source_name: str, signature: dict, reason: str) -> None:
+        with self._lock, self.conn.transaction(), self.conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO etl_log (source_name, status, finished_at, details)
+                VALUES (%s, 'success', NOW(), %s::jsonb)
+                RETURNING id
+                """,
+                (
+                    source_name,
+                    json.dumps(
+                        {"skipped": True, "reason": reason, "input_signature": signature},
+                        ensure_ascii=False,
+                    ),
+                ),
+            )
+            etl_db.record_source_success(cur, int(cur.fetchone()[0]), loaded=False)
+
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+def _open_step_cache() -> StepCache | None:
+    database_url = (os.getenv("DATABASE_URL") or "").strip()
+    if not database_url:
+        return None
+    try:
+        import psycopg  # type: ignore
+
+        conn = psycopg.connect(database_url, autocommit=True)
+        with conn.cursor() as cur:
+            etl_db.ensure_source_status_table(cur)
+        return StepCache(conn)
+    except Exception as exc:
+        log(f"WARN: step cache unavailable ({exc}); running every step")
+        return None
+
+
+def _resolve_step_inputs() -> dict[str, Path]:
+    try:
+        return resolve_sources()
+    except Exception as exc:
+        log(f"WARN: could not resolve step inputs ({exc}); running every step")
+        return {}
+
+
+def cached_step_runner(
+    run_one: Callable[[PipelineStep], bool],
+    cache: StepCache | None,
+    sources: dict[str, Path],
+    force: bool = False,
+) -> tuple[Callable[[PipelineStep], bool], set[str]]:
+    """
+    Wraps run_one: a step whose declared inputs match the signature stored
+    with its last success, and none of whose dependencies ran in this
+    pipeline, is skipped (and logged). Returns (wrapper, names of skipped steps).
+    """
+    skipped: set[str] = set()
+    ran: set[str] = set()
+    lock = threading.Lock()
+
+    def run(step: PipelineStep) -> bool:
+        signature = None
+        if cache is not None and step.source_name and step.inputs and all(i in sources for i in step.inputs):
+            try:
+                previous = cache.last_signature(step.source_name)
+                signature = input_signature({i: sources[i] for i in step.inputs}, previous)
+                with lock:
+                    deps_ran = [dep for dep in step.depends_on if dep in ran]
+                if force:
+                    log(f"STEP CACHE: {step.name} forced (--force)")
+                elif deps_ran:
+                    log(f"STEP CACHE: {step.name} runs, dependency ran: {', '.join(deps_ran)}")
+                elif inputs_unchanged(signature, previous):
+                    reason = f"inputs unchanged: {', '.join(step.inputs)}"
+                    cache.record_skip(step.source_name, signature, reason)
+                    log(f"STEP SKIP: {step.name} ({reason})")
+                    with lock:
+                        skipped.add(step.name)
+                    return True
+            except Exception as exc:
+                log(f"WARN: step cache check failed for {step.name} ({exc}); running it")
+        with lock:
+            ran.add(step.name)
+        ok = run_one(step)
+        if ok and signature is not None:
+            try:
+                cache.store_signature(step.source_name, signature)
+            except Exception as exc:
+                log(f"WARN: failed to store input signature for {step.name}: {exc}")
+        return ok
+
+    return run, skipped
+
+
+def select_steps(steps: Iterable[PipelineStep], names: Iterable[str]) -> tuple[PipelineStep, ...]:
+    """
+    The named steps plus every step downstream of them, in STEPS order.
+    Dependencies outside the selection count as already satisfied.
+    """
+    steps = tuple(steps)
+    selected = {name.strip() for name in names if name.strip()}
+    unknown = selected - {step.name for step in steps}
+    if unknown:
+        raise ValueError(f"Unknown step(s): {', '.join(sorted(unknown))}")
+    grew = True
+    while grew:
+        grew = False
+        for step in steps:
+            if step.name not in selected and any(dep in selected for dep in step.depends_on):
+                selected.add(step.name)
+                grew = True
+    return tuple(
+        replace(step, depends_on=tuple(dep for dep in step.depends_on if dep in selected))
+        for step in steps
+        if step.name in selected
+    )
+
+
+def run_steps(summary: dict | None = None, force: bool = False, only: Iterable[str] | None = None) -> str:
+    """
+    Runs STEPS (or only the given steps and their dependents) as a DAG in the
+    configured mode, skipping steps with unchanged inputs unless force;
+    returns the mode actually used.
+    """
+    steps = select_steps(STEPS, only) if only else STEPS
+    ctx = _open_inprocess_context() if pipeline_mode() == PIPELINE_MODE_INPROCESS else None
+    mode = PIPELINE_MODE_SUBPROCESS if ctx is None else PIPELINE_MODE_INPROCESS
+    if ctx is None:
+        run_one = lambda step: run_step(step.name, step.script, required=step.required)  # noqa: E731
+    else:
+        run_one = lambda step: run_step_inprocess(  # noqa: E731
+            step.name, step.script, ctx, required=step.required, source_name=step.source_name
+        )
+    cache = _open_step_cache()
+    run_one, skipped = cached_step_runner(run_one, cache, _resolve_step_inputs(), force=force)
+    max_parallel = env_int("ETL_PIPELINE_MAX_PARALLEL", 2)
+    log(
+        f"ETL PIPELINE MODE: {mode} max_parallel={max_parallel} force={force} "
+        f"steps={','.join(step.name for step in steps)}"
+    )
+    timings: dict[str, dict] = {}
+    try:
+        timings = run_dag(steps, run_one, max_parallel=max_parallel)
+    except BaseException as exc:
+        timings = getattr(exc, "timings", timings)
+        raise
+    finally:
+        if ctx is not None:
+            ctx.close()
+        if cache is not None:
+            cache.close()
+        for name in skipped:
+            if name in timings:
+                timings[name]["status"] = "unchanged"
+        path, path_sec = critical_path(steps, timings)
+        for name, info in timings.items():
+            log(f"STEP TIMING: {name} {json.dumps(info, ensure_ascii=False)}")
+        log(f"ETL PIPELINE CRITICAL PATH: {' -> '.join(path) or '-'} ({path_sec}s)")
+        if summary is not None:
+            summary["mode"] = mode
+            summary["steps"] = timings
+            summary["critical_path"] = path
+            summary["critical_path_sec"] = path_sec
+            summary["unchanged_steps"] = sorted(skipped)
+    return mode
+
+
+def record_pipeline_run(summary: dict) -> None:
+    """
+    Best effort: one etl_log row (source PIPELINE_SOURCE_NAME) with step
+    timings and the critical path. Not mirrored into etl_source_status,
+    which holds per-source freshness only.
+    """
+    database_url = (os.getenv("DATABASE_URL") or "").strip()
+    if not database_url:
+        return
+    try:
+        import psycopg  # type: ignore
+
+        with psycopg.connect(database_url) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO etl_log (source_name, status, started_at, finished_at, error_message, details)
+                    VALUES (%s, %s, %s, %s, %s, %s::jsonb)
+                    """,
+                    (
+                        PIPELINE_SOURCE_NAME,
+                        summary.get("status", "failed"),
+                        summary.get("started_at"),
+                        summary.get("finished_at"),
+                        summary.get("error"),
+                        json.dumps(summary, ensure_ascii=False, default=str),
+                    ),
+                )
+            conn.commit()
+    except Exception as exc:
+        log(f"WARN: failed to record pipeline run in etl_log: {exc}")
+
+
 def rotate_log_if_needed(max_bytes: int = 512_000, keep_lines: int = 1200) -> None:
     if not LOG_FILE.exists():
         return
@@ -153,6 +792,33 @@ def _to_int(value: object) -> int:
         return 0
 
 
+def read_pipeline_lock() -> dict:
+    try:
+        info = json.loads(LOCK_FILE.read_text(encoding="utf-8", errors="ignore"))
+    except Exception:
+        return {}
+    return info if isinstance(info, dict) else {}
+
+
+def pipeline_lock_stale_reason(info: dict, now_ts: int) -> str:
+    """Why a pipeline lock is dead ("" while its run may still be going).
+
+    The one staleness rule for acquire_pipeline_lock and the watch daemon.
+    A live pid older than every step timeout together is a hung run: the
+    watchdog would have failed each step by then.
+    """
+    pid = _to_int(info.get("pid"))
+    started_at = _to_int(info.get("started_at"))
+    if not pid or not started_at:
+        return "invalid lock payload"
+    age_sec = max(0, now_ts - started_at)
+    if not is_process_running(pid):
+        return f"stale pid={pid} age_sec={age_sec}"
+    if age_sec > max(LOCK_STALE_SEC, sum(STEP_TIMEOUTS_SEC.values())):
+        return f"stale age_sec={age_sec} pid={pid}"
+    return ""
+
+
 def acquire_pipeline_lock() -> bool:
     LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
     now_ts = int(datetime.now().timestamp())
@@ -165,38 +831,17 @@ def acquire_pipeline_lock() -> bool:
                 json.dump(payload, f, ensure_ascii=False)
             return True
         except FileExistsError:
+            info = read_pipeline_lock()
+            stale_reason = pipeline_lock_stale_reason(info, now_ts)
+            if not stale_reason:
+                age_sec = max(0, now_ts - _to_int(info.get("started_at")))
+                log(f"ETL PIPELINE SKIP: active lock pid={_to_int(info.get('pid'))} age_sec={age_sec} ({LOCK_FILE})")
+                return False
+            log(f"ETL PIPELINE REMOVE STALE LOCK: {stale_reason} ({LOCK_FILE})")
             try:
-                info = json.loads(LOCK_FILE.read_text(encoding="utf-8", errors="ignore"))
+                LOCK_FILE.unlink(missing_ok=True)
             except Exception:
-                info = {}
-            pid = _to_int(info.get("pid"))
-            started_at = _to_int(info.get("started_at"))
-            age_sec = max(0, now_ts - started_at) if started_at else 0
-
-            process_active = is_process_running(pid) if pid else False
-            stale_reason = ""
-            if not info:
-                stale_reason = "invalid lock payload"
-            elif pid and process_active:
-                log(f"ETL PIPELINE SKIP: active lock pid={pid} ({LOCK_FILE})")
-                return False
-            elif started_at and age_sec <= LOCK_STALE_SEC:
-                log(f"ETL PIPELINE SKIP: recent lock pid={pid} age_sec={age_sec} ({LOCK_FILE})")
-                return False
-            elif pid and not process_active:
-                stale_reason = f"stale pid={pid} age_sec={age_sec}"
-            elif started_at and age_sec > LOCK_STALE_SEC:
-                stale_reason = f"stale age_sec={age_sec}"
-
-            if stale_reason:
-                log(f"ETL PIPELINE REMOVE STALE LOCK: {stale_reason} ({LOCK_FILE})")
-                try:
-                    LOCK_FILE.unlink(missing_ok=True)
-                except Exception:
-                    pass
-                continue
-            log(f"ETL PIPELINE SKIP: lock exists ({LOCK_FILE})")
-            return False
+                pass
     return False
 
 
@@ -207,7 +852,20 @@ def release_pipeline_lock() -> None:
         pass
 
 
-def main() -> int:
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the ETL pipeline (xlsm, xlsb, sim cards).")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run every step even if its input files are unchanged since its last success",
+    )
+    parser.add_argument(
+        "--steps",
+        default="",
+        help="Comma-separated steps to run (their dependents run too), e.g. sim_cards; default: all",
+    )
+    args = parser.parse_args(argv)
+
     load_dotenv(BASE_DIR / ".env", override=True)
     rotate_log_if_needed()
     if not acquire_pipeline_lock():
@@ -215,16 +873,15 @@ def main() -> int:
     started = datetime.now()
     log("ETL PIPELINE START")
 
-    summary: dict[str, str] = {"started_at": started.isoformat()}
+    summary: dict[str, object] = {"started_at": started.isoformat()}
     try:
-        run_step("xlsm", "etl_xlsm_to_postgres.py")
-        run_step("xlsb", "etl_xlsb_to_postgres.py")
-        run_step("sim_cards", "etl_sim_cards_to_postgres.py", required=False)
+        run_steps(summary, force=args.force, only=[n for n in args.steps.split(",") if n.strip()] or None)
         finished = datetime.now()
         summary["status"] = "success"
         summary["finished_at"] = finished.isoformat()
         summary["duration_sec"] = str(int((finished - started).total_seconds()))
         log(f"ETL PIPELINE SUCCESS: {json.dumps(summary, ensure_ascii=False)}")
+        record_pipeline_run(summary)
         return 0
     except Exception as exc:
         finished = datetime.now()
@@ -233,6 +890,7 @@ def main() -> int:
         summary["duration_sec"] = str(int((finished - started).total_seconds()))
         summary["error"] = str(exc)
         log(f"ETL PIPELINE FAILED: {json.dumps(summary, ensure_ascii=False)}")
+        record_pipeline_run(summary)
         notify_admin(f"⚠️ ETL failed: {exc}")
         return 1
     finally:
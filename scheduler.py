@@ -12,8 +12,6 @@ Configuration via environment variables:
 
 import os
 import logging
-import pathlib
-import asyncio
 
 from datetime import date, datetime
 from zoneinfo import ZoneInfo
@@ -21,6 +19,10 @@ from zoneinfo import ZoneInfo
 from telegram.ext import ContextTypes
 
 from report_config import get_report_config
+from report_cache import ReportCache
+from report_queue import ReportQueue
+from telegram_file_cache import get_file_cache
+from telegram_sender import DeliveryResult, get_sender, log_summary
 
 logger = logging.getLogger("lkw_report_bot.scheduler")
 
@@ -39,7 +41,7 @@ def parse_cron(cron_str: str) -> dict:
     return result
 
 
-def setup_scheduler(app, excel_lock, run_report_fn):
+def setup_scheduler(app, excel_lock, run_report_fn, report_queue=None):
     """
     Register scheduled jobs if SCHEDULE_ENABLED=true.
     Called during bot startup.
@@ -48,6 +50,7 @@ def setup_scheduler(app, excel_lock, run_report_fn):
         app: telegram Application instance
         excel_lock: asyncio.Lock for Excel access
         run_report_fn: callable(report_type, year, week) -> (xlsx_path, pdf_path)
+        report_queue: shared ReportQueue (the bot's); built from run_report_fn/excel_lock if omitted
     """
     enabled = os.getenv("SCHEDULE_ENABLED", "false").lower() in ("true", "1", "yes")
     if not enabled:
@@ -71,6 +74,8 @@ def setup_scheduler(app, excel_lock, run_report_fn):
         logger.error("Invalid SCHEDULE_REPORT_TYPE: %s", e)
         return
 
+    queue = report_queue or ReportQueue(run_report_fn, excel_lock=excel_lock, cache=ReportCache.from_env())
+
     async def scheduled_report(context: ContextTypes.DEFAULT_TYPE):
         """Generate and send scheduled report to all whitelisted users."""
         try:
@@ -92,40 +97,46 @@ def setup_scheduler(app, excel_lock, run_report_fn):
             logger.warning("No users in whitelist for scheduled report")
             return
 
-        async with excel_lock:
-            try:
-                xlsx_path, pdf_path = await asyncio.wait_for(
-                    asyncio.to_thread(run_report_fn, report_type, year, week),
-                    timeout=30 * 60,
+        sender = get_sender()
+        label = f"Scheduled report {report_type} {year}-W{week:02d}"
+        deliveries: list[DeliveryResult] = []
+        expected = len(user_ids)
+
+        def _summarize_when_complete():
+            if len(deliveries) == expected:
+                log_summary(label, deliveries)
+
+        async def on_done(waiter, result):
+            if result.error is not None:
+                logger.error("Scheduled report generation failed for user %s: %s", waiter.chat_id, result.error)
+                delivery = DeliveryResult(waiter.chat_id, False, 0, f"generation failed: {result.error}")
+            elif result.pdf_path and os.path.exists(result.pdf_path):
+                delivery = await sender.send(
+                    waiter.chat_id,
+                    lambda: get_file_cache().send_document(
+                        context.bot, waiter.chat_id, result.pdf_path, caption=waiter.caption
+                    ),
                 )
-            except Exception as e:
-                logger.exception("Scheduled report generation failed: %s", e)
-                return
-
-        # Send PDF to all whitelisted users
+            else:
+                delivery = DeliveryResult(waiter.chat_id, False, 0, "no PDF produced")
+            deliveries.append(delivery)
+            _summarize_when_complete()
+
+        # One queue entry per user; they coalesce into a single Excel run and
+        # the queue fans the PDF out concurrently (through the shared rate-limited
+        # sender) and cleans up temp files afterwards.
+        caption = f"Scheduled report: {report_type} (Year {year}, Week {week})"
         for uid in user_ids:
             try:
-                if pdf_path and os.path.exists(pdf_path):
-                    with open(pdf_path, "rb") as fp:
-                        await context.bot.send_document(
-                            chat_id=uid,
-                            document=fp,
-                            filename=os.path.basename(pdf_path),
-                            caption=f"Scheduled report: {report_type} (Year {year}, Week {week})",
-                        )
-                    logger.info("Scheduled report sent to user %s", uid)
+                await queue.submit(
+                    uid, uid, report_type, year, week, on_done=on_done, caption=caption, source="scheduler"
+                )
             except Exception as e:
-                logger.error("Failed to send scheduled report to user %s: %s", uid, e)
-
-        # Cleanup temp files
-        for p in (pdf_path, xlsx_path):
-            try:
-                if p:
-                    pathlib.Path(p).unlink(missing_ok=True)
-            except Exception:
-                pass
+                logger.error("Failed to queue scheduled report for user %s: %s", uid, e)
+                deliveries.append(DeliveryResult(uid, False, 0, f"not queued: {e}"))
+                _summarize_when_complete()
 
-        logger.info("Scheduled report complete")
+        logger.info("Scheduled report queued for %s users", len(user_ids))
 
     # Register the job
     app.job_queue.run_custom(
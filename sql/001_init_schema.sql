@@ -50,6 +50,19 @@ CREATE TABLE IF NOT EXISTS allowed_users (
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- Bot / web server whitelist cache reloads on this notification (whitelist_store.py).
+CREATE OR REPLACE FUNCTION notify_allowed_users_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('allowed_users_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_allowed_users_changed ON allowed_users;
+CREATE TRIGGER trg_allowed_users_changed
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON allowed_users
+FOR EACH STATEMENT EXECUTE FUNCTION notify_allowed_users_changed();
+
 CREATE TABLE IF NOT EXISTS etl_log (
     id BIGSERIAL PRIMARY KEY,
     source_name TEXT NOT NULL,
@@ -64,6 +77,35 @@ CREATE TABLE IF NOT EXISTS etl_log (
     details JSONB NOT NULL DEFAULT '{}'::JSONB
 );
 
+-- Latest successful import per source; maintained by the ETL scripts in the
+-- same transaction as the etl_log success row.
+CREATE TABLE IF NOT EXISTS etl_source_status (
+    source_name TEXT PRIMARY KEY,
+    last_success_at TIMESTAMPTZ NOT NULL,
+    etl_log_id BIGINT REFERENCES etl_log(id) ON DELETE SET NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO etl_source_status (source_name, last_success_at, etl_log_id)
+SELECT DISTINCT ON (source_name) source_name, COALESCE(finished_at, started_at), id
+FROM etl_log
+WHERE status = 'success'
+  AND source_name <> 'etl_pipeline'
+ORDER BY source_name, COALESCE(finished_at, started_at) DESC, id DESC
+ON CONFLICT (source_name) DO NOTHING;
+
+-- The pipeline run summary (etl_pipeline) lives in etl_log only.
+DELETE FROM etl_source_status WHERE source_name = 'etl_pipeline';
+
+CREATE TABLE IF NOT EXISTS etl_sheet_fingerprints (
+    source_name TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    etl_log_id BIGINT REFERENCES etl_log(id) ON DELETE SET NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (source_name, sheet_name)
+);
+
 CREATE TABLE IF NOT EXISTS schedules (
     id BIGSERIAL PRIMARY KEY,
     etl_log_id BIGINT REFERENCES etl_log(id) ON DELETE SET NULL,
@@ -99,9 +141,15 @@ CREATE TABLE IF NOT EXISTS reports_log (
     completed_at TIMESTAMPTZ,
     duration_ms INTEGER,
     output_key TEXT,
-    error_message TEXT
+    error_message TEXT,
+    owner_id TEXT,
+    heartbeat_at TIMESTAMPTZ
 );
 
+ALTER TABLE reports_log
+    ADD COLUMN IF NOT EXISTS owner_id TEXT,
+    ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+
 CREATE TABLE IF NOT EXISTS report_einnahmen_monthly (
     month_index SMALLINT PRIMARY KEY CHECK (month_index BETWEEN 1 AND 12),
     month_name TEXT NOT NULL,
@@ -260,10 +308,13 @@ CREATE INDEX IF NOT EXISTS idx_schedules_work_date ON schedules(work_date);
 CREATE INDEX IF NOT EXISTS idx_schedules_company_id ON schedules(company_id);
 CREATE INDEX IF NOT EXISTS idx_schedules_driver_work_date ON schedules(driver_id, work_date);
 CREATE INDEX IF NOT EXISTS idx_schedules_truck_work_date ON schedules(truck_id, work_date);
+CREATE INDEX IF NOT EXISTS idx_schedules_source_sheet_hash ON schedules(source_sheet, source_row_hash);
 
 CREATE INDEX IF NOT EXISTS idx_etl_log_status_started_at ON etl_log(status, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_etl_log_source_success ON etl_log(source_name, (COALESCE(finished_at, started_at)) DESC, id DESC) WHERE status = 'success';
 CREATE INDEX IF NOT EXISTS idx_reports_log_user_requested_at ON reports_log(user_id, requested_at DESC);
 CREATE INDEX IF NOT EXISTS idx_reports_log_type_requested_at ON reports_log(report_type, requested_at DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_log_pending ON reports_log(id) WHERE status IN ('queued', 'running');
 CREATE INDEX IF NOT EXISTS idx_report_bonus_dynamik_lookup ON report_bonus_dynamik_monthly(report_year, report_month, fahrer_name);
 CREATE INDEX IF NOT EXISTS idx_report_yf_fahrer_lookup ON report_yf_fahrer_monthly(month_index, fahrer_name);
 CREATE INDEX IF NOT EXISTS idx_report_yf_lkw_lookup ON report_yf_lkw_daily(report_year, iso_week, lkw_nummer, report_date, source_row);
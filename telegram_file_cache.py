@@ -0,0 +1,162 @@
+"""
+Telegram file_id cache: each distinct document is uploaded at most once.
+
+The first send_document of a file uploads the bytes and records the
+file_id Telegram returns, keyed by bot id + sha256 of the content. Later
+sends of the same content (fan-out to N users, cached reports) pass the
+file_id instead, which is a small API call without an upload. Entries are
+persisted to a JSON file (TELEGRAM_FILE_CACHE_PATH) and expire after
+TELEGRAM_FILE_CACHE_MAX_AGE_DAYS; a file_id Telegram rejects is dropped
+and the file is uploaded again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger("lkw_report_bot.file_cache")
+
+MAX_ENTRIES = 2000
+
+
+def _env_number(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TelegramFileCache:
+    def __init__(self, path: Path | None, max_age_sec: float):
+        self.path = path
+        self.max_age_sec = max_age_sec
+        self._entries: dict[str, dict] = self._load()
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._digests: dict[tuple[str, int, int], str] = {}
+
+    @classmethod
+    def from_env(cls) -> "TelegramFileCache":
+        raw = os.path.expandvars(os.getenv("TELEGRAM_FILE_CACHE_PATH", "") or r"%TEMP%\lkw_telegram_file_ids.json").strip()
+        return cls(Path(raw) if raw else None, _env_number("TELEGRAM_FILE_CACHE_MAX_AGE_DAYS", 30) * 86400)
+
+    # --- persistence -----------------------------------------------------
+
+    def _load(self) -> dict[str, dict]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            logger.warning("Ignoring unreadable Telegram file cache %s", self.path)
+            return {}
+        now = time.time()
+        return {
+            key: entry
+            for key, entry in (data.items() if isinstance(data, dict) else [])
+            if isinstance(entry, dict) and entry.get("file_id") and now - float(entry.get("stored_at", 0)) < self.max_age_sec
+        }
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        if len(self._entries) > MAX_ENTRIES:
+            newest = sorted(self._entries.items(), key=lambda kv: kv[1].get("stored_at", 0))[-MAX_ENTRIES:]
+            self._entries = dict(newest)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text(json.dumps(self._entries, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            logger.exception("Failed to persist Telegram file cache %s", self.path)
+
+    # --- lookup ----------------------------------------------------------
+
+    def _digest(self, path: str) -> str:
+        st = os.stat(path)
+        stat_key = (os.path.abspath(path), int(st.st_size), int(st.st_mtime_ns))
+        digest = self._digests.get(stat_key)
+        if digest is None:
+            digest = _file_sha256(path)
+            if len(self._digests) > 256:
+                self._digests.clear()
+            self._digests[stat_key] = digest
+        return digest
+
+    def _get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - float(entry.get("stored_at", 0)) >= self.max_age_sec:
+            self._entries.pop(key, None)
+            return None
+        return str(entry["file_id"])
+
+    def forget(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            self._save()
+
+    async def send_document(self, bot, chat_id: int, path: str, filename: str | None = None, **kwargs):
+        """bot.send_document that uploads the file only if Telegram does not already have its content."""
+        digest = await asyncio.to_thread(self._digest, path)
+        key = f"{getattr(bot, 'id', '') or ''}:{digest}"
+        file_id = self._get(key)
+        if file_id is None:
+            # Concurrent sends of the same content wait for the first upload instead of uploading in parallel.
+            async with self._locks.setdefault(key, asyncio.Lock()):
+                file_id = self._get(key)
+                if file_id is None:
+                    return await self._upload(bot, chat_id, path, filename, key, **kwargs)
+        try:
+            return await bot.send_document(chat_id=chat_id, document=file_id, **kwargs)
+        except BadRequest as exc:
+            # "Wrong file identifier" etc.; other BadRequests (chat not found, ...) are the caller's.
+            if "file" not in str(exc).lower():
+                raise
+            logger.warning("Cached file_id rejected (%s); uploading again", exc)
+            self.forget(key)
+        return await self._upload(bot, chat_id, path, filename, key, **kwargs)
+
+    async def _upload(self, bot, chat_id: int, path: str, filename: str | None, key: str, **kwargs):
+        with open(path, "rb") as fp:
+            message = await bot.send_document(
+                chat_id=chat_id, document=fp, filename=filename or os.path.basename(path), **kwargs
+            )
+        document = getattr(message, "document", None)
+        if document is not None and getattr(document, "file_id", None):
+            self._entries[key] = {
+                "file_id": str(document.file_id),
+                "stored_at": time.time(),
+                "size": os.path.getsize(path),
+                "filename": filename or os.path.basename(path),
+            }
+            await asyncio.to_thread(self._save)
+        return message
+
+
+_default: TelegramFileCache | None = None
+
+
+def get_file_cache() -> TelegramFileCache:
+    """Process-wide cache configured from env (bot, web server and scheduler share it)."""
+    global _default
+    if _default is None:
+        _default = TelegramFileCache.from_env()
+    return _default
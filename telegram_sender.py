@@ -0,0 +1,222 @@
+"""
+Rate-limit-aware Telegram delivery for fan-out (scheduled reports, alerts).
+
+TelegramSender runs sends with bounded concurrency behind a token bucket
+for the per-bot limit (TELEGRAM_SEND_RATE_PER_SEC, Telegram allows ~30/s)
+and a minimum interval per chat (TELEGRAM_SEND_PER_CHAT_INTERVAL_SEC, ~1/s).
+A 429 RetryAfter pauses the whole bot for the requested time; network
+errors are retried with backoff up to TELEGRAM_SEND_MAX_ATTEMPTS; other
+errors (blocked bot, chat not found) fail the recipient at once.
+
+post_telegram is the synchronous Bot API call used by the check_* scripts
+(stdlib urllib), with the same 429/retry handling.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Awaitable, Callable, Iterable
+from urllib import error, parse, request
+
+logger = logging.getLogger("lkw_report_bot.sender")
+
+BACKOFF_MAX_SEC = 30.0
+
+
+def _env_number(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def _seconds(value) -> float:
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value or 0)
+
+
+class TokenBucket:
+    """Debt-based token bucket: reserve() always takes a token and returns how long to wait for it."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def _refill(self) -> float:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def reserve(self) -> float:
+        self._refill()
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """No token becomes available for `seconds` (Telegram flood control)."""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+@dataclass
+class DeliveryResult:
+    chat_id: int
+    ok: bool
+    attempts: int
+    error: str | None = None
+
+
+def log_summary(label: str, results: list[DeliveryResult]) -> None:
+    failed = [r for r in results if not r.ok]
+    retried = sum(r.attempts - 1 for r in results)
+    logger.info("%s: delivered %s/%s (retries=%s)", label, len(results) - len(failed), len(results), retried)
+    for r in failed:
+        logger.warning("%s: delivery to %s failed after %s attempt(s): %s", label, r.chat_id, r.attempts, r.error)
+
+
+class TelegramSender:
+    def __init__(
+        self,
+        concurrency: int = 8,
+        rate_per_sec: float = 25.0,
+        per_chat_interval_sec: float = 1.0,
+        max_attempts: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.per_chat_interval_sec = per_chat_interval_sec
+        self.max_attempts = max(1, max_attempts)
+        self.bucket = TokenBucket(rate_per_sec, capacity=max(1.0, rate_per_sec), clock=clock)
+        self._clock = clock
+        self._sleep = sleep
+        self._chat_next: dict[int, float] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @classmethod
+    def from_env(cls) -> "TelegramSender":
+        return cls(
+            concurrency=int(_env_number("TELEGRAM_SEND_CONCURRENCY", 8)),
+            rate_per_sec=_env_number("TELEGRAM_SEND_RATE_PER_SEC", 25),
+            per_chat_interval_sec=_env_number("TELEGRAM_SEND_PER_CHAT_INTERVAL_SEC", 1.0),
+            max_attempts=int(_env_number("TELEGRAM_SEND_MAX_ATTEMPTS", 4)),
+        )
+
+    def _reserve_chat(self, chat_id: int) -> float:
+        now = self._clock()
+        slot = max(now, self._chat_next.get(chat_id, now))
+        self._chat_next[chat_id] = slot + self.per_chat_interval_sec
+        if len(self._chat_next) > 10000:
+            self._chat_next = {k: v for k, v in self._chat_next.items() if v > now}
+        return slot - now
+
+    async def send(self, chat_id: int, send_fn: Callable[[], Awaitable[object]]) -> DeliveryResult:
+        """Runs send_fn() for one recipient under the limits; never raises for delivery errors."""
+        from telegram.error import BadRequest, Forbidden, InvalidToken, NetworkError, RetryAfter
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        attempts = 0
+        backoff = 1.0
+        async with self._semaphore:
+            while True:
+                attempts += 1
+                wait = max(self.bucket.reserve(), self._reserve_chat(chat_id))
+                if wait > 0:
+                    await self._sleep(wait)
+                try:
+                    await send_fn()
+                    return DeliveryResult(chat_id, True, attempts)
+                except RetryAfter as exc:
+                    seconds = _seconds(exc.retry_after)
+                    logger.warning("Flood control for chat %s: pausing sends for %.0fs", chat_id, seconds)
+                    self.bucket.pause(seconds)
+                    last_error = exc
+                except (BadRequest, Forbidden, InvalidToken) as exc:
+                    return DeliveryResult(chat_id, False, attempts, str(exc))
+                except NetworkError as exc:  # includes TimedOut
+                    if attempts < self.max_attempts:
+                        await self._sleep(backoff)
+                        backoff = min(backoff * 2, BACKOFF_MAX_SEC)
+                    last_error = exc
+                except Exception as exc:
+                    return DeliveryResult(chat_id, False, attempts, f"{type(exc).__name__}: {exc}")
+                if attempts >= self.max_attempts:
+                    return DeliveryResult(chat_id, False, attempts, str(last_error))
+
+    async def send_all(
+        self, chat_ids: Iterable[int], send_fn: Callable[[int], Awaitable[object]], label: str = "fan-out"
+    ) -> list[DeliveryResult]:
+        """send_fn(chat_id) for every recipient concurrently; logs a delivery summary."""
+        results = await asyncio.gather(*(self.send(cid, lambda cid=cid: send_fn(cid)) for cid in chat_ids))
+        log_summary(label, list(results))
+        return list(results)
+
+
+_default: TelegramSender | None = None
+
+
+def get_sender() -> TelegramSender:
+    """Process-wide sender: limits are per bot, so all fan-out paths must share one."""
+    global _default
+    if _default is None:
+        _default = TelegramSender.from_env()
+    return _default
+
+
+def _retry_after_from_http_error(exc: error.HTTPError) -> float | None:
+    if exc.code != 429:
+        return None
+    try:
+        body = json.loads(exc.read().decode("utf-8"))
+        return float(body.get("parameters", {}).get("retry_after", 1))
+    except Exception:
+        return 1.0
+
+
+def post_telegram(
+    token: str,
+    method: str,
+    params: dict,
+    timeout: float = 20,
+    max_attempts: int = 4,
+    sleep: Callable[[float], None] = time.sleep,
+) -> bytes:
+    """Synchronous Bot API call; honours 429 retry_after and retries 5xx/network errors."""
+    payload = parse.urlencode(params).encode("utf-8")
+    backoff = 1.0
+    max_attempts = max(1, max_attempts)
+    for attempt in range(1, max_attempts + 1):
+        req = request.Request(
+            url=f"https://api.telegram.org/bot{token}/{method}",
+            data=payload,
+            method="POST",
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        try:
+            with request.urlopen(req, timeout=timeout) as resp:
+                return resp.read()
+        except error.HTTPError as exc:
+            retry_after = _retry_after_from_http_error(exc)
+            if attempt >= max_attempts or (retry_after is None and exc.code < 500):
+                raise
+            delay = retry_after if retry_after is not None else backoff
+        except error.URLError:
+            if attempt >= max_attempts:
+                raise
+            delay = backoff
+        sleep(delay)
+        backoff = min(backoff * 2, BACKOFF_MAX_SEC)
+    raise RuntimeError("unreachable")
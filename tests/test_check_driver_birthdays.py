@@ -2,6 +2,7 @@ from datetime import date
 from urllib import parse
 
 import check_driver_birthdays as birthdays
+import telegram_sender
 
 
 def test_parse_birth_date_accepts_sheet_date_formats():
@@ -63,7 +64,7 @@ def test_send_telegram_uses_driver_birthday_chat_id(monkeypatch):
 
     monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "123:ABC")
     monkeypatch.setenv("DRIVER_BIRTHDAY_NOTIFY_CHAT_ID", "745125435")
-    monkeypatch.setattr(birthdays.request, "urlopen", fake_urlopen)
+    monkeypatch.setattr(telegram_sender.request, "urlopen", fake_urlopen)
 
     birthdays._send_telegram("birthday")
 
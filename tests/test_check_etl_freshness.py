@@ -3,6 +3,7 @@ from types import SimpleNamespace
 from urllib import parse
 
 import check_etl_freshness as freshness
+import telegram_sender
 
 
 def _dt_utc(year, month, day, hour, minute=0):
@@ -91,7 +92,7 @@ def test_send_telegram_defaults_to_admin_chat_id(monkeypatch):
 
     monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "123:ABC")
     monkeypatch.delenv("ADMIN_CHAT_ID", raising=False)
-    monkeypatch.setattr(freshness.request, "urlopen", fake_urlopen)
+    monkeypatch.setattr(telegram_sender.request, "urlopen", fake_urlopen)
 
     freshness._send_telegram("test message")
 
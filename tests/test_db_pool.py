@@ -0,0 +1,64 @@
+import sys
+import types
+
+import pytest
+
+import db_pool
+
+
+class _FakeAsyncPool:
+    instances: list["_FakeAsyncPool"] = []
+
+    def __init__(self, conninfo, **kwargs):
+        self.conninfo = conninfo
+        self.kwargs = kwargs
+        self.min_size = kwargs["min_size"]
+        self.max_size = kwargs["max_size"]
+        self.opened_with = None
+        self.closed = False
+        _FakeAsyncPool.instances.append(self)
+
+    @staticmethod
+    async def check_connection(conn):
+        return None
+
+    async def open(self, wait=True, timeout=30.0):
+        self.opened_with = wait
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_pool_module(monkeypatch):
+    _FakeAsyncPool.instances = []
+    monkeypatch.setitem(sys.modules, "psycopg_pool", types.SimpleNamespace(AsyncConnectionPool=_FakeAsyncPool))
+    monkeypatch.setattr(db_pool, "_pool", None)
+    return _FakeAsyncPool
+
+
+@pytest.mark.asyncio
+async def test_open_pool_is_idempotent_and_never_waits_for_connections(fake_pool_module, monkeypatch):
+    monkeypatch.setenv("DB_POOL_MAX_SIZE", "6")
+    monkeypatch.setenv("DB_POOL_MAX_IDLE_SEC", "120")
+
+    pool = await db_pool.open_pool("postgresql://fake")
+    assert await db_pool.open_pool("postgresql://other") is pool
+    assert db_pool.get_pool() is pool
+    assert len(fake_pool_module.instances) == 1
+    assert pool.opened_with is False
+    assert pool.kwargs["open"] is False
+    assert pool.kwargs["check"] is _FakeAsyncPool.check_connection
+    assert (pool.min_size, pool.max_size, pool.kwargs["max_idle"]) == (1, 6, 120.0)
+
+    await db_pool.close_pool()
+    assert pool.closed is True
+    assert db_pool.get_pool() is None
+
+
+@pytest.mark.asyncio
+async def test_open_pool_without_database_url_returns_none(fake_pool_module, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+
+    assert await db_pool.open_pool() is None
+    assert fake_pool_module.instances == []
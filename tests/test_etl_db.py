@@ -0,0 +1,207 @@
+from contextlib import contextmanager
+
+import pytest
+
+import etl_db
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self.calls: list[tuple] = []
+        self.rowcount = 0
+        self._results: list[tuple] = []
+
+    def execute(self, query, params=None):
+        self.calls.append(("execute", query, params, self.connection.in_pipeline))
+        self.rowcount = 1
+        self._results = [(len(self.calls),)]
+
+    def executemany(self, query, params_seq, returning=False):
+        self.calls.append(("executemany", query, list(params_seq), self.connection.in_pipeline))
+        self.rowcount = len(self.calls[-1][2])
+        self._results = [(i + 100,) for i in range(len(self.calls[-1][2]))] if returning else []
+
+    def fetchone(self):
+        return self._results[0] if self._results else None
+
+    def nextset(self):
+        self._results = self._results[1:]
+        return True if self._results else None
+
+    def close(self):
+        pass
+
+
+class _FakeConn:
+    def __init__(self):
+        self.in_pipeline = False
+        self.pipelines = 0
+        self.cursors: list[_FakeCursor] = []
+
+    @contextmanager
+    def pipeline(self):
+        self.in_pipeline = True
+        self.pipelines += 1
+        try:
+            yield
+        finally:
+            self.in_pipeline = False
+
+    def cursor(self):
+        cur = _FakeCursor(self)
+        self.cursors.append(cur)
+        return cur
+
+
+@pytest.fixture(autouse=True)
+def _pipeline_available(monkeypatch):
+    monkeypatch.setattr(etl_db, "pipeline_supported", lambda: True)
+
+
+def test_execute_batch_pipeline_runs_executemany_inside_one_pipeline():
+    conn = _FakeConn()
+    cur = conn.cursor()
+
+    ids = etl_db.execute_batch(cur, "INSERT ... RETURNING id", [("a",), ("b",), ("c",)], returning=True)
+
+    assert ids == [(100,), (101,), (102,)]
+    assert conn.pipelines == 1
+    assert [(c[0], c[3]) for c in cur.calls] == [("executemany", True)]
+
+
+def test_execute_batch_rows_mode_executes_each_row_without_pipeline():
+    conn = _FakeConn()
+    cur = conn.cursor()
+
+    count = etl_db.execute_batch(cur, "INSERT ...", [(1,), (2,)], mode=etl_db.BATCH_MODE_ROWS)
+
+    assert count == 2
+    assert conn.pipelines == 0
+    assert [c[0] for c in cur.calls] == ["execute", "execute"]
+
+
+def test_execute_batch_handles_empty_input_and_unknown_mode():
+    cur = _FakeConn().cursor()
+
+    assert etl_db.execute_batch(cur, "INSERT ...", [], returning=True) == []
+    assert etl_db.execute_batch(cur, "INSERT ...", []) == 0
+    assert cur.calls == []
+    with pytest.raises(ValueError):
+        etl_db.execute_batch(cur, "INSERT ...", [(1,)], mode="bulk")
+
+
+def test_execute_pipelined_runs_statements_in_order_in_one_pipeline():
+    conn = _FakeConn()
+    cur = conn.cursor()
+
+    rowcounts = etl_db.execute_pipelined(cur, [("DELETE FROM t", None), ("UPDATE etl_log SET x = %s", (1,))])
+
+    assert rowcounts == [1, 1]
+    assert conn.pipelines == 1
+    executed = [c for stmt_cur in conn.cursors for c in stmt_cur.calls]
+    assert [(c[1], c[3]) for c in executed] == [("DELETE FROM t", True), ("UPDATE etl_log SET x = %s", True)]
+
+
+def test_connection_reuses_given_conn_without_closing():
+    class _Psycopg:
+        def connect(self, url):
+            raise AssertionError("must not open a second connection")
+
+    conn = _FakeConn()
+    with etl_db.connection(_Psycopg(), "postgresql://fake", conn) as got:
+        assert got is conn
+
+
+class _UndefinedTable(Exception):
+    sqlstate = "42P01"
+
+
+class _StatusCursor:
+    def __init__(self, status_rows=None, log_rows=()):
+        self.connection = self
+        self.status_rows = status_rows
+        self.log_rows = list(log_rows)
+        self.queries: list[tuple] = []
+        self.rolled_back = 0
+        self._rows: list[tuple] = []
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def execute(self, query, params=None):
+        self.queries.append((" ".join(query.split()), params))
+        if "FROM etl_source_status" in query:
+            if self.status_rows is None:
+                raise _UndefinedTable('relation "etl_source_status" does not exist')
+            self._rows = self.status_rows
+        else:
+            self._rows = self.log_rows
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_fetch_last_success_reads_status_table_only():
+    cur = _StatusCursor(status_rows=[("xlsm_lkw_fahrer_data", "ts1")])
+
+    assert etl_db.fetch_last_success(cur, ["xlsm_lkw_fahrer_data"]) == [("xlsm_lkw_fahrer_data", "ts1")]
+    assert cur.queries == [
+        (
+            "SELECT source_name, last_success_at FROM etl_source_status WHERE source_name = ANY(%s)",
+            (["xlsm_lkw_fahrer_data"],),
+        )
+    ]
+
+
+def test_fetch_last_success_falls_back_to_etl_log_before_migration():
+    cur = _StatusCursor(status_rows=None, log_rows=[("xlsb_fahrer_plan", "ts2")])
+
+    assert etl_db.fetch_last_success(cur) == [("xlsb_fahrer_plan", "ts2")]
+    assert cur.rolled_back == 1
+    assert "FROM etl_log WHERE status = 'success' AND source_name <> %s ORDER BY source_name" in cur.queries[-1][0]
+    assert cur.queries[-1][1] == ("etl_pipeline",)
+
+
+def test_fetch_last_success_without_names_excludes_pipeline_summary():
+    cur = _StatusCursor(status_rows=[("xlsb_fahrer_plan", "ts3")])
+
+    etl_db.fetch_last_success(cur)
+
+    assert cur.queries == [
+        ("SELECT source_name, last_success_at FROM etl_source_status WHERE source_name <> %s", ("etl_pipeline",))
+    ]
+    assert "source_name <> 'etl_pipeline'" in etl_db.DATA_VERSION_SQL
+
+
+def test_source_status_upsert_only_moves_forward():
+    query, params = etl_db.source_status_statement(7)
+
+    assert params == (7,)
+    assert "WHERE id = %s AND status = 'success'" in query
+    assert "WHERE etl_source_status.last_success_at <= EXCLUDED.last_success_at" in query
+
+
+def test_skipped_step_keeps_the_loading_etl_log_id():
+    loaded, _ = etl_db.source_status_statement(7)
+    skipped, _ = etl_db.source_status_statement(8, loaded=False)
+
+    assert "etl_log_id = EXCLUDED.etl_log_id" in loaded
+    assert "etl_log_id = etl_source_status.etl_log_id" in skipped
+
+
+def test_pipeline_summary_is_never_a_source_status_row():
+    class _Cur:
+        def __init__(self):
+            self.queries = []
+
+        def execute(self, query, params=None):
+            self.queries.append(" ".join(query.split()))
+
+    cur = _Cur()
+    etl_db.ensure_source_status_table(cur)
+
+    assert "source_name <> 'etl_pipeline'" in cur.queries[1]
+    assert cur.queries[2] == "DELETE FROM etl_source_status WHERE source_name = 'etl_pipeline'"
+    assert "ON etl_log (source_name, (COALESCE(finished_at, started_at)) DESC, id DESC)" in cur.queries[3]
+    assert cur.queries[3].endswith("WHERE status = 'success'")
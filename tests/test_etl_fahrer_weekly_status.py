@@ -3,73 +3,7 @@ from datetime import date
 from openpyxl import Workbook
 
 from etl_xlsm_to_postgres import extract_drivers, extract_fahrer_weekly_statuses
-
-
-def _build_fahrer_sheet():
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Fahrer"
-
-    ws["A1"] = ">>Neu Fahrer"
-    ws["B1"] = ">>Search"
-    ws["Z1"] = 2026
-    ws["AH1"] = 2026
-
-    headers = [
-        "Fahrer-ID",
-        "Fahrername",
-        "Firma",
-        "Telefonnummer",
-        "Führerschein",
-        "LKW-Typ",
-        "Arbeitsplan",
-        "Status",
-        "Datum entlassen",
-    ]
-    for idx, value in enumerate(headers, start=1):
-        ws.cell(row=2, column=idx, value=value)
-
-    ws["Z2"] = "Urlaub gesamt"
-    ws["AA2"] = "Krankheitstage"
-    ws["AH2"] = 2026
-    ws["AI2"] = 2026
-    ws["AJ2"] = 2026
-
-    sub_headers = ["ID", "Name", "Company", "Phone", "License", "Type", "Schedule", "Active/Fired", "Date"]
-    for idx, value in enumerate(sub_headers, start=1):
-        ws.cell(row=3, column=idx, value=value)
-
-    ws["Z3"] = "Total vacation"
-    ws["AA3"] = "Sick Days"
-    ws["AH3"] = 1
-    ws["AI3"] = 2
-    ws["AJ3"] = 3
-
-    ws["A4"] = "F001"
-    ws["B4"] = "Driver One"
-    ws["C4"] = "Groo"
-    ws["D4"] = "+491111"
-    ws["F4"] = "Container"
-    ws["G4"] = "3M/3M"
-    ws["Z4"] = 10
-    ws["AA4"] = 2
-    ws["AH4"] = "U"
-    ws["AI4"] = "U"
-    ws["AJ4"] = "К"
-
-    ws["A5"] = "F002"
-    ws["B5"] = "Driver Two"
-    ws["C5"] = "Groo"
-    ws["D5"] = "+492222"
-    ws["F5"] = "Planen"
-    ws["G5"] = "2M/2M"
-    ws["H5"] = "Fahrer entlassen"
-    ws["I5"] = date(2026, 1, 12)
-    ws["AH5"] = "U"
-    ws["AI5"] = "K"
-    ws["AJ5"] = "U"
-
-    return wb
+from tests.workbook_builders import build_fahrer_sheet
 
 
 def _build_fahrer_sheet_with_current_card_dates():
@@ -127,7 +61,7 @@ def _build_fahrer_sheet_with_current_card_dates():
 
 
 def test_extract_fahrer_weekly_statuses_parses_all_driver_weeks():
-    wb = _build_fahrer_sheet()
+    wb = build_fahrer_sheet()
 
     rows = extract_fahrer_weekly_statuses(wb)
 
@@ -143,7 +77,7 @@ def test_extract_fahrer_weekly_statuses_parses_all_driver_weeks():
 
 
 def test_extract_fahrer_weekly_statuses_normalizes_cyrillic_sick_code():
-    wb = _build_fahrer_sheet()
+    wb = build_fahrer_sheet()
 
     rows = extract_fahrer_weekly_statuses(wb)
     target = next(r for r in rows if r.fahrer_id == "F001" and r.iso_week == 3)
@@ -152,7 +86,7 @@ def test_extract_fahrer_weekly_statuses_normalizes_cyrillic_sick_code():
 
 
 def test_extract_fahrer_weekly_statuses_marks_dismissed_driver_inactive_from_week_start():
-    wb = _build_fahrer_sheet()
+    wb = build_fahrer_sheet()
 
     rows = extract_fahrer_weekly_statuses(wb)
     week2 = next(r for r in rows if r.fahrer_id == "F002" and r.iso_week == 2)
@@ -0,0 +1,113 @@
+from datetime import date
+
+from etl_xlsm_to_postgres import DriverRow, TruckRow, _master_row_hash, _upsert_drivers, _upsert_trucks
+
+
+class _FakeCursor:
+    def __init__(self, result=(0, 0), stored=None):
+        self.result = result
+        self.stored = stored or {}
+        self.executed: list[tuple[str, tuple]] = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return list(self.stored.items())
+
+    def fetchone(self):
+        return self.result
+
+
+def _truck(external_id: str, plate: str, company: str | None = "Groo GmbH") -> TruckRow:
+    return TruckRow(
+        external_id=external_id,
+        plate_number=plate,
+        truck_type="Sattelzug",
+        company_name=company,
+        status="aktiv",
+        status_since=date(2026, 1, 5) if external_id == "L2" else None,
+        is_active=True,
+        raw_payload={"LKW-ID": external_id},
+    )
+
+
+def test_upsert_trucks_sends_one_statement_and_returns_counts():
+    cur = _FakeCursor(result=(1, 1))
+
+    counts = _upsert_trucks(cur, [_truck("L1", "GR-OO1"), _truck("L2", "GR-OO2", None)], {"Groo GmbH": 7})
+
+    assert counts == (1, 1, 0)
+    assert len(cur.executed) == 2
+    assert "source_row_hash FROM trucks" in cur.executed[0][0]
+    sql, params = cur.executed[1]
+    assert "unnest(" in sql
+    assert "RETURNING (xmax = 0) AS inserted" in sql
+    assert "IS DISTINCT FROM EXCLUDED.source_row_hash" in sql
+    assert params[0] == ["L1", "L2"]
+    assert params[3] == [7, None]
+    assert params[5] == [None, date(2026, 1, 5)]
+    assert params[7] == [_master_row_hash(_truck("L1", "GR-OO1"), 7), _master_row_hash(_truck("L2", "GR-OO2", None), None)]
+    assert params[8] == ['{"LKW-ID": "L1"}', '{"LKW-ID": "L2"}']
+
+
+def test_upsert_trucks_keeps_last_duplicate_row():
+    cur = _FakeCursor(result=(1, 0))
+
+    _upsert_trucks(cur, [_truck("L1", "OLD"), _truck("L1", "NEW")], {})
+
+    _, params = cur.executed[-1]
+    assert params[0] == ["L1"]
+    assert params[1] == ["NEW"]
+
+
+def test_upsert_trucks_skips_rows_with_unchanged_hash():
+    unchanged = _truck("L1", "GR-OO1")
+    changed = _truck("L2", "GR-OO2")
+    stored = {"L1": _master_row_hash(unchanged, 7), "L2": "stale"}
+    cur = _FakeCursor(result=(0, 1), stored=stored)
+
+    counts = _upsert_trucks(cur, [unchanged, changed, _truck("L3", "GR-OO3")], {"Groo GmbH": 7})
+
+    _, params = cur.executed[-1]
+    assert params[0] == ["L2", "L3"]
+    assert counts == (0, 1, 2)
+
+
+def test_upsert_trucks_sends_nothing_when_all_rows_unchanged():
+    truck = _truck("L1", "GR-OO1")
+    cur = _FakeCursor(stored={"L1": _master_row_hash(truck, 7)})
+
+    assert _upsert_trucks(cur, [truck], {"Groo GmbH": 7}) == (0, 0, 1)
+    assert len(cur.executed) == 1
+
+
+def test_master_row_hash_tracks_fields_and_company():
+    base = _truck("L1", "GR-OO1")
+
+    assert _master_row_hash(base, 7) == _master_row_hash(_truck("L1", "GR-OO1"), 7)
+    assert _master_row_hash(base, 7) != _master_row_hash(base, 8)
+    assert _master_row_hash(base, 7) != _master_row_hash(_truck("L1", "GR-OO9"), 7)
+
+
+def test_upsert_drivers_skips_database_for_empty_input():
+    cur = _FakeCursor()
+
+    assert _upsert_drivers(cur, [], {}) == (0, 0, 0)
+    assert cur.executed == []
+
+
+def test_upsert_drivers_maps_company_ids():
+    cur = _FakeCursor(result=(0, 1))
+    driver = DriverRow(
+        external_id="F1",
+        full_name="Max Mustermann",
+        company_name="Groo GmbH",
+        phone="+49 1",
+        is_active=False,
+        raw_payload={},
+    )
+
+    assert _upsert_drivers(cur, [driver], {"Groo GmbH": 3}) == (0, 1, 0)
+    _, params = cur.executed[-1]
+    assert params == (["F1"], ["Max Mustermann"], ["+49 1"], [3], [False], [_master_row_hash(driver, 3)], ["{}"])
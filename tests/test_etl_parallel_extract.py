@@ -0,0 +1,25 @@
+from etl_xlsm_to_postgres import EXTRACTORS, _run_extractors
+from tests.workbook_builders import build_fahrer_sheet
+
+
+def test_parallel_extraction_matches_sequential(tmp_path):
+    path = tmp_path / "book.xlsx"
+    build_fahrer_sheet().save(path)
+    names = ["drivers", "fahrer_weekly_rows", "repair_rows"]
+
+    sequential = _run_extractors(path, names, workers=1)
+    parallel = _run_extractors(path, names, workers=2)
+
+    assert list(parallel) == list(sequential) == names
+    assert parallel == sequential
+    assert sequential["drivers"] and sequential["fahrer_weekly_rows"]
+
+
+def test_run_extractors_keeps_registry_order_and_ignores_unknown(tmp_path):
+    path = tmp_path / "book.xlsx"
+    build_fahrer_sheet().save(path)
+
+    result = _run_extractors(path, ["fahrer_weekly_rows", "drivers", "nope"], workers=1)
+
+    assert list(result) == [n for n in EXTRACTORS if n in {"drivers", "fahrer_weekly_rows"}]
+    assert _run_extractors(path, [], workers=4) == {}
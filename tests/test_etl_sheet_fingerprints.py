@@ -0,0 +1,85 @@
+import zipfile
+from pathlib import Path
+
+from openpyxl import Workbook
+
+import xlsx_package
+from etl_xlsm_to_postgres import (
+    EXTRACTOR_SOURCES,
+    REPORT_REPLACE_TABLES,
+    REPORT_TABLE_SHEETS,
+    _extractor_version,
+    _tables_to_refresh,
+)
+from tests.workbook_builders import write_excel_style_package
+
+
+def _save_workbook(path, repair_price=85.71, lkw_name="GR-OO1708"):
+    wb = Workbook()
+    lkw = wb.active
+    lkw.title = "LKW"
+    lkw.append(["LKW-ID", "LKW-Nummer"])
+    lkw.append(["L1", lkw_name])
+    repair = wb.create_sheet("Repair")
+    repair.append(["Truck", "Total Price"])
+    repair.append(["GR-OO2245", repair_price])
+    wb.save(path)
+
+
+def test_sheet_fingerprints_change_only_for_edited_sheet(tmp_path):
+    first = tmp_path / "first.xlsx"
+    second = tmp_path / "second.xlsx"
+    _save_workbook(first)
+    _save_workbook(second, repair_price=90.0)
+
+    before = xlsx_package.sheet_fingerprints(first, ["LKW", "Repair", "YF"])
+    after = xlsx_package.sheet_fingerprints(second, ["LKW", "Repair", "YF"])
+
+    assert before["LKW"] == after["LKW"]
+    assert before["Repair"] != after["Repair"]
+    assert before["YF"] == after["YF"] == xlsx_package.MISSING_SHEET_FINGERPRINT
+
+
+def test_sheet_fingerprints_follow_shared_string_values(tmp_path):
+    first = tmp_path / "first.xlsm"
+    second = tmp_path / "second.xlsm"
+    write_excel_style_package(first, ["LKW-ID", "GR-OO1708"])
+    write_excel_style_package(second, ["LKW-ID", "GR-OO9999"])
+
+    before = xlsx_package.sheet_fingerprints(first, ["LKW", "Repair"])
+    after = xlsx_package.sheet_fingerprints(second, ["LKW", "Repair"])
+
+    assert before["LKW"] != after["LKW"]
+    assert before["Repair"] == after["Repair"]
+
+
+def test_sheet_parts_and_shared_strings(tmp_path):
+    path = tmp_path / "book.xlsm"
+    write_excel_style_package(path, ["LKW-ID", "GR-OO1708"])
+
+    with zipfile.ZipFile(path) as zf:
+        parts = xlsx_package.sheet_parts(zf)
+        strings = xlsx_package.read_shared_strings(zf)
+
+    assert parts == {"LKW": "xl/worksheets/sheet1.xml", "Repair": "xl/worksheets/sheet2.xml"}
+    assert strings == ["LKW-ID", "GR-OO1708"]
+
+
+def test_tables_to_refresh_maps_sheets_to_report_tables():
+    assert set(REPORT_TABLE_SHEETS) == set(REPORT_REPLACE_TABLES)
+    assert _tables_to_refresh({"Repair"}) == ["report_repair_records"]
+    assert _tables_to_refresh({"Shell"}) == ["report_lkw_fuel_transactions"]
+    assert _tables_to_refresh({"Bericht_Dispo"}) == ["report_einnahmen_monthly", "report_einnahmen_firm_monthly"]
+    assert _tables_to_refresh({"LKW"}) == []
+
+
+def test_extractor_version_covers_the_package_reader(tmp_path):
+    assert Path(xlsx_package.__file__) in EXTRACTOR_SOURCES
+
+    etl, reader = tmp_path / "etl.py", tmp_path / "reader.py"
+    etl.write_text("A = 1\n")
+    reader.write_text("B = 1\n")
+    before = _extractor_version([etl, reader])
+    reader.write_text("B = 2\n")
+
+    assert _extractor_version([etl, reader]) != before
@@ -1,5 +1,19 @@
+from datetime import date
+from decimal import Decimal
 from pathlib import Path
 
+import pytest
+
+from etl_xlsm_to_postgres import (
+    REPORT_REPLACE_TABLES,
+    REPORT_ROW_TYPES,
+    RepairRow,
+    _drop_retired_report_tables,
+    _shadow_index_sql,
+    _stage_report_rows,
+    _swap_report_staging_tables,
+)
+
 
 ROOT = Path(__file__).resolve().parents[1]
 
@@ -11,11 +25,11 @@ def _read(name: str) -> str:
 def test_xlsm_report_import_writes_to_staging_before_swap():
     source = _read("etl_xlsm_to_postgres.py")
 
-    assert "_ensure_report_staging_tables(cur)" in source
-    assert "INSERT INTO tmp_report_fahrer_weekly_status" in source
-    assert "INSERT INTO tmp_report_lkw_fuel_transactions" in source
-    assert "INSERT INTO tmp_report_yf_lkw_daily" in source
-    assert "rows_deleted += _swap_report_staging_tables(cur)" in source
+    assert "_ensure_report_staging_tables(cur, refresh_tables)" in source
+    assert "_stage_report_rows(cur, table_name, report_rows[table_name], load_mode)" in source
+    assert 'COPY tmp_{table_name} ({column_list}) FROM STDIN' in source
+    assert 'INSERT INTO tmp_{table_name} ({column_list})' in source
+    assert "rows_deleted += _swap_report_staging_tables(\n" in source
     assert "DELETE FROM report_fahrer_weekly_status" not in source
     assert "DELETE FROM report_lkw_fuel_transactions" not in source
 
@@ -25,8 +39,8 @@ def test_xlsb_plan_import_writes_to_staging_before_swap():
 
     assert "CREATE TEMP TABLE tmp_schedules" in source
     assert "INSERT INTO tmp_schedules" in source
-    assert "DELETE FROM schedules WHERE source_sheet = %s" in source
-    assert "FROM tmp_schedules" in source
+    assert "DELETE FROM schedules WHERE source_sheet = %s" not in source
+    assert "FROM tmp_schedules AS t" in source
 
 
 def test_sim_import_writes_to_staging_before_swap():
@@ -38,3 +52,210 @@ def test_sim_import_writes_to_staging_before_swap():
     assert "INSERT INTO tmp_report_sim_vodafone" in source
     assert "INSERT INTO report_sim_contado SELECT * FROM tmp_report_sim_contado" in source
     assert "INSERT INTO report_sim_vodafone SELECT * FROM tmp_report_sim_vodafone" in source
+
+
+def test_every_import_updates_source_status_with_its_success_row():
+    for name in ("etl_xlsm_to_postgres.py", "etl_xlsb_to_postgres.py", "etl_sim_cards_to_postgres.py"):
+        source = _read(name)
+        assert "etl_db.ensure_source_status_table(cur)" in source, name
+        success_at = source.index("status = 'success',")
+        status_at = max(
+            source.find("etl_db.record_source_success(cur, log_id)", success_at),
+            source.find("etl_db.source_status_statement(log_id)", success_at),
+        )
+        commit_at = source.index("conn.commit()", success_at)
+        assert success_at < status_at < commit_at, name
+
+
+class _FakeCopy:
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def write_row(self, row):
+        self.sink.append(row)
+
+
+class _FakeCursor:
+    def __init__(self):
+        self.copies: list[str] = []
+        self.copied_rows: list[tuple] = []
+        self.executed: list[tuple[str, tuple]] = []
+        self.rowcount = 0
+
+    def copy(self, sql):
+        self.copies.append(sql)
+        return _FakeCopy(self.copied_rows)
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return (0,)
+
+
+def _repair_rows():
+    return [
+        RepairRow(
+            report_year=2026,
+            report_month=4,
+            iso_week=15,
+            invoice_date=date(2026, 4, 7),
+            truck_number="GR-OO2245",
+            original_truck_number="GR-OO2245",
+            repair_name="Service",
+            total_price=Decimal("164.61"),
+            invoice="7601077285",
+            seller="MAN Truck",
+            buyer="Groo GmbH",
+            kategorie="Service",
+            source_row=4,
+            raw_payload={"Date": date(2026, 4, 7)},
+        )
+    ]
+
+
+def test_every_report_table_has_a_row_type():
+    assert set(REPORT_ROW_TYPES) == set(REPORT_REPLACE_TABLES)
+
+
+def test_copy_and_rows_modes_stage_identical_values():
+    copy_cur = _FakeCursor()
+    rows_cur = _FakeCursor()
+
+    assert _stage_report_rows(copy_cur, "report_repair_records", _repair_rows(), "copy") == 1
+    assert _stage_report_rows(rows_cur, "report_repair_records", _repair_rows(), "rows") == 1
+
+    assert copy_cur.copies == [
+        "COPY tmp_report_repair_records (report_year, report_month, iso_week, invoice_date, truck_number, "
+        "original_truck_number, repair_name, total_price, invoice, seller, buyer, kategorie, source_row, "
+        "raw_payload) FROM STDIN"
+    ]
+    assert copy_cur.executed == []
+    assert len(rows_cur.executed) == 1
+    sql, params = rows_cur.executed[0]
+    assert sql.startswith("INSERT INTO tmp_report_repair_records (report_year,")
+    assert sql.endswith("%s::jsonb)")
+    assert copy_cur.copied_rows == [params]
+    assert params[-1] == '{"Date": "2026-04-07"}'
+
+
+def test_stage_report_rows_skips_empty_lists_and_rejects_unknown_mode():
+    cur = _FakeCursor()
+    assert _stage_report_rows(cur, "report_repair_records", [], "copy") == 0
+    assert cur.copies == []
+    with pytest.raises(ValueError):
+        _stage_report_rows(cur, "report_repair_records", _repair_rows(), "bulk")
+
+
+def test_shadow_index_sql_targets_shadow_table():
+    assert _shadow_index_sql(
+        "CREATE UNIQUE INDEX report_repair_records_pkey ON public.report_repair_records USING btree (source_row)",
+        "report_repair_records_pkey",
+        "report_repair_records__next",
+    ) == "CREATE UNIQUE INDEX report_repair_records_pkey__next ON report_repair_records__next USING btree (source_row)"
+
+
+class _IndexedCursor(_FakeCursor):
+    def __init__(self):
+        super().__init__()
+        self._last_sql = ""
+
+    def execute(self, sql, params=None):
+        self._last_sql = sql
+        super().execute(" ".join(sql.split()), params)
+
+    def fetchall(self):
+        if "FROM pg_index" in self._last_sql:
+            return [("idx_lookup", "CREATE INDEX idx_lookup ON public.t USING btree (a)", False)]
+        return []
+
+    def fetchone(self):
+        return (3,)
+
+
+def test_rename_swap_builds_shadow_tables_before_renaming():
+    cur = _IndexedCursor()
+
+    deleted = _swap_report_staging_tables(cur, "rename", retire_suffix="old_7")
+
+    statements = [sql for sql, _ in cur.executed]
+    assert deleted == 3 * len(REPORT_REPLACE_TABLES)
+    assert not any(sql.startswith("DELETE FROM") for sql in statements)
+    assert "CREATE UNLOGGED TABLE report_repair_records__next (LIKE report_repair_records INCLUDING DEFAULTS INCLUDING CONSTRAINTS)" in statements
+    assert "ALTER TABLE report_repair_records__next SET LOGGED" in statements
+    assert "CREATE INDEX idx_lookup__next ON report_repair_records__next USING btree (a)" in statements
+
+    first_rename = next(i for i, sql in enumerate(statements) if " RENAME TO " in sql)
+    assert all(" RENAME TO " in sql for sql in statements[first_rename:])
+    assert statements[first_rename:first_rename + 4] == [
+        "ALTER TABLE report_fahrer_weekly_status RENAME TO report_fahrer_weekly_status__old_7",
+        "ALTER INDEX idx_lookup RENAME TO idx_lookup__old_7",
+        "ALTER TABLE report_fahrer_weekly_status__next RENAME TO report_fahrer_weekly_status",
+        "ALTER INDEX idx_lookup__next RENAME TO idx_lookup",
+    ]
+
+
+def test_delete_swap_keeps_in_place_replacement():
+    cur = _FakeCursor()
+
+    _swap_report_staging_tables(cur, "delete")
+
+    assert cur.executed[0] == ("DELETE FROM report_fahrer_weekly_status", None)
+    assert cur.executed[1] == ("INSERT INTO report_fahrer_weekly_status SELECT * FROM tmp_report_fahrer_weekly_status", None)
+
+
+class _FakeConn:
+    def __init__(self, tables, busy=()):
+        self.tables = tables
+        self.busy = set(busy)
+        self.dropped: list[str] = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        conn = self
+
+        class _Cur:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, exc_type, exc, tb):
+                return False
+
+            def execute(self, sql, params=None):
+                if sql.startswith("DROP TABLE IF EXISTS "):
+                    name = sql.rsplit(" ", 1)[-1]
+                    if name in conn.busy:
+                        raise RuntimeError("lock timeout")
+                    conn.dropped.append(name)
+
+            def fetchall(self):
+                return [(name,) for name in conn.tables]
+
+        return _Cur()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_drop_retired_report_tables_skips_busy_and_foreign_tables():
+    conn = _FakeConn(
+        ["report_repair_records", "report_repair_records__old_5", "report_yf_lkw_daily__old_5", "drivers"],
+        busy={"report_yf_lkw_daily__old_5"},
+    )
+
+    assert _drop_retired_report_tables(conn) == 1
+    assert conn.dropped == ["report_repair_records__old_5"]
+    assert conn.rollbacks == 1
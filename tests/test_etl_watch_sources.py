@@ -0,0 +1,311 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import etl_watch_sources as watch
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _sources(tmp_path):
+    sources = {
+        "LKW_Fahrer_Data.xlsm": tmp_path / "LKW_Fahrer_Data.xlsm",
+        "LKW_Fahrer_Plan.xlsb": tmp_path / "LKW_Fahrer_Plan.xlsb",
+        "LOG_INs 2.xlsx": tmp_path / "LOG_INs 2.xlsx",
+    }
+    for path in sources.values():
+        path.write_bytes(b"v1")
+    return sources
+
+
+class TestFileDebouncer:
+    def test_file_is_ready_only_after_settle_and_stable_size(self, tmp_path):
+        sources = _sources(tmp_path)
+        clock = _Clock()
+        debouncer = watch.FileDebouncer(sources, settle_sec=30, clock=clock, probe=lambda path: True)
+        plan = sources["LKW_Fahrer_Plan.xlsb"]
+
+        assert debouncer.touch(watch._path_key(plan)) == "LKW_Fahrer_Plan.xlsb"
+        assert debouncer.touch(watch._path_key(tmp_path / "unrelated.txt")) is None
+        clock.now += 10
+        assert debouncer.ready() == []
+
+        # Still growing when the settle window ends: the window restarts.
+        plan.write_bytes(b"v2 with more bytes")
+        clock.now += 25
+        assert debouncer.ready() == []
+        assert debouncer.pending == ["LKW_Fahrer_Plan.xlsb"]
+
+        clock.now += 30
+        assert debouncer.ready() == ["LKW_Fahrer_Plan.xlsb"]
+        assert debouncer.pending == []
+
+    def test_locked_file_stays_pending(self, tmp_path):
+        sources = _sources(tmp_path)
+        clock = _Clock()
+        locked = {"value": True}
+        debouncer = watch.FileDebouncer(sources, settle_sec=5, clock=clock, probe=lambda path: not locked["value"])
+        debouncer.touch(watch._path_key(sources["LKW_Fahrer_Data.xlsm"]))
+
+        clock.now += 10
+        assert debouncer.ready() == []
+        locked["value"] = False
+        assert debouncer.ready() == ["LKW_Fahrer_Data.xlsm"]
+
+    @pytest.mark.skipif(os.name == "nt", reason="flock probe is posix-only")
+    def test_lock_probe_sees_exclusive_flock(self, tmp_path):
+        import fcntl
+
+        path = tmp_path / "book.xlsb"
+        path.write_bytes(b"data")
+        assert watch.is_write_complete(path) is True
+        with open(path, "rb+") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            assert watch.is_write_complete(path) is False
+
+
+class TestWatchBackends:
+    def test_polling_backend_reports_changed_files(self, tmp_path):
+        sources = _sources(tmp_path)
+        backend = watch.PollingBackend(list(sources.values()), poll_sec=0)
+        assert backend.wait(0) == set()
+
+        sources["LOG_INs 2.xlsx"].write_bytes(b"v2 longer")
+        assert backend.wait(0) == {watch._path_key(sources["LOG_INs 2.xlsx"])}
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+    def test_inotify_backend_sees_rename_over_watched_file(self, tmp_path):
+        sources = _sources(tmp_path)
+        backend = watch.InotifyBackend(list(sources.values()))
+        try:
+            tmp_file = tmp_path / "~$save.tmp"
+            tmp_file.write_bytes(b"new plan")
+            os.replace(tmp_file, sources["LKW_Fahrer_Plan.xlsb"])
+
+            changed = set()
+            deadline = time.monotonic() + 2
+            while not changed and time.monotonic() < deadline:
+                changed = backend.wait(0.2)
+            assert changed == {watch._path_key(sources["LKW_Fahrer_Plan.xlsb"])}
+        finally:
+            backend.close()
+
+    def test_unknown_backend_is_rejected(self, tmp_path):
+        with pytest.raises(ValueError, match="Unknown watch backend"):
+            watch.open_watch_backend([tmp_path / "a.xlsx"], "kqueue")
+
+
+class TestDaemon:
+    def test_steps_for_files_maps_inputs_to_steps(self):
+        assert watch.steps_for_files(["LKW_Fahrer_Plan.xlsb"]) == ["xlsb"]
+        assert watch.steps_for_files(["LOG_INs 2.xlsx", "LKW_Fahrer_Data.xlsm"]) == ["xlsm", "sim_cards"]
+        assert watch.steps_for_files(["other.xlsx"]) == []
+
+    def test_daemon_triggers_only_consuming_steps_and_defers_while_pipeline_runs(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(watch, "LOG_FILE", tmp_path / "etl_watch.log")
+        monkeypatch.setenv("ETL_WATCH_STATE_FILE", str(tmp_path / "state.json"))
+        sources = _sources(tmp_path)
+        clock = _Clock()
+        debouncer = watch.FileDebouncer(sources, settle_sec=5, clock=clock, probe=lambda path: True)
+        plan_key = watch._path_key(sources["LKW_Fahrer_Plan.xlsb"])
+
+        class _Backend:
+            ticks = 0
+
+            def wait(self, timeout):
+                self.ticks += 1
+                clock.now += 10
+                return {plan_key} if self.ticks == 1 else set()
+
+        backend = _Backend()
+        running = iter([True, False])
+        triggered = []
+
+        def trigger(steps):
+            triggered.append(steps)
+            return 0, "", ""
+
+        watch.run_daemon(
+            sources,
+            backend,
+            debouncer,
+            trigger=trigger,
+            should_stop=lambda: backend.ticks >= 4,
+            tick_sec=0,
+            pipeline_running=lambda: next(running),
+        )
+
+        assert triggered == [["xlsb"]]
+        state = watch._load_state(tmp_path / "state.json")
+        assert state["last_run_rc"] == 0
+        assert state["last_triggered_hash"] == state["last_seen_hash"]
+
+    @pytest.mark.parametrize(
+        "pid_alive, age_sec, running",
+        [(True, 60, True), (False, 60, False), (True, 3 * 24 * 3600, False)],
+    )
+    def test_pipeline_lock_from_dead_or_hung_run_is_stale(self, monkeypatch, tmp_path, pid_alive, age_sec, running):
+        import json
+
+        import run_etl_pipeline
+
+        lock = tmp_path / "pipeline.lock"
+        lock.write_text(json.dumps({"pid": 4242, "started_at": int(time.time()) - age_sec}), encoding="utf-8")
+        monkeypatch.setattr(run_etl_pipeline, "LOCK_FILE", lock)
+        monkeypatch.setattr(run_etl_pipeline, "is_process_running", lambda pid: pid_alive)
+        monkeypatch.setattr(watch, "LOG_FILE", tmp_path / "etl_watch.log")
+
+        assert watch._pipeline_running() is running
+        assert lock.exists() is running
+
+
+def _write_book(path, cell_value, modified, num_fmt="General"):
+    import zipfile
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("docProps/core.xml", f"<modified>{modified}</modified>")
+        zf.writestr("xl/worksheets/sheet1.xml", f"<sheetData><c>{cell_value}</c></sheetData>")
+        zf.writestr("xl/sharedStrings.xml", "<sst/>")
+        zf.writestr("xl/styles.xml", f'<styleSheet><numFmt formatCode="{num_fmt}"/></styleSheet>')
+
+
+class TestContentSignature:
+    def test_resave_without_data_change_keeps_hash(self, tmp_path):
+        book = tmp_path / "LKW_Fahrer_Data.xlsm"
+        _write_book(book, "42", "2026-01-01T08:00:00Z")
+        first = watch._collect_signature({"LKW_Fahrer_Data.xlsm": book})
+
+        _write_book(book, "42", "2026-01-01T09:30:00Z")
+        os.utime(book, ns=(time.time_ns(), time.time_ns() + 5_000_000_000))
+        resaved = watch._collect_signature({"LKW_Fahrer_Data.xlsm": book}, first["files"])
+        assert resaved["files"]["LKW_Fahrer_Data.xlsm"]["mtime_ns"] != first["files"]["LKW_Fahrer_Data.xlsm"]["mtime_ns"]
+        assert resaved["hash"] == first["hash"]
+
+        _write_book(book, "43", "2026-01-01T10:00:00Z")
+        edited = watch._collect_signature({"LKW_Fahrer_Data.xlsm": book}, resaved["files"])
+        assert edited["hash"] != first["hash"]
+
+    def test_styles_only_edit_changes_fingerprint(self, tmp_path):
+        # Number formats decide whether a cell is extracted as a date or a number.
+        book = tmp_path / "LKW_Fahrer_Data.xlsm"
+        _write_book(book, "45000", "2026-01-01T08:00:00Z")
+        before = watch.content_fingerprint(book)
+
+        _write_book(book, "45000", "2026-01-01T08:00:00Z", num_fmt="dd.mm.yyyy")
+
+        assert watch.content_fingerprint(book) != before
+
+    def test_fingerprint_parts_match_the_sheet_fingerprint_inputs(self):
+        import xlsx_package
+
+        assert watch.FINGERPRINT_ZIP_PARTS == xlsx_package.EXTRACTION_PART_PREFIXES
+        for part in (
+            "xl/worksheets/sheet1.xml",
+            xlsx_package.SHARED_STRINGS_PART,
+            xlsx_package.STYLES_PART,
+            xlsx_package.WORKBOOK_PART,
+            xlsx_package.WORKBOOK_RELS_PART,
+        ):
+            assert part.startswith(watch.FINGERPRINT_ZIP_PARTS), part
+
+    def test_fingerprint_is_reused_while_stat_matches(self, monkeypatch, tmp_path):
+        plain = tmp_path / "export.csv"
+        plain.write_bytes(b"a;b\n1;2\n")
+        first = watch._collect_signature({"export.csv": plain})
+        assert first["files"]["export.csv"]["fingerprint"].startswith("sha256:")
+
+        def fail(path):
+            raise AssertionError("unchanged file was re-read")
+
+        monkeypatch.setattr(watch, "content_fingerprint", fail)
+        again = watch._collect_signature({"export.csv": plain}, first["files"])
+        assert again["hash"] == first["hash"]
+
+    def test_daemon_ignores_touch_without_content_change(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(watch, "LOG_FILE", tmp_path / "etl_watch.log")
+        monkeypatch.setenv("ETL_WATCH_STATE_FILE", str(tmp_path / "state.json"))
+        sources = _sources(tmp_path)
+        _write_book(sources["LKW_Fahrer_Data.xlsm"], "42", "t1")
+        watch._save_state(tmp_path / "state.json", {"files": watch._collect_signature(sources)["files"]})
+
+        _write_book(sources["LKW_Fahrer_Data.xlsm"], "42", "t2")
+        clock = _Clock()
+        debouncer = watch.FileDebouncer(sources, settle_sec=5, clock=clock, probe=lambda path: True)
+        key = watch._path_key(sources["LKW_Fahrer_Data.xlsm"])
+
+        class _Backend:
+            ticks = 0
+
+            def wait(self, timeout):
+                self.ticks += 1
+                clock.now += 10
+                return {key} if self.ticks == 1 else set()
+
+        backend = _Backend()
+        triggered = []
+        watch.run_daemon(
+            sources,
+            backend,
+            debouncer,
+            trigger=lambda steps: triggered.append(steps) or (0, "", ""),
+            should_stop=lambda: backend.ticks >= 3,
+            tick_sec=0,
+            pipeline_running=lambda: False,
+        )
+
+        assert triggered == []
+        assert "content_unchanged=true files=LKW_Fahrer_Data.xlsm" in (tmp_path / "etl_watch.log").read_text(
+            encoding="utf-8"
+        )
+
+    def test_daemon_keeps_pending_file_unrecorded_after_another_files_run(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(watch, "LOG_FILE", tmp_path / "etl_watch.log")
+        monkeypatch.setenv("ETL_WATCH_STATE_FILE", str(tmp_path / "state.json"))
+        sources = _sources(tmp_path)
+        data, sims = sources["LKW_Fahrer_Data.xlsm"], sources["LOG_INs 2.xlsx"]
+        _write_book(data, "1", "t1")
+        _write_book(sims, "1", "t1")
+        watch._save_state(tmp_path / "state.json", {"files": watch._collect_signature(sources)["files"]})
+
+        # Both change; the SIM file is still settling when the xlsm run finishes.
+        _write_book(data, "2", "t2")
+        _write_book(sims, "2", "t2")
+        clock = _Clock()
+        debouncer = watch.FileDebouncer(sources, settle_sec=15, clock=clock, probe=lambda path: True)
+        events = {1: {watch._path_key(data)}, 2: {watch._path_key(sims)}}
+
+        class _Backend:
+            ticks = 0
+
+            def wait(self, timeout):
+                self.ticks += 1
+                clock.now += 10
+                return events.get(self.ticks, set())
+
+        backend = _Backend()
+        triggered = []
+        watch.run_daemon(
+            sources,
+            backend,
+            debouncer,
+            trigger=lambda steps: triggered.append(steps) or (0, "", ""),
+            should_stop=lambda: backend.ticks >= 6,
+            tick_sec=0,
+            pipeline_running=lambda: False,
+        )
+
+        assert triggered == [["xlsm"], ["sim_cards"]]
+        assert "content_unchanged" not in (tmp_path / "etl_watch.log").read_text(encoding="utf-8")
+        state = watch._load_state(tmp_path / "state.json")
+        current = watch._collect_signature(sources)
+        assert state["files"] == current["files"]
+        assert state["last_triggered_hash"] == current["hash"]
@@ -0,0 +1,294 @@
+import os
+from datetime import date
+
+import pytest
+
+import etl_db
+from etl_xlsb_to_postgres import (
+    PLAN_SHEET,
+    SCHEDULE_COLUMNS,
+    TMP_SCHEDULES_INSERT_SQL,
+    DriverResolver,
+    _apply_schedule_diff,
+    _iter_plan_records,
+    _staging_params,
+)
+
+
+def _plan_rows():
+    yield ["Plan", None, None, None, None, None, None, None]
+    yield [None, None, None, None, None, 2026, 2026, 1999]
+    yield [None, None, None, None, None, 1, 2, 5]
+    yield ["L100", None, None, None, None, "Max Muster", "urlaub", "Old"]
+    yield ["Notiz", None, None, None, None, "x", "y"]
+    yield ["L200", None, None, None, None, None, "Erika Beispiel u"]
+
+
+def test_iter_plan_records_reads_headers_then_rows():
+    truck_map = {"L100": (1, 10)}
+    drivers = DriverResolver([(7, "Max Muster", "F001"), (8, "Erika Beispiel", "F002")])
+
+    records = list(_iter_plan_records(_plan_rows(), truck_map, drivers))
+
+    assert [(r.truck_external_id, r.iso_week, r.source_row_no) for r in records] == [
+        ("L100", 1, 4),
+        ("L100", 2, 4),
+        ("L200", 2, 6),
+    ]
+    assert records[0].work_date == date(2025, 12, 29)
+    assert (records[0].truck_id, records[0].company_id, records[0].driver_id) == (1, 10, 7)
+    assert records[1].assignment_type == "status" and records[1].driver_id is None
+    assert records[2].truck_id is None and records[2].driver_id == 8
+    assert records[2].raw_payload["col_index"] == 7
+
+
+def test_iter_plan_records_consumes_rows_lazily():
+    consumed = []
+
+    def rows():
+        for i, row in enumerate(_plan_rows()):
+            consumed.append(i)
+            yield row
+        raise AssertionError("sheet read past the first record")
+
+    first = next(_iter_plan_records(rows(), {}, DriverResolver([])))
+
+    assert first.source_row_no == 4
+    assert consumed == [0, 1, 2, 3]
+
+
+def test_iter_plan_records_requires_header_rows():
+    with pytest.raises(RuntimeError, match="insufficient rows"):
+        list(_iter_plan_records(iter([[None], [2026]]), {}, DriverResolver([])))
+
+
+class _ScriptedCursor:
+    def __init__(self, rowcounts):
+        self.rowcounts = list(rowcounts)
+        self.calls = []
+        self.rowcount = -1
+
+    def execute(self, query, params=None):
+        self.calls.append((" ".join(query.split()), params))
+        self.rowcount = self.rowcounts.pop(0)
+
+
+def test_apply_schedule_diff_touches_only_changed_cells(monkeypatch):
+    monkeypatch.setattr(etl_db, "pipeline_supported", lambda: False)
+    cur = _ScriptedCursor([-1, 2, 1, 3])
+
+    assert _apply_schedule_diff(cur) == (2, 1, 3)
+
+    create, delete, update, insert = (query for query, _ in cur.calls)
+    assert cur.calls[0][1] == (PLAN_SHEET,)
+    assert "PARTITION BY source_row_hash" in create and "FULL JOIN new" in create
+    assert delete.startswith("DELETE FROM schedules") and "new_id IS NULL" in delete
+    assert "IS DISTINCT FROM" in update and "s.driver_id" in update and "t.driver_id" in update
+    assert insert.startswith("INSERT INTO schedules") and "m.old_id IS NULL" in insert
+
+
+_HEADER = [
+    ["Plan", None, None, None, None, None, None],
+    [None, None, None, None, None, 2026, 2026],
+    [None, None, None, None, None, 1, 2],
+]
+# Between the two imports: L100 week 1 unchanged, L100 week 2 rewritten,
+# L200 removed, L300 unchanged text whose driver now resolves.
+_PLAN_V1 = _HEADER + [
+    ["L100", None, None, None, None, "Max Muster", "urlaub"],
+    ["L200", None, None, None, None, None, "Erika Beispiel u"],
+    ["L300", None, None, None, None, "Unbekannt", None],
+]
+_PLAN_V2 = _HEADER + [
+    ["L100", None, None, None, None, "Max Muster", "Erika Beispiel"],
+    ["L300", None, None, None, None, "Unbekannt", None],
+]
+_DRIVERS_V1 = [(7, "Max Muster", "F001"), (8, "Erika Beispiel", "F002")]
+_DRIVERS_V2 = _DRIVERS_V1 + [(9, "Karl Unbekannt", "F009")]
+
+
+def _staged(rows, drivers, log_id):
+    records = _iter_plan_records(iter(rows), {}, DriverResolver(drivers))
+    return [_staging_params(log_id, rec) for rec in records]
+
+
+def _col(params, name):
+    return params[SCHEDULE_COLUMNS.index(name)]
+
+
+def _cell(staged, truck, week):
+    return next(p for p in staged if '"%s"' % truck in _col(p, "raw_payload") and _col(p, "iso_week") == week)
+
+
+def test_staged_rows_keep_hash_for_unchanged_cells_and_change_it_for_edited_ones():
+    old = _staged(_PLAN_V1, _DRIVERS_V1, log_id=1)
+    new = _staged(_PLAN_V2, _DRIVERS_V2, log_id=2)
+    old_hashes = {_col(p, "source_row_hash"): p for p in old}
+    new_hashes = {_col(p, "source_row_hash"): p for p in new}
+
+    assert [len(SCHEDULE_COLUMNS)] * 4 == [len(p) for p in old]
+    assert all(_col(p, "source_sheet") == PLAN_SHEET for p in old + new)
+
+    # Unchanged cell: same hash and same resolved columns, so the diff leaves it alone.
+    kept_old, kept_new = _cell(old, "L100", 1), _cell(new, "L100", 1)
+    assert _col(kept_old, "source_row_hash") == _col(kept_new, "source_row_hash")
+    assert (_col(kept_old, "driver_id"), _col(kept_new, "driver_id")) == (7, 7)
+    assert (_col(kept_old, "etl_log_id"), _col(kept_new, "etl_log_id")) == (1, 2)
+
+    # Edited cell: old hash disappears (delete), new hash appears (insert).
+    edited_old, edited_new = _cell(old, "L100", 2), _cell(new, "L100", 2)
+    assert _col(edited_old, "source_row_hash") not in new_hashes
+    assert _col(edited_new, "source_row_hash") not in old_hashes
+    assert (_col(edited_old, "assignment_type"), _col(edited_new, "assignment_type")) == ("status", "assignment")
+    assert (_col(edited_new, "shift_code"), _col(edited_new, "driver_id")) == ("Erika Beispiel", 8)
+
+    # Removed row: its hash is not staged again.
+    assert _col(_cell(old, "L200", 2), "source_row_hash") not in new_hashes
+
+    # Same text, new driver lookup: hash pairs, driver_id differs (update).
+    relinked_old, relinked_new = _cell(old, "L300", 1), _cell(new, "L300", 1)
+    assert _col(relinked_old, "source_row_hash") == _col(relinked_new, "source_row_hash")
+    assert (_col(relinked_old, "driver_id"), _col(relinked_new, "driver_id")) == (None, 9)
+
+
+_SCHEDULES_TEMP_DDL = """
+    CREATE TEMP TABLE schedules (
+        id BIGSERIAL PRIMARY KEY,
+        etl_log_id BIGINT,
+        iso_year SMALLINT NOT NULL,
+        iso_week SMALLINT NOT NULL,
+        work_date DATE NOT NULL,
+        company_id BIGINT,
+        truck_id BIGINT,
+        driver_id BIGINT,
+        shift_code TEXT,
+        assignment_type TEXT,
+        source_sheet TEXT,
+        source_row_no INTEGER,
+        source_row_hash TEXT,
+        raw_payload JSONB NOT NULL DEFAULT '{}'::JSONB
+    )
+"""
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="needs TEST_DATABASE_URL (scratch Postgres)")
+def test_apply_schedule_diff_against_postgres():
+    psycopg = pytest.importorskip("psycopg")
+    old = _staged(_PLAN_V1, _DRIVERS_V1, log_id=1)
+    new = _staged(_PLAN_V2, _DRIVERS_V2, log_id=2)
+
+    with psycopg.connect(os.environ["TEST_DATABASE_URL"]) as conn:
+        with conn.cursor() as cur:
+            # TEMP tables shadow any real schedules table for this session only.
+            cur.execute(_SCHEDULES_TEMP_DDL)
+            old_ids = {}
+            for params in old:
+                cur.execute(TMP_SCHEDULES_INSERT_SQL.replace("tmp_schedules", "schedules") + " RETURNING id", params)
+                old_ids[_col(params, "source_row_hash")] = cur.fetchone()[0]
+            cur.execute("CREATE TEMP TABLE tmp_schedules (LIKE schedules INCLUDING DEFAULTS) ON COMMIT DROP")
+            etl_db.execute_batch(cur, TMP_SCHEDULES_INSERT_SQL, new)
+
+            assert _apply_schedule_diff(cur) == (2, 1, 1)
+
+            cur.execute("SELECT id, source_row_hash, driver_id, etl_log_id, shift_code FROM schedules ORDER BY id")
+            rows = {r[1]: r for r in cur.fetchall()}
+        conn.rollback()
+
+    def hash_of(staged, truck, week):
+        return _col(_cell(staged, truck, week), "source_row_hash")
+
+    kept, relinked = hash_of(old, "L100", 1), hash_of(old, "L300", 1)
+    removed = {hash_of(old, "L100", 2), hash_of(old, "L200", 2)}
+    inserted = hash_of(new, "L100", 2)
+
+    assert set(rows) == {kept, relinked, inserted}
+    assert not removed & set(rows)
+    assert rows[kept] == (old_ids[kept], kept, 7, 1, "Max Muster")  # untouched, still the first import's row
+    assert rows[relinked][:4] == (old_ids[relinked], relinked, 9, 2)  # updated in place
+    assert rows[inserted][0] not in old_ids.values() and rows[inserted][2:] == (8, 2, "Erika Beispiel")
+
+
+def _resolver():
+    return DriverResolver(
+        [
+            (1, "Max Muster", "F001"),
+            (2, "Erika Beispiel", "F002"),
+            (3, "Jan Kowalski", "F003"),
+            (4, "Julia Kowalski", "F004"),
+            (5, "Paul Neumann", "F005"),
+            (6, "Paul Neumann", "F006"),
+            (7, "Oleg Petrov", "F007"),
+            (8, "Anna Schmidt", "F008"),
+        ],
+        aliases={"Maxi": "F001", "Eri": "Erika Beispiel", "Ghost": "Nobody Here"},
+    )
+
+
+@pytest.mark.parametrize(
+    "cell, expected",
+    [
+        ("Max Muster", 1),
+        ("Muster Max", 1),
+        ("M. Muster", 1),
+        ("Max Muster spät", 1),
+        ("Beispiel", 2),
+        ("Eri / Urlaub", 2),
+        ("maxi", 1),
+        ("Kowalski", None),
+        ("J. Kowalski", None),
+        ("Ghost", None),
+        ("Paul Neumann", 5),
+        ("Neumann", None),
+        ("Unbekannt", None),
+        ("Petrov", 7),
+        ("Oleg Sergeevich Petrov", 7),
+        ("Ivan Petrov", None),
+        ("Karl Schmidt", None),
+        ("Schmidt Karl", None),
+    ],
+)
+def test_driver_resolver_indexes(cell, expected):
+    assert _resolver().resolve(cell) == expected
+
+
+@pytest.mark.parametrize(
+    "cell, expected",
+    [
+        ("I. Petrov", 1),
+        ("I Petrov", 1),
+        ("Iv Petrov", 1),
+        ("Petrov Iv.", 1),
+        ("Igor Petrov", None),
+        ("Petrov Igor", None),
+        ("O. Sidorov", 2),
+        ("Olga Sidorov", None),
+    ],
+)
+def test_driver_resolver_initial_level_needs_initial_or_given_name_prefix(cell, expected):
+    resolver = DriverResolver([(1, "Ivan Petrov", "F001"), (2, "Oleg Sidorov", "F002")])
+
+    assert resolver.resolve(cell) == expected
+
+
+def test_driver_resolver_reports_match_rate_and_ambiguity():
+    resolver = _resolver()
+    for cell in ("Max Muster", "Max Muster", "M. Muster", "Kowalski", "Unbekannt"):
+        resolver.resolve(cell)
+
+    report = resolver.report()
+
+    assert report["cells"] == 5 and report["matched"] == 3
+    assert report["match_rate"] == 0.6
+    assert report["by_method"] == {"exact": 2, "initial_surname": 1, "ambiguous": 1, "unmatched": 1}
+    assert report["ambiguous_examples"] == {"Kowalski": [3, 4]}
+
+
+def test_driver_resolver_does_not_count_other_first_name_on_same_surname():
+    resolver = _resolver()
+    for cell in ("Ivan Petrov", "Karl Schmidt"):
+        assert resolver.resolve(cell) is None
+
+    report = resolver.report()
+
+    assert report["matched"] == 0
+    assert report["by_method"] == {"unmatched": 2}
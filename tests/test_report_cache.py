@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import time
+import zipfile
+
+import pytest
+
+import report_cache
+import report_queue
+import xlsx_package
+from report_cache import ReportCache
+from report_queue import ReportQueue
+
+
+def _render(tmp_path, name="bericht_2026_5", size=10):
+    xlsx = tmp_path / f"{name}.xlsx"
+    pdf = tmp_path / f"{name}.pdf"
+    xlsx.write_bytes(b"x" * size)
+    pdf.write_bytes(b"p" * size)
+    return str(xlsx), str(pdf)
+
+
+def test_put_moves_outputs_and_get_serves_them(tmp_path):
+    cache = ReportCache(tmp_path / "cache", max_bytes=10_000, max_age_sec=3600)
+    out = tmp_path / "out"
+    out.mkdir()
+    xlsx, pdf = _render(out)
+
+    cached = cache.put("k1", xlsx, pdf, {"data_version": "etl:7"})
+
+    assert not os.path.exists(pdf)
+    assert cache.get("k1") == cached
+    assert open(cached[1], "rb").read() == b"p" * 10
+    assert cache.get("missing") is None
+
+
+def test_evict_drops_expired_then_least_recently_used(tmp_path):
+    # Room for two entries of ~2 KB each.
+    cache = ReportCache(tmp_path / "cache", max_bytes=5000, max_age_sec=3600)
+    out = tmp_path / "out"
+    out.mkdir()
+    root = tmp_path / "cache"
+    cache.put("a", *_render(out, "a", size=1000))
+    cache.put("b", *_render(out, "b", size=1000))
+
+    manifest = root / "a" / report_cache.MANIFEST
+    data = json.loads(manifest.read_text(encoding="utf-8"))
+    data["created_at"] = time.time() - 7200
+    manifest.write_text(json.dumps(data), encoding="utf-8")
+    cache.put("c", *_render(out, "c", size=1000))
+    assert sorted(p.name for p in root.iterdir()) == ["b", "c"]
+
+    old = time.time() - 60
+    os.utime(root / "b" / report_cache.MANIFEST, (old, old))
+    assert cache.get("c") is not None
+    cache.put("d", *_render(out, "d", size=1000))
+    assert sorted(p.name for p in root.iterdir()) == ["c", "d"]
+
+
+def test_key_changes_with_data_version():
+    k1 = ReportCache.key("bericht", 2026, 5, "etl:7|wb:zip:aa")
+    assert k1 == ReportCache.key("bericht", 2026, 5, "etl:7|wb:zip:aa")
+    assert k1 != ReportCache.key("bericht", 2026, 5, "etl:8|wb:zip:aa")
+    assert k1 != ReportCache.key("bericht", 2026, 5, "etl:7|wb:zip:bb")
+    assert k1 != ReportCache.key("bericht", 2026, 6, "etl:7|wb:zip:aa")
+
+
+def test_workbook_fingerprint_covers_vba_and_is_memoized(tmp_path, monkeypatch):
+    book = tmp_path / "LKW_Fahrer_Data.xlsm"
+    with zipfile.ZipFile(book, "w") as zf:
+        zf.writestr("xl/worksheets/sheet1.xml", "<c>1</c>")
+        zf.writestr("xl/vbaProject.bin", b"macro v1")
+    cache = ReportCache(tmp_path / "cache", max_bytes=1, max_age_sec=1)
+    first = cache.workbook_fingerprint(book)
+
+    monkeypatch.setattr(xlsx_package, "content_fingerprint", lambda *a: pytest.fail("re-read unchanged workbook"))
+    assert cache.workbook_fingerprint(book) == first
+    monkeypatch.undo()
+
+    with zipfile.ZipFile(book, "w") as zf:
+        zf.writestr("xl/worksheets/sheet1.xml", "<c>1</c>")
+        zf.writestr("xl/vbaProject.bin", b"macro v2 changed")
+    assert cache.workbook_fingerprint(book) != first
+
+
+class _FixedVersionCache(ReportCache):
+    version = "etl:7|wb:zip:aa"
+
+    async def data_version(self):
+        return self.version
+
+
+@pytest.mark.asyncio
+async def test_queue_serves_cache_hit_at_submit_without_running_excel(monkeypatch, tmp_path):
+    monkeypatch.setattr(report_queue.db_pool, "get_pool", lambda: None)
+    cache = _FixedVersionCache(tmp_path / "cache", max_bytes=10_000, max_age_sec=3600)
+    out = tmp_path / "out"
+    out.mkdir()
+    runs = []
+
+    def run_report(report_type, year, week):
+        runs.append((report_type, year, week))
+        return _render(out, f"{report_type}_{year}_{week}")
+
+    queue = ReportQueue(run_report, cache=cache)
+    delivered = []
+
+    async def on_done(waiter, result):
+        delivered.append((waiter.chat_id, result.cached, os.path.exists(result.pdf_path)))
+
+    first = await queue.submit(1, 1, "bericht", 2026, 5, on_done=on_done)
+    for _ in range(200):
+        if delivered:
+            break
+        await asyncio.sleep(0.01)
+    second = await queue.submit(2, 2, "bericht", 2026, 5, on_done=on_done)
+    await asyncio.sleep(0.05)
+    await queue.close()
+
+    assert first.position == 1
+    assert second.position == 0
+    assert runs == [("bericht", 2026, 5)]
+    # The rendered files stay in the cache for the next request.
+    assert delivered == [(1, True, True), (2, True, True)]
+
+    cache.version = "etl:8|wb:zip:aa"  # a new ETL import: the cached report no longer applies
+    assert await queue._cache_lookup(("bericht", 2026, 5)) is None
@@ -0,0 +1,218 @@
+import asyncio
+import threading
+
+import pytest
+
+import report_queue
+import telegram_file_cache
+from report_queue import ReportQueue
+
+
+class _RecordingPool:
+    """Async pool stand-in that records reports_log statements."""
+
+    def __init__(self, recovered=()):
+        self.statements = []
+        self.recovered = list(recovered)
+        self.next_id = 100
+
+    def connection(self):
+        pool = self
+
+        class _Cursor:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, query, params=None):
+                pool.statements.append((" ".join(query.split()), params))
+
+            async def fetchone(self):
+                pool.next_id += 1
+                return (pool.next_id,)
+
+            async def fetchall(self):
+                return pool.recovered
+
+        class _Conn:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def cursor(self):
+                return _Cursor()
+
+            async def execute(self, query, params=None):
+                pool.statements.append((" ".join(query.split()), params))
+
+        return _Conn()
+
+
+def _blocking_report(tmp_path, release: threading.Event, calls: list):
+    def run_report(report_type, year, week):
+        calls.append((report_type, year, week))
+        release.wait(5)
+        pdf = tmp_path / f"{report_type}_{year}_{week}.pdf"
+        xlsx = tmp_path / f"{report_type}_{year}_{week}.xlsx"
+        pdf.write_bytes(b"%PDF")
+        xlsx.write_bytes(b"xlsx")
+        return str(xlsx), str(pdf)
+
+    return run_report
+
+
+async def _drain(queue):
+    for _ in range(200):
+        if not queue._queued and queue._running is None:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("queue did not drain")
+
+
+@pytest.mark.asyncio
+async def test_identical_queued_requests_share_one_run_and_fan_out(monkeypatch, tmp_path):
+    pool = _RecordingPool()
+    monkeypatch.setattr(report_queue.db_pool, "get_pool", lambda: pool)
+    release = threading.Event()
+    calls = []
+    queue = ReportQueue(_blocking_report(tmp_path, release, calls), excel_lock=asyncio.Lock())
+    delivered = []
+
+    async def on_done(waiter, result):
+        assert result.error is None
+        with open(result.pdf_path, "rb") as fp:
+            delivered.append((waiter.chat_id, fp.read()))
+
+    first = await queue.submit(1, 1, "bericht", 2026, 5, on_done=on_done)
+    await asyncio.sleep(0.05)  # worker picks it up: now running
+    second = await queue.submit(2, 2, "bericht", 2026, 6, on_done=on_done)
+    third = await queue.submit(3, 3, "bericht", 2026, 6, on_done=on_done)
+
+    assert (first.position, first.coalesced) == (1, False)
+    assert (second.position, second.coalesced) == (2, False)
+    assert (third.position, third.coalesced) == (2, True)
+
+    release.set()
+    await _drain(queue)
+    await queue.close()
+
+    assert calls == [("bericht", 2026, 5), ("bericht", 2026, 6)]
+    assert sorted(delivered) == [(1, b"%PDF"), (2, b"%PDF"), (3, b"%PDF")]
+    assert list(tmp_path.iterdir()) == []  # temp files removed after fan-out
+
+    finished = [params for query, params in pool.statements if query.startswith("UPDATE reports_log SET status = %s")]
+    assert [(p[0], p[2], p[4]) for p in finished] == [
+        ("success", "bericht_2026_5.pdf", [101]),
+        ("success", "bericht_2026_6.pdf", [102, 103]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_run_reports_error_to_every_waiter(monkeypatch):
+    pool = _RecordingPool()
+    monkeypatch.setattr(report_queue.db_pool, "get_pool", lambda: pool)
+
+    def broken(report_type, year, week):
+        raise RuntimeError("Excel COM error")
+
+    queue = ReportQueue(broken)
+    errors = []
+
+    async def on_done(waiter, result):
+        errors.append((waiter.chat_id, str(result.error)))
+
+    await queue.submit(1, 1, "bericht", 2026, 7, on_done=on_done)
+    await queue.submit(2, 2, "bericht", 2026, 7, on_done=on_done)
+    await _drain(queue)
+    await queue.close()
+
+    assert errors == [(1, "Excel COM error"), (2, "Excel COM error")]
+    finished = [params for query, params in pool.statements if query.startswith("UPDATE reports_log SET status = %s")]
+    assert finished[0][0] == "failed"
+    assert finished[0][3] == "Excel COM error"
+
+
+@pytest.mark.asyncio
+async def test_recover_requeues_interrupted_rows_and_delivers_via_bot(monkeypatch, tmp_path):
+    pool = _RecordingPool(recovered=[
+        (11, 1, 1, "bericht", 2026, 8, {"caption": "Weekly"}),
+        (12, 2, 2, "bericht", 2026, 8, {}),
+    ])
+    monkeypatch.setattr(report_queue.db_pool, "get_pool", lambda: pool)
+    monkeypatch.setattr(
+        telegram_file_cache, "_default", telegram_file_cache.TelegramFileCache(tmp_path / "ids.json", 3600)
+    )
+    release = threading.Event()
+    release.set()
+    calls = []
+    queue = ReportQueue(_blocking_report(tmp_path, release, calls))
+
+    sent = []
+
+    class _Bot:
+        async def send_document(self, chat_id, document, filename, caption=None):
+            sent.append((chat_id, filename, caption))
+
+        async def send_message(self, chat_id, text):
+            sent.append((chat_id, text, None))
+
+    queue.bot = _Bot()
+    assert await queue.recover() == 2
+    await _drain(queue)
+    await queue.close()
+
+    assert calls == [("bericht", 2026, 8)]
+    assert sent == [(1, "bericht_2026_8.pdf", "Weekly"), (2, "bericht_2026_8.pdf", None)]
+    claim = next((q, p) for q, p in pool.statements if q.startswith("UPDATE reports_log SET status = 'queued', owner_id"))
+    assert "owner_id IS DISTINCT FROM %s" in claim[0] and "heartbeat_at < NOW()" in claim[0]
+    assert "FOR UPDATE SKIP LOCKED" in claim[0]
+    assert claim[1] == (queue.instance_id, queue.instance_id, report_queue.STALE_AFTER_SEC)
+
+
+@pytest.mark.asyncio
+async def test_queued_rows_are_owned_and_heartbeated_by_their_queue(monkeypatch, tmp_path):
+    pool = _RecordingPool()
+    monkeypatch.setattr(report_queue.db_pool, "get_pool", lambda: pool)
+    monkeypatch.setattr(report_queue, "HEARTBEAT_SEC", 0)
+    release = threading.Event()
+    queue = ReportQueue(_blocking_report(tmp_path, release, []))
+    other = ReportQueue(_blocking_report(tmp_path, release, []))
+
+    await queue.submit(1, 1, "bericht", 2026, 10)
+    for _ in range(5):
+        await asyncio.sleep(0)
+    release.set()
+    await _drain(queue)
+    await queue.close()
+
+    assert queue.instance_id != other.instance_id
+    assert any("ADD COLUMN IF NOT EXISTS owner_id" in q for q, _ in pool.statements)
+    insert = next(p for q, p in pool.statements if q.startswith("INSERT INTO reports_log"))
+    assert insert[-1] == queue.instance_id
+    heartbeat = [p for q, p in pool.statements if q.startswith("UPDATE reports_log SET heartbeat_at = NOW()")]
+    assert heartbeat and heartbeat[0] == (queue.instance_id,)
+    # No bot attached: this queue never claims other processes' rows.
+    assert not any("owner_id IS DISTINCT FROM" in q for q, _ in pool.statements)
+
+
+@pytest.mark.asyncio
+async def test_queue_works_without_database(monkeypatch, tmp_path):
+    monkeypatch.setattr(report_queue.db_pool, "get_pool", lambda: None)
+    release = threading.Event()
+    release.set()
+    queue = ReportQueue(_blocking_report(tmp_path, release, []))
+    done = []
+
+    async def on_done(waiter, result):
+        done.append(result.error)
+
+    ticket = await queue.submit(1, 1, "bericht", 2026, 9, on_done=on_done)
+    await _drain(queue)
+    await queue.close()
+
+    assert ticket.log_id is None
+    assert done == [None]
@@ -1,7 +1,14 @@
 import json
+import os
+import sys
 import tempfile
+import threading
+import time
+import types
 from pathlib import Path
 
+import pytest
+
 import run_etl_pipeline as etl
 
 TEST_DIR = Path(__file__).resolve().parent
@@ -28,16 +35,32 @@ class TestPipelineLock:
     def test_acquire_lock_keeps_live_pid_blocked(self, monkeypatch):
         with tempfile.TemporaryDirectory(dir=TEST_DIR) as tmp_dir:
             lock_file = Path(tmp_dir) / "lkw_etl_pipeline.lock"
-            lock_file.write_text(json.dumps({"pid": 777, "started_at": 1}), encoding="utf-8")
+            lock_file.write_text(json.dumps({"pid": 777, "started_at": int(time.time()) - 3600}), encoding="utf-8")
 
             monkeypatch.setattr(etl, "LOCK_FILE", lock_file)
-            monkeypatch.setattr(etl, "LOCK_STALE_SEC", 10**9)
+            monkeypatch.setattr(etl, "LOCK_STALE_SEC", 2 * 3600)
             monkeypatch.setattr(etl, "is_process_running", lambda pid: pid == 777)
 
             assert etl.acquire_pipeline_lock() is False
             payload = json.loads(lock_file.read_text(encoding="utf-8"))
             assert payload["pid"] == 777
 
+    def test_acquire_lock_removes_live_pid_past_every_step_timeout(self, monkeypatch):
+        with tempfile.TemporaryDirectory(dir=TEST_DIR) as tmp_dir:
+            lock_file = Path(tmp_dir) / "lkw_etl_pipeline.lock"
+            lock_file.write_text(json.dumps({"pid": 777, "started_at": int(time.time()) - 3 * 3600}), encoding="utf-8")
+
+            monkeypatch.setattr(etl, "LOCK_FILE", lock_file)
+            monkeypatch.setattr(etl, "LOCK_STALE_SEC", 2 * 3600)
+            monkeypatch.setattr(etl, "is_process_running", lambda pid: pid == 777)
+
+            # Same rule the watch daemon applies (pipeline_lock_stale_reason).
+            assert etl.pipeline_lock_stale_reason(json.loads(lock_file.read_text()), int(time.time()))
+            assert etl.acquire_pipeline_lock() is True
+            assert json.loads(lock_file.read_text(encoding="utf-8"))["pid"] != 777
+
+            etl.release_pipeline_lock()
+
     def test_acquire_lock_removes_invalid_payload(self, monkeypatch):
         with tempfile.TemporaryDirectory(dir=TEST_DIR) as tmp_dir:
             lock_file = Path(tmp_dir) / "lkw_etl_pipeline.lock"
@@ -52,3 +75,333 @@ class TestPipelineLock:
 
             etl.release_pipeline_lock()
             assert not lock_file.exists()
+
+
+class _FakeStepConn:
+    def __init__(self):
+        self.cancelled = 0
+        self.rollbacks = 0
+
+    def cancel(self):
+        self.cancelled += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class _EtlLogStepConn(_FakeStepConn):
+    """Step connection that records statements; etl_log's last id is 41."""
+
+    def __init__(self):
+        super().__init__()
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        conn = self
+
+        class _Cursor:
+            rowcount = 1
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, query, params=None):
+                conn.statements.append((" ".join(query.split()), params))
+
+            def fetchone(self):
+                return (41,)
+
+        return _Cursor()
+
+    def commit(self):
+        self.commits += 1
+
+
+def _fake_step_module(monkeypatch, name, run_etl):
+    module = types.ModuleType(name)
+    module.parse_args = lambda argv=None: argv
+    module.run_kwargs = lambda args: {"database_url": "postgresql://fake"}
+    module.run_etl = run_etl
+    monkeypatch.setitem(sys.modules, name, module)
+
+
+class TestInProcessSteps:
+    def test_steps_share_connection_and_lookups(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        seen = []
+
+        def fake_xlsm(database_url, conn, lookups):
+            lookups["master"] = {"trucks": [(1, "L1", None)], "drivers": []}
+            seen.append(("xlsm", conn))
+            return {"trucks": 1}
+
+        def fake_xlsb(database_url, conn, lookups):
+            seen.append(("xlsb", conn, lookups["master"]["trucks"]))
+            return {"records": 0}
+
+        _fake_step_module(monkeypatch, "fake_xlsm_step", fake_xlsm)
+        _fake_step_module(monkeypatch, "fake_xlsb_step", fake_xlsb)
+        conn = _FakeStepConn()
+        ctx = etl.PipelineContext(lambda: conn)
+
+        assert etl.run_step_inprocess("xlsm", "fake_xlsm_step.py", ctx) is True
+        assert etl.run_step_inprocess("xlsb", "fake_xlsb_step.py", ctx) is True
+        assert seen == [("xlsm", conn), ("xlsb", conn, [(1, "L1", None)])]
+
+    def test_watchdog_cancels_overrunning_step(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        monkeypatch.setitem(etl.STEP_TIMEOUTS_SEC, "slow", 0.2)
+
+        def slow_step(database_url, conn):
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+            return {}
+
+        _fake_step_module(monkeypatch, "fake_slow_step", slow_step)
+        conn = _FakeStepConn()
+        ctx = etl.PipelineContext(lambda: conn)
+
+        with pytest.raises(RuntimeError, match="slow timed out after 0.2 seconds"):
+            etl.run_step_inprocess("slow", "fake_slow_step.py", ctx)
+        assert conn.cancelled == 1
+        assert conn.rollbacks == 1
+
+    def test_watchdog_timeout_fails_the_steps_open_etl_log_row(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        monkeypatch.setitem(etl.STEP_TIMEOUTS_SEC, "slow", 0.2)
+
+        def slow_step(database_url, conn):
+            # Interrupted before its own failure handler could update etl_log.
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+            return {}
+
+        _fake_step_module(monkeypatch, "fake_slow_step", slow_step)
+        conn = _EtlLogStepConn()
+        ctx = etl.PipelineContext(lambda: conn)
+
+        with pytest.raises(RuntimeError, match="timed out"):
+            etl.run_step_inprocess("slow", "fake_slow_step.py", ctx, source_name="xlsm_lkw_fahrer_data")
+
+        assert conn.statements[0] == ("SELECT COALESCE(MAX(id), 0) FROM etl_log", None)
+        update, params = conn.statements[-1]
+        assert update.startswith("UPDATE etl_log SET status = 'failed'")
+        assert "WHERE source_name = %s AND status = 'running' AND id > %s" in update
+        assert params == ("slow timed out after 0.2 seconds", "xlsm_lkw_fahrer_data", 41)
+
+    def test_step_failure_without_timeout_leaves_etl_log_to_the_step(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+
+        def broken_step(database_url, conn):
+            raise ValueError("workbook missing")
+
+        _fake_step_module(monkeypatch, "fake_broken_step", broken_step)
+        conn = _EtlLogStepConn()
+        ctx = etl.PipelineContext(lambda: conn)
+
+        with pytest.raises(ValueError):
+            etl.run_step_inprocess("sim_cards", "fake_broken_step.py", ctx, source_name="xlsx_sim_cards")
+        assert [query for query, _ in conn.statements] == ["SELECT COALESCE(MAX(id), 0) FROM etl_log"]
+
+    def test_optional_step_failure_is_logged_not_raised(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+
+        def broken_step(database_url, conn):
+            raise ValueError("workbook missing")
+
+        _fake_step_module(monkeypatch, "fake_broken_step", broken_step)
+        conn = _FakeStepConn()
+        ctx = etl.PipelineContext(lambda: conn)
+
+        assert etl.run_step_inprocess("sim_cards", "fake_broken_step.py", ctx, required=False) is False
+        assert conn.rollbacks == 1
+        assert "workbook missing (optional step)" in (tmp_path / "etl_runner.log").read_text(encoding="utf-8")
+        with pytest.raises(ValueError):
+            etl.run_step_inprocess("sim_cards", "fake_broken_step.py", ctx)
+
+
+def _step(name, required=True, depends_on=()):
+    return etl.PipelineStep(name, f"{name}.py", required=required, depends_on=depends_on)
+
+
+class TestPipelineDag:
+    def test_independent_steps_overlap_and_dependents_wait(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        events = []
+        lock = threading.Lock()
+
+        def run_one(step):
+            with lock:
+                events.append(("start", step.name))
+            time.sleep(0.1)
+            with lock:
+                events.append(("end", step.name))
+            return True
+
+        steps = [_step("xlsm"), _step("xlsb", depends_on=("xlsm",)), _step("sim_cards", required=False)]
+        started = time.perf_counter()
+        timings = etl.run_dag(steps, run_one, max_parallel=2)
+        elapsed = time.perf_counter() - started
+
+        assert events.index(("start", "sim_cards")) < events.index(("end", "xlsm"))
+        assert events.index(("end", "xlsm")) < events.index(("start", "xlsb"))
+        assert elapsed < 0.29
+        assert {name: info["status"] for name, info in timings.items()} == {
+            "xlsm": "success",
+            "xlsb": "success",
+            "sim_cards": "success",
+        }
+        path, path_sec = etl.critical_path(steps, timings)
+        assert path == ["xlsm", "xlsb"]
+        assert path_sec >= 0.2
+
+    def test_required_failure_stops_dependents_and_reraises(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        ran = []
+
+        def run_one(step):
+            ran.append(step.name)
+            if step.name == "xlsm":
+                raise RuntimeError("xlsm failed with exit code 1")
+            return True
+
+        steps = [_step("xlsm"), _step("xlsb", depends_on=("xlsm",))]
+        with pytest.raises(RuntimeError, match="xlsm failed") as exc_info:
+            etl.run_dag(steps, run_one, max_parallel=1)
+
+        assert ran == ["xlsm"]
+        assert exc_info.value.timings["xlsm"]["status"] == "failed"
+
+    def test_failed_optional_step_skips_its_dependents(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        steps = [_step("sim_cards", required=False), _step("sim_report", depends_on=("sim_cards",))]
+
+        timings = etl.run_dag(steps, lambda step: False, max_parallel=2)
+
+        assert timings["sim_cards"]["status"] == "failed"
+        assert timings["sim_report"] == {"status": "skipped"}
+
+    def test_watchdog_interrupts_step_in_worker_thread(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        monkeypatch.setitem(etl.STEP_TIMEOUTS_SEC, "slow", 0.2)
+
+        def slow_step(database_url, conn):
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+            return {}
+
+        _fake_step_module(monkeypatch, "fake_slow_step", slow_step)
+        ctx = etl.PipelineContext(_FakeStepConn)
+        step = etl.PipelineStep("slow", "fake_slow_step.py")
+
+        with pytest.raises(RuntimeError, match="slow timed out"):
+            etl.run_dag([step], lambda s: etl.run_step_inprocess(s.name, s.script, ctx), max_parallel=2)
+        assert [c.cancelled for c in ctx.connections] == [1]
+
+    def test_select_steps_adds_dependents_and_drops_unselected_dependencies(self):
+        selected = etl.select_steps(etl.STEPS, ["xlsm"])
+        assert [(step.name, step.depends_on) for step in selected] == [("xlsm", ()), ("xlsb", ("xlsm",))]
+
+        selected = etl.select_steps(etl.STEPS, ["xlsb"])
+        assert [(step.name, step.depends_on) for step in selected] == [("xlsb", ())]
+
+    def test_unknown_dependency_is_rejected(self):
+        with pytest.raises(ValueError, match="unknown step"):
+            etl.run_dag([_step("xlsb", depends_on=("nope",))], lambda step: True)
+
+
+class _FakeStepCache:
+    def __init__(self, signatures=None):
+        self.signatures = dict(signatures or {})
+        self.skips = []
+
+    def last_signature(self, source_name):
+        return self.signatures.get(source_name)
+
+    def store_signature(self, source_name, signature):
+        self.signatures[source_name] = signature
+
+    def record_skip(self, source_name, signature, reason):
+        self.skips.append((source_name, reason))
+        self.signatures[source_name] = signature
+
+
+class TestStepCache:
+    def _sources(self, tmp_path):
+        paths = {}
+        for name in ("LKW_Fahrer_Data.xlsm", "LKW_Fahrer_Plan.xlsb", "LOG_INs 2.xlsx"):
+            paths[name] = tmp_path / name
+            paths[name].write_bytes(name.encode("utf-8"))
+        return paths
+
+    def test_signature_reuses_hash_until_file_changes(self, tmp_path, monkeypatch):
+        path = tmp_path / "book.xlsx"
+        path.write_bytes(b"v1")
+        first = etl.input_signature({"book": path})
+
+        monkeypatch.setattr(etl, "_file_sha256", lambda p: pytest.fail("unchanged file re-hashed"))
+        assert etl.input_signature({"book": path}, first) == first
+
+        monkeypatch.undo()
+        path.write_bytes(b"v2 longer")
+        second = etl.input_signature({"book": path}, first)
+        assert second["book"]["sha256"] != first["book"]["sha256"]
+        assert not etl.inputs_unchanged(second, first)
+        assert etl.inputs_unchanged(first, first)
+        assert not etl.inputs_unchanged(first, None)
+
+    def test_touched_but_identical_file_counts_as_unchanged(self, tmp_path):
+        path = tmp_path / "book.xlsx"
+        path.write_bytes(b"same")
+        first = etl.input_signature({"book": path})
+        os.utime(path, ns=(first["book"]["mtime_ns"] + 10**9, first["book"]["mtime_ns"] + 10**9))
+
+        assert etl.inputs_unchanged(etl.input_signature({"book": path}, first), first)
+
+    def test_unchanged_steps_skip_unless_dependency_ran_or_forced(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        sources = self._sources(tmp_path)
+        cache = _FakeStepCache()
+        ran = []
+
+        def run_one(step):
+            ran.append(step.name)
+            return True
+
+        run, skipped = etl.cached_step_runner(run_one, cache, sources)
+        etl.run_dag(etl.STEPS, run, max_parallel=1)
+        assert sorted(ran) == ["sim_cards", "xlsb", "xlsm"] and not skipped
+
+        ran.clear()
+        sources["LKW_Fahrer_Data.xlsm"].write_bytes(b"changed master data")
+        run, skipped = etl.cached_step_runner(run_one, cache, sources)
+        etl.run_dag(etl.STEPS, run, max_parallel=1)
+        assert sorted(ran) == ["xlsb", "xlsm"]
+        assert skipped == {"sim_cards"}
+        assert cache.skips == [("xlsx_sim_cards", "inputs unchanged: LOG_INs 2.xlsx")]
+
+        ran.clear()
+        run, skipped = etl.cached_step_runner(run_one, cache, sources)
+        etl.run_dag(etl.STEPS, run, max_parallel=1)
+        assert ran == [] and skipped == {"xlsm", "xlsb", "sim_cards"}
+
+        run, skipped = etl.cached_step_runner(run_one, cache, sources, force=True)
+        etl.run_dag(etl.STEPS, run, max_parallel=1)
+        assert sorted(ran) == ["sim_cards", "xlsb", "xlsm"] and not skipped
+
+    def test_failed_step_does_not_store_signature(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(etl, "LOG_FILE", tmp_path / "etl_runner.log")
+        cache = _FakeStepCache()
+        step = etl.STEPS[2]
+
+        run, _ = etl.cached_step_runner(lambda s: False, cache, self._sources(tmp_path))
+
+        assert run(step) is False
+        assert cache.signatures == {}
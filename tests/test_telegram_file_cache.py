@@ -0,0 +1,102 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import BadRequest
+
+from telegram_file_cache import TelegramFileCache
+
+
+class _Bot:
+    """send_document stand-in: uploads return a new file_id, file_id sends echo it back."""
+
+    id = 42
+
+    def __init__(self, reject=()):
+        self.calls = []
+        self.reject = set(reject)
+        self.uploads = 0
+
+    async def send_document(self, chat_id, document, filename=None, caption=None):
+        if isinstance(document, str):
+            self.calls.append(("file_id", chat_id, document, caption))
+            if document in self.reject:
+                raise BadRequest("Wrong file identifier/http url specified")
+            return SimpleNamespace(document=SimpleNamespace(file_id=document))
+        document.read()
+        self.uploads += 1
+        await asyncio.sleep(0)
+        file_id = f"F{self.uploads}"
+        self.calls.append(("upload", chat_id, filename, caption))
+        return SimpleNamespace(document=SimpleNamespace(file_id=file_id))
+
+
+def _pdf(tmp_path, name="bericht_2026_8.pdf", content=b"%PDF-1.7 report"):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_fan_out_uploads_once_then_sends_by_file_id(tmp_path):
+    cache = TelegramFileCache(tmp_path / "ids.json", max_age_sec=3600)
+    bot = _Bot()
+    pdf = _pdf(tmp_path)
+
+    await asyncio.gather(*(cache.send_document(bot, uid, pdf, caption="Weekly") for uid in (1, 2, 3)))
+
+    assert bot.uploads == 1
+    assert [c[0] for c in bot.calls] == ["upload", "file_id", "file_id"]
+    assert all(c[3] == "Weekly" for c in bot.calls)
+    assert bot.calls[0][2] == "bericht_2026_8.pdf"
+
+
+@pytest.mark.asyncio
+async def test_file_ids_survive_restart_and_are_keyed_by_content(tmp_path):
+    store = tmp_path / "ids.json"
+    bot = _Bot()
+    await TelegramFileCache(store, max_age_sec=3600).send_document(bot, 1, _pdf(tmp_path))
+
+    # Same bytes under another name hit the persisted entry; different bytes upload.
+    restarted = TelegramFileCache(store, max_age_sec=3600)
+    await restarted.send_document(bot, 2, _pdf(tmp_path, name="copy.pdf"))
+    await restarted.send_document(bot, 3, _pdf(tmp_path, name="other.pdf", content=b"%PDF other"))
+
+    assert [c[0] for c in bot.calls] == ["upload", "file_id", "upload"]
+    assert len(json.loads(store.read_text(encoding="utf-8"))) == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_and_rejected_file_ids_fall_back_to_upload(tmp_path):
+    store = tmp_path / "ids.json"
+    bot = _Bot(reject={"F1"})
+    pdf = _pdf(tmp_path)
+    cache = TelegramFileCache(store, max_age_sec=3600)
+    await cache.send_document(bot, 1, pdf)
+    await cache.send_document(bot, 2, pdf)  # F1 rejected -> re-upload as F2
+
+    assert [c[0] for c in bot.calls] == ["upload", "file_id", "upload"]
+    assert list(json.loads(store.read_text(encoding="utf-8")).values())[0]["file_id"] == "F2"
+
+    expired = TelegramFileCache(store, max_age_sec=0)
+    await expired.send_document(bot, 3, pdf)
+    assert bot.calls[-1][0] == "upload"
+
+
+@pytest.mark.asyncio
+async def test_other_bad_requests_are_not_swallowed(tmp_path):
+    class _NoChatBot(_Bot):
+        async def send_document(self, chat_id, document, filename=None, caption=None):
+            if isinstance(document, str):
+                raise BadRequest("Chat not found")
+            return await super().send_document(chat_id, document, filename, caption)
+
+    cache = TelegramFileCache(tmp_path / "ids.json", max_age_sec=3600)
+    bot = _NoChatBot()
+    pdf = _pdf(tmp_path)
+    await cache.send_document(bot, 1, pdf)
+
+    with pytest.raises(BadRequest):
+        await cache.send_document(bot, 999, pdf)
+    assert bot.uploads == 1
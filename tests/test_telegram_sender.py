@@ -0,0 +1,125 @@
+import asyncio
+import io
+import json
+from urllib import error, parse
+
+import pytest
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+import telegram_sender
+from telegram_sender import TelegramSender, TokenBucket, post_telegram
+
+
+class _Clock:
+    """Fake monotonic clock advanced by the fake sleep."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+def test_token_bucket_spends_burst_then_spaces_by_rate():
+    clock = _Clock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+    bucket.pause(10)
+    assert bucket.reserve() == pytest.approx(10.5)
+
+
+@pytest.mark.asyncio
+async def test_send_all_honours_retry_after_and_summarizes(caplog):
+    clock = _Clock()
+    sender = TelegramSender(concurrency=4, rate_per_sec=100, per_chat_interval_sec=1.0, clock=clock, sleep=clock.sleep)
+    attempts = {}
+
+    async def send(chat_id):
+        attempts[chat_id] = attempts.get(chat_id, 0) + 1
+        if chat_id == 2 and attempts[chat_id] == 1:
+            raise RetryAfter(7)
+        if chat_id == 3:
+            raise Forbidden("bot was blocked by the user")
+
+    with caplog.at_level("INFO", logger="lkw_report_bot.sender"):
+        results = await sender.send_all([1, 2, 3], send, label="weekly")
+
+    assert [(r.chat_id, r.ok, r.attempts) for r in results] == [(1, True, 1), (2, True, 2), (3, False, 1)]
+    # The retry waited out the flood-control pause.
+    assert max(clock.sleeps) >= 7
+    assert "weekly: delivered 2/3 (retries=1)" in caplog.text
+    assert "bot was blocked" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_network_errors_retry_with_backoff_until_max_attempts():
+    clock = _Clock()
+    sender = TelegramSender(max_attempts=3, per_chat_interval_sec=0, clock=clock, sleep=clock.sleep)
+
+    async def send():
+        raise TimedOut()
+
+    result = await sender.send(5, send)
+
+    assert (result.ok, result.attempts) == (False, 3)
+    assert clock.sleeps == [1.0, 2.0]
+
+
+@pytest.mark.asyncio
+async def test_same_chat_is_spaced_by_per_chat_interval():
+    clock = _Clock()
+    sender = TelegramSender(rate_per_sec=100, per_chat_interval_sec=1.5, clock=clock, sleep=clock.sleep)
+    sent_at = []
+
+    async def send():
+        sent_at.append(clock.now)
+
+    for _ in range(3):
+        await sender.send(9, send)
+
+    assert sent_at == [0.0, 1.5, 3.0]
+
+
+def test_post_telegram_sleeps_for_retry_after_then_succeeds(monkeypatch):
+    calls = []
+    sleeps = []
+
+    class _Resp:
+        def read(self):
+            return b'{"ok": true}'
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    def fake_urlopen(req, timeout):
+        calls.append(parse.parse_qs(req.data.decode("utf-8")))
+        if len(calls) == 1:
+            body = json.dumps({"ok": False, "parameters": {"retry_after": 3}}).encode("utf-8")
+            raise error.HTTPError(req.full_url, 429, "Too Many Requests", {}, io.BytesIO(body))
+        return _Resp()
+
+    monkeypatch.setattr(telegram_sender.request, "urlopen", fake_urlopen)
+
+    assert post_telegram("123:ABC", "sendMessage", {"chat_id": "1", "text": "hi"}, sleep=sleeps.append) == b'{"ok": true}'
+    assert sleeps == [3.0]
+    assert calls[-1] == {"chat_id": ["1"], "text": ["hi"]}
+
+
+def test_post_telegram_does_not_retry_client_errors(monkeypatch):
+    def fake_urlopen(req, timeout):
+        raise error.HTTPError(req.full_url, 400, "Bad Request", {}, io.BytesIO(b"{}"))
+
+    monkeypatch.setattr(telegram_sender.request, "urlopen", fake_urlopen)
+
+    with pytest.raises(error.HTTPError):
+        post_telegram("123:ABC", "sendMessage", {"chat_id": "1", "text": "hi"}, sleep=lambda s: pytest.fail("slept"))
@@ -15,7 +15,6 @@ import pytest
 from web_server import (
     _validate_init_data,
     _extract_user_id,
-    _log_task_exception,
     handle_healthz,
     handle_api_reports,
     handle_api_meta,
@@ -194,6 +193,81 @@ class TestApiMeta:
             assert body["schedule"]["cron"] == "5 8 * * 1"
 
 
+class _FakeMetaCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.params = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        self.queries.append(query)
+        self.params.append(params)
+
+    async def fetchall(self):
+        return self.rows
+
+
+class _FakeMetaPool:
+    def __init__(self, rows):
+        self.cur = _FakeMetaCursor(rows)
+        self.checkouts = 0
+
+    def connection(self):
+        pool = self
+
+        class _Conn:
+            async def __aenter__(self):
+                pool.checkouts += 1
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def cursor(self):
+                return pool.cur
+
+        return _Conn()
+
+
+class TestEtlMetaFromPool:
+    @pytest.mark.asyncio
+    async def test_newest_source_comes_from_pooled_status_read(self):
+        import web_server
+        from datetime import datetime, timedelta, timezone
+
+        now = datetime.now(timezone.utc)
+        pool = _FakeMetaPool([
+            ("xlsm_lkw_fahrer_data", now - timedelta(hours=1)),
+            ("xlsb_fahrer_plan", now - timedelta(minutes=10)),
+            ("xlsx_sim_cards", None),
+        ])
+        with patch.object(web_server.db_pool, "get_pool", return_value=pool):
+            meta = await web_server._get_etl_meta()
+
+        assert pool.checkouts == 1
+        assert "FROM etl_source_status" in pool.cur.queries[0]
+        # The pipeline's own summary row is not an import source.
+        assert "source_name <> %s" in pool.cur.queries[0] and pool.cur.params[0] == ("etl_pipeline",)
+        assert meta["source_name"] == "xlsb_fahrer_plan"
+        assert meta["is_stale"] is False
+        assert 500 <= meta["age_sec"] <= 700
+
+    @pytest.mark.asyncio
+    async def test_no_pool_returns_stale_defaults(self):
+        import web_server
+
+        with patch.object(web_server.db_pool, "get_pool", return_value=None):
+            meta = await web_server._get_etl_meta()
+        assert meta["last_import_at"] is None
+        assert meta["is_stale"] is True
+
+
 # ---------------------------------------------------------------------------
 # API generate — input validation
 # ---------------------------------------------------------------------------
@@ -202,14 +276,13 @@ class TestApiGenerate:
     def setup_method(self):
         import web_server
         self._old_bot = web_server._bot
-        self._old_lock = web_server._excel_lock
-        self._old_fn = web_server._run_report_fn
+        self._old_queue = web_server._report_queue
         self._old_wl_fn = web_server._whitelist_fn
         self._old_token = web_server._bot_token
 
         web_server._bot = AsyncMock()
-        web_server._excel_lock = MagicMock()
-        web_server._run_report_fn = MagicMock()
+        web_server._report_queue = MagicMock()
+        web_server._report_queue.submit = AsyncMock(return_value=MagicMock(position=1))
         web_server._whitelist_fn = lambda: {111, 222}
         web_server._bot_token = BOT_TOKEN
         _api_cooldowns.clear()
@@ -217,8 +290,7 @@ class TestApiGenerate:
     def teardown_method(self):
         import web_server
         web_server._bot = self._old_bot
-        web_server._excel_lock = self._old_lock
-        web_server._run_report_fn = self._old_fn
+        web_server._report_queue = self._old_queue
         web_server._whitelist_fn = self._old_wl_fn
         web_server._bot_token = self._old_token
         _api_cooldowns.clear()
@@ -300,6 +372,8 @@ class TestApiGenerate:
         req2 = self._make_request(body)
         resp2 = await handle_api_generate(req2)
         assert resp2.status == 429
+        web_server._report_queue.submit.assert_awaited_once()
+        assert json.loads(resp1.text)["queue_position"] == 1
 
     @pytest.mark.asyncio
     async def test_server_not_ready(self):
@@ -321,32 +395,6 @@ class TestApiGenerate:
         assert resp.status == 403
 
 
-# ---------------------------------------------------------------------------
-# Background task exception logging
-# ---------------------------------------------------------------------------
-
-class TestLogTaskException:
-    def test_cancelled_task_no_error(self):
-        task = MagicMock()
-        task.cancelled.return_value = True
-        # Should not raise
-        _log_task_exception(task)
-        task.exception.assert_not_called()
-
-    def test_successful_task_no_error(self):
-        task = MagicMock()
-        task.cancelled.return_value = False
-        task.exception.return_value = None
-        _log_task_exception(task)
-
-    def test_failed_task_logs(self):
-        task = MagicMock()
-        task.cancelled.return_value = False
-        task.exception.return_value = RuntimeError("boom")
-        # Should not raise (just logs)
-        _log_task_exception(task)
-
-
 # ---------------------------------------------------------------------------
 # Web app creation
 # ---------------------------------------------------------------------------
@@ -0,0 +1,145 @@
+import pytest
+
+import whitelist_store
+from whitelist_store import WhitelistStore
+
+
+class _FakePool:
+    def __init__(self, results):
+        self.results = list(results)
+        self.queries = []
+
+    def connection(self):
+        pool = self
+
+        class _Cursor:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, query, params=None):
+                pool.queries.append(query)
+                result = pool.results.pop(0)
+                if isinstance(result, Exception):
+                    raise result
+                self.rows = result
+
+            async def fetchall(self):
+                return self.rows
+
+        class _Conn:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def cursor(self):
+                return _Cursor()
+
+        return _Conn()
+
+
+class _Disconnected(Exception):
+    pass
+
+
+class _FakeListenConn:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.executed = []
+        self.closed = False
+
+    async def execute(self, query):
+        self.executed.append(query)
+
+    async def notifies(self, timeout=None, stop_after=None):
+        if not self.batches:
+            raise _Disconnected("server closed the connection")
+        for item in self.batches.pop(0):
+            yield item
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_refresh_swaps_snapshot_and_keeps_last_good_on_db_error(monkeypatch):
+    pool = _FakePool([[(111,), (222,)], OSError("connection refused"), [(333,)]])
+    monkeypatch.setattr(whitelist_store.db_pool, "get_pool", lambda: pool)
+    store = WhitelistStore()
+
+    assert await store.refresh() is True
+    first = store.snapshot
+    assert first == frozenset({111, 222})
+
+    assert await store.refresh() is False
+    assert store.snapshot is first
+    assert 111 in store
+
+    assert await store.refresh() is True
+    assert store.snapshot == frozenset({333})
+
+
+@pytest.mark.asyncio
+async def test_refresh_without_pool_keeps_snapshot(monkeypatch):
+    monkeypatch.setattr(whitelist_store.db_pool, "get_pool", lambda: None)
+    store = WhitelistStore()
+    store._snapshot = frozenset({42})
+
+    assert await store.refresh() is False
+    assert store.snapshot == frozenset({42})
+
+
+@pytest.mark.asyncio
+async def test_listener_reloads_on_subscribe_and_on_notify(monkeypatch):
+    pool = _FakePool([[(1,)], [(1,), (2,)], [(1,), (2,)]])
+    monkeypatch.setattr(whitelist_store.db_pool, "get_pool", lambda: pool)
+    store = WhitelistStore(refresh_sec=0.01)
+    # One notification, then a timeout with none, then the connection drops.
+    conn = _FakeListenConn([["INSERT"], []])
+
+    async def connect():
+        return conn
+
+    with pytest.raises(_Disconnected):
+        await store._listen_once(connect)
+
+    assert conn.executed == [*whitelist_store.NOTIFY_TRIGGER_DDL, "LISTEN allowed_users_changed"]
+    assert conn.closed is True
+    assert len(pool.queries) == 3
+    assert store.snapshot == frozenset({1, 2})
+
+
+@pytest.mark.asyncio
+async def test_listener_without_trigger_privilege_still_listens(monkeypatch):
+    pool = _FakePool([[(1,)]])
+    monkeypatch.setattr(whitelist_store.db_pool, "get_pool", lambda: pool)
+    store = WhitelistStore(refresh_sec=0.01)
+
+    class _NoDdlConn(_FakeListenConn):
+        async def execute(self, query):
+            if "TRIGGER" in query or "FUNCTION" in query:
+                raise PermissionError("must be owner of table allowed_users")
+            await super().execute(query)
+
+    conn = _NoDdlConn([])
+
+    async def connect():
+        return conn
+
+    with pytest.raises(_Disconnected):
+        await store._listen_once(connect)
+    with pytest.raises(_Disconnected):
+        await store._listen_once(connect)
+
+    # Installation is attempted once per process, LISTEN on every connect.
+    assert conn.executed == ["LISTEN allowed_users_changed", "LISTEN allowed_users_changed"]
+
+
+@pytest.mark.parametrize("raw, expected", [("", 60.0), ("abc", 60.0), ("5", 30.0), ("120", 120.0)])
+def test_refresh_sec_from_env_falls_back_safely(monkeypatch, raw, expected):
+    monkeypatch.setenv("WHITELIST_REFRESH_SEC", raw)
+    assert whitelist_store.refresh_sec_from_env() == expected
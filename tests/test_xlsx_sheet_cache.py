@@ -0,0 +1,74 @@
+import openpyxl
+import pytest
+
+import xlsx_package
+from etl_xlsm_to_postgres import (
+    FAHRER_SHEET,
+    _extraction_groups,
+    extract_bonus_dynamik_months,
+    extract_drivers,
+    extract_fahrer_weekly_statuses,
+)
+from tests.workbook_builders import bonus_workbook, build_fahrer_sheet
+
+
+def _read_only(path, wb):
+    wb.save(path)
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+
+def test_cached_sheet_iter_rows_matches_worksheet(tmp_path):
+    ro = _read_only(tmp_path / "fahrer.xlsx", build_fahrer_sheet())
+    ws = ro[FAHRER_SHEET]
+    cached = xlsx_package.CachedSheet(ws)
+
+    for args in ({}, {"min_row": 3}, {"min_row": 2, "max_row": 4}, {"min_col": 26, "max_col": 36}, {"max_row": 40}):
+        assert list(cached.iter_rows(values_only=True, **args)) == list(ws.iter_rows(values_only=True, **args))
+    assert (cached.max_row, cached.max_column) == (ws.max_row, ws.max_column)
+    with pytest.raises(RuntimeError):
+        next(cached.iter_rows())
+    ro.close()
+
+
+def test_sheet_cache_parses_shared_sheet_once_and_evicts_after_last_reader(tmp_path):
+    path = tmp_path / "fahrer.xlsx"
+    ro = _read_only(path, build_fahrer_sheet())
+    expected = (extract_drivers(ro), extract_fahrer_weekly_statuses(ro))
+    cache = xlsx_package.SheetCache(
+        openpyxl.load_workbook(path, read_only=True, data_only=True), {FAHRER_SHEET: 2}
+    )
+
+    drivers = extract_drivers(cache)
+    cache.release([FAHRER_SHEET])
+    assert cache.cached_sheets == [FAHRER_SHEET]
+    weekly = extract_fahrer_weekly_statuses(cache)
+    cache.release([FAHRER_SHEET])
+
+    assert (drivers, weekly) == expected
+    assert cache.loads == {FAHRER_SHEET: 1}
+    assert cache.cached_sheets == []
+    cache.close()
+    ro.close()
+
+
+def test_sheet_cache_keeps_number_formats_for_formatted_sheets(tmp_path):
+    path = tmp_path / "bonus.xlsx"
+    ro = _read_only(path, bonus_workbook())
+    cache = xlsx_package.SheetCache(
+        openpyxl.load_workbook(path, read_only=True, data_only=True), formatted_sheets=["BonusDynamik"]
+    )
+
+    assert extract_bonus_dynamik_months(cache) == extract_bonus_dynamik_months(ro)
+    cache.close()
+    ro.close()
+
+
+def test_extraction_groups_keep_sheet_sharing_extractors_together():
+    names = ["trucks", "drivers", "fahrer_weekly_rows", "einnahmen_rows", "einnahmen_firm_rows", "repair_rows"]
+
+    assert _extraction_groups(names) == [
+        ("trucks",),
+        ("drivers", "fahrer_weekly_rows"),
+        ("einnahmen_rows", "einnahmen_firm_rows"),
+        ("repair_rows",),
+    ]
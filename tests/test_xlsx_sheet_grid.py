@@ -0,0 +1,52 @@
+from datetime import date
+from decimal import Decimal
+
+import openpyxl
+
+from etl_xlsm_to_postgres import extract_bonus_dynamik_months
+from tests.workbook_builders import bonus_workbook
+from xlsx_package import SheetGrid
+
+
+def _read_only(tmp_path, wb):
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+
+def test_sheet_grid_window_matches_cell_access(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row_idx in range(1, 8):
+        for col_idx in range(1, 6):
+            ws.cell(row=row_idx, column=col_idx, value=row_idx * 10 + col_idx)
+    ro = _read_only(tmp_path, wb)
+    ro_ws = ro.active
+
+    grid = SheetGrid(ro_ws, min_row=2, max_row=5, min_col=2, max_col=4)
+
+    for row_idx in range(2, 6):
+        for col_idx in range(2, 5):
+            assert grid.value(row_idx, col_idx) == ro_ws.cell(row=row_idx, column=col_idx).value
+    assert grid.value(1, 2) is None
+    assert grid.value(6, 2) is None
+    assert grid.value(3, 5) is None
+    assert grid.row(3) == (32, 33, 34)
+    assert [r for r, _ in grid.iter_rows(min_row=4)] == [4, 5]
+    assert (grid.max_row, grid.max_col) == (5, 4)
+
+    whole = SheetGrid(ro_ws)
+    assert (whole.max_row, whole.max_col) == (7, 5)
+    ro.close()
+
+
+def test_bonus_percent_detection_uses_grid_number_formats(tmp_path):
+    ro = _read_only(tmp_path, bonus_workbook())
+
+    rows = extract_bonus_dynamik_months(ro)
+    ro.close()
+
+    assert len(rows) == 1
+    assert rows[0].pct_km == Decimal("85.00")
+    assert rows[0].pct_ct == Decimal("1.1")
+    assert (rows[0].days, rows[0].ct, rows[0].month_start) == (20, 12, date(2026, 2, 1))
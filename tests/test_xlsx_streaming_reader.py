@@ -0,0 +1,122 @@
+from datetime import date, datetime, time, timedelta
+
+import openpyxl
+import pytest
+from openpyxl.utils.datetime import CALENDAR_MAC_1904
+
+import xlsx_package
+from etl_xlsm_to_postgres import EXTRACTORS, READER_ENGINE_OPENPYXL, READER_ENGINE_STREAMING, _run_extractors
+from tests.workbook_builders import build_fahrer_sheet, build_repair_sheet, write_excel_style_package
+
+
+ITER_ARGS = [
+    {},
+    {"min_row": 2, "max_row": 6},
+    {"min_col": 2, "max_col": 3},
+    {"min_row": 4},
+    {"max_row": 20},
+    {"min_row": 3, "max_row": 3, "min_col": 4, "max_col": 4},
+]
+
+
+def _typed_workbook(epoch=None):
+    wb = openpyxl.Workbook()
+    if epoch is not None:
+        wb.epoch = epoch
+    ws = wb.active
+    ws.title = "Typed"
+    ws["A1"] = "text"
+    ws["C1"] = 1.5
+    ws["D1"] = 42
+    ws["B3"] = datetime(2026, 1, 2, 3, 4, 5)
+    ws["D3"] = date(2026, 5, 1)
+    ws["A5"] = True
+    ws["B5"] = False
+    ws["C5"] = "=1+1"
+    ws["E6"] = time(5, 30)
+    ws["C7"] = 0.25
+    ws["C7"].number_format = "0.00%"
+    ws["A9"] = timedelta(hours=30, minutes=15)
+    ws["B9"] = "  padded  "
+    ws["E9"] = 1e-7
+    other = wb.create_sheet("Empty")
+    other["A1"] = None
+    return wb
+
+
+def _open_both(path):
+    return (
+        openpyxl.load_workbook(path, read_only=True, data_only=True),
+        xlsx_package.StreamingWorkbook(path),
+    )
+
+
+@pytest.mark.parametrize("epoch", [None, CALENDAR_MAC_1904])
+def test_streaming_values_match_openpyxl(tmp_path, epoch):
+    path = tmp_path / "typed.xlsx"
+    _typed_workbook(epoch).save(path)
+    reference, streaming = _open_both(path)
+    try:
+        assert streaming.sheetnames == reference.sheetnames
+        for name in reference.sheetnames:
+            ref_ws, stream_ws = reference[name], streaming[name]
+            assert (stream_ws.max_row, stream_ws.max_column) == (ref_ws.max_row, ref_ws.max_column)
+            for args in ITER_ARGS:
+                assert list(stream_ws.iter_rows(values_only=True, **args)) == list(
+                    ref_ws.iter_rows(values_only=True, **args)
+                ), (name, args)
+    finally:
+        reference.close()
+        streaming.close()
+
+
+def test_streaming_number_formats_match_openpyxl(tmp_path):
+    path = tmp_path / "typed.xlsx"
+    _typed_workbook().save(path)
+    reference, streaming = _open_both(path)
+    try:
+        ref = [[(c.value, c.number_format) for c in row] for row in reference["Typed"].iter_rows()]
+        got = [[(c.value, c.number_format) for c in row] for row in streaming["Typed"].iter_rows()]
+        assert got == ref
+    finally:
+        reference.close()
+        streaming.close()
+
+
+def test_streaming_reads_shared_and_rich_text_strings(tmp_path):
+    path = tmp_path / "excel.xlsm"
+    write_excel_style_package(path, ["LKW-ID", "GR-OO1708"])
+    wb = xlsx_package.StreamingWorkbook(path)
+    try:
+        ws = wb["LKW"]
+        assert ws.max_row is None
+        assert list(ws.iter_rows(values_only=True)) == [("LKW-ID", "GR-OO1708")]
+        assert list(wb["Repair"].values) == [(1,)]
+        with pytest.raises(KeyError):
+            wb["Missing"]
+    finally:
+        wb.close()
+
+
+def _extractor_workbook(path):
+    wb = build_fahrer_sheet()
+    source = build_repair_sheet().active
+    repair = wb.create_sheet("Repair")
+    for row in source.iter_rows(values_only=True):
+        repair.append(row)
+    lkw = wb.create_sheet("LKW")
+    lkw.append(["LKW-ID", "LKW-Nummer", "LKW-Typ", "Firma", "Status", "Datum verkauft"])
+    lkw.append(["L001", "GR-OO1708", "Container", "Groo", "Aktiv", None])
+    lkw.append(["L002", "GR-OO2245", "Plane", "Groo", "Verkauft", date(2025, 11, 30)])
+    wb.save(path)
+
+
+def test_all_extractors_agree_across_engines(tmp_path):
+    path = tmp_path / "book.xlsx"
+    _extractor_workbook(path)
+
+    reference = _run_extractors(path, EXTRACTORS, engine=READER_ENGINE_OPENPYXL)
+    streaming = _run_extractors(path, EXTRACTORS, engine=READER_ENGINE_STREAMING)
+
+    assert streaming == reference
+    assert all(reference[name] for name in ("trucks", "drivers", "fahrer_weekly_rows", "repair_rows"))
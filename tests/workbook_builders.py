@@ -0,0 +1,151 @@
+"""
+Workbook builders shared by the extraction, package-reader and sheet-cache tests.
+"""
+
+import zipfile
+from datetime import date
+
+from openpyxl import Workbook
+
+from etl_xlsm_to_postgres import BONUS_DYNAMIK_SHEET
+
+
+def build_fahrer_sheet():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Fahrer"
+
+    ws["A1"] = ">>Neu Fahrer"
+    ws["B1"] = ">>Search"
+    ws["Z1"] = 2026
+    ws["AH1"] = 2026
+
+    headers = [
+        "Fahrer-ID",
+        "Fahrername",
+        "Firma",
+        "Telefonnummer",
+        "Führerschein",
+        "LKW-Typ",
+        "Arbeitsplan",
+        "Status",
+        "Datum entlassen",
+    ]
+    for idx, value in enumerate(headers, start=1):
+        ws.cell(row=2, column=idx, value=value)
+
+    ws["Z2"] = "Urlaub gesamt"
+    ws["AA2"] = "Krankheitstage"
+    ws["AH2"] = 2026
+    ws["AI2"] = 2026
+    ws["AJ2"] = 2026
+
+    sub_headers = ["ID", "Name", "Company", "Phone", "License", "Type", "Schedule", "Active/Fired", "Date"]
+    for idx, value in enumerate(sub_headers, start=1):
+        ws.cell(row=3, column=idx, value=value)
+
+    ws["Z3"] = "Total vacation"
+    ws["AA3"] = "Sick Days"
+    ws["AH3"] = 1
+    ws["AI3"] = 2
+    ws["AJ3"] = 3
+
+    ws["A4"] = "F001"
+    ws["B4"] = "Driver One"
+    ws["C4"] = "Groo"
+    ws["D4"] = "+491111"
+    ws["F4"] = "Container"
+    ws["G4"] = "3M/3M"
+    ws["Z4"] = 10
+    ws["AA4"] = 2
+    ws["AH4"] = "U"
+    ws["AI4"] = "U"
+    ws["AJ4"] = "К"
+
+    ws["A5"] = "F002"
+    ws["B5"] = "Driver Two"
+    ws["C5"] = "Groo"
+    ws["D5"] = "+492222"
+    ws["F5"] = "Planen"
+    ws["G5"] = "2M/2M"
+    ws["H5"] = "Fahrer entlassen"
+    ws["I5"] = date(2026, 1, 12)
+    ws["AH5"] = "U"
+    ws["AI5"] = "K"
+    ws["AJ5"] = "U"
+
+    return wb
+
+
+def build_repair_sheet():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Repair"
+
+    headers = [
+        "Year",
+        "Month",
+        "Week",
+        "Date Invoice",
+        "Truck",
+        "Name",
+        "Total Price",
+        "Invoice",
+        "Seller",
+        "Byuer",
+        "Kategorie",
+    ]
+    for idx, value in enumerate(headers, start=1):
+        ws.cell(row=2, column=idx, value=value)
+
+    ws.append([2026, 3, 14, date(2026, 3, 31), "EX DE-FN400", "wash service", 85.71, "V-RE002079", "Wash GmbH", "Groo GmbH", "Wash"])
+    ws.append([2026, 4, 15, date(2026, 4, 7), "GR-OO2245", "CP Comfort Plus LKW neu", "164,61", "7601077285", "MAN Truck", "Groo GmbH", "Service"])
+    return wb
+
+
+def write_excel_style_package(path, shared_strings):
+    # Excel (unlike openpyxl) stores text cells as indexes into xl/sharedStrings.xml.
+    main = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    rel = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    pkg = "http://schemas.openxmlformats.org/package/2006/relationships"
+    sheet_xml = (
+        f'<worksheet xmlns="{main}"><sheetData>'
+        '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c></row>'
+        "</sheetData></worksheet>"
+    )
+    other_xml = f'<worksheet xmlns="{main}"><sheetData><row r="1"><c r="A1"><v>1</v></c></row></sheetData></worksheet>'
+    sst = "".join(
+        f"<si><r><t>{text[:2]}</t></r><r><t>{text[2:]}</t></r><rPh><t>x</t></rPh></si>" for text in shared_strings
+    )
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(
+            "xl/workbook.xml",
+            f'<workbook xmlns="{main}" xmlns:r="{rel}"><sheets>'
+            '<sheet name="LKW" sheetId="1" r:id="rId1"/><sheet name="Repair" sheetId="2" r:id="rId2"/>'
+            "</sheets></workbook>",
+        )
+        zf.writestr(
+            "xl/_rels/workbook.xml.rels",
+            f'<Relationships xmlns="{pkg}">'
+            '<Relationship Id="rId1" Type="worksheet" Target="worksheets/sheet1.xml"/>'
+            '<Relationship Id="rId2" Type="worksheet" Target="/xl/worksheets/sheet2.xml"/>'
+            "</Relationships>",
+        )
+        zf.writestr("xl/worksheets/sheet1.xml", sheet_xml)
+        zf.writestr("xl/worksheets/sheet2.xml", other_xml)
+        zf.writestr("xl/sharedStrings.xml", f'<sst xmlns="{main}">{sst}</sst>')
+
+
+def bonus_workbook():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = BONUS_DYNAMIK_SHEET
+    ws.cell(row=1, column=3, value=date(2026, 2, 1))
+    for off, header in enumerate(["DAYS", "KM", "%KM", "CT", "%CT", "BONUS", "PENALTY", "FINAL"]):
+        ws.cell(row=2, column=3 + off, value=header)
+    ws.cell(row=3, column=1, value="F001")
+    ws.cell(row=3, column=2, value="Driver One")
+    for off, value in enumerate([20, 4500, 0.85, 12, 1.1, 150, 0, 150]):
+        ws.cell(row=3, column=3 + off, value=value)
+    ws.cell(row=3, column=5).number_format = "0%"
+    return wb
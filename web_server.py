@@ -25,7 +25,12 @@ from urllib.parse import parse_qsl
 
 from aiohttp import web
 
+import db_pool
+import etl_db
 from report_config import get_all_reports_api, REPORT_TYPES
+from report_cache import ReportCache
+from report_queue import ReportQueue
+from telegram_file_cache import get_file_cache
 
 logger = logging.getLogger("lkw_report_bot.web")
 
@@ -34,8 +39,7 @@ MINIAPP_DIR = os.path.join(BASE_DIR, "miniapp")
 
 # These are set by init_web_app() from bot.py
 _bot = None
-_excel_lock = None
-_run_report_fn = None
+_report_queue: ReportQueue | None = None
 _whitelist_fn: Callable[[], set[int]] = lambda: set()
 _bot_token: str = ""
 
@@ -49,12 +53,22 @@ _ETL_TRIGGER_COOLDOWN_SEC = 30
 _INIT_DATA_MAX_AGE_SEC = 300  # 5 minutes
 
 
-def init_web_app(bot, excel_lock, run_report_fn, whitelist_fn: Callable[[], set[int]], bot_token: str):
-    """Initialize web server with bot dependencies. Called from bot.py before start."""
-    global _bot, _excel_lock, _run_report_fn, _whitelist_fn, _bot_token
+def init_web_app(
+    bot,
+    excel_lock,
+    run_report_fn,
+    whitelist_fn: Callable[[], set[int]],
+    bot_token: str,
+    report_queue: ReportQueue | None = None,
+):
+    """
+    Initialize web server with bot dependencies. Called from bot.py before start.
+    Pass the bot's report_queue so Mini App and chat requests coalesce; otherwise
+    a queue is built from run_report_fn/excel_lock.
+    """
+    global _bot, _report_queue, _whitelist_fn, _bot_token
     _bot = bot
-    _excel_lock = excel_lock
-    _run_report_fn = run_report_fn
+    _report_queue = report_queue or ReportQueue(run_report_fn, excel_lock=excel_lock, cache=ReportCache.from_env())
     _whitelist_fn = whitelist_fn
     _bot_token = bot_token
 
@@ -122,9 +136,9 @@ async def handle_api_reports(request: web.Request) -> web.Response:
     return web.json_response(data)
 
 
-def _get_etl_meta() -> dict:
+async def _get_etl_meta() -> dict:
     """
-    Read ETL freshness metadata from PostgreSQL (etl_log).
+    Read ETL freshness metadata from PostgreSQL (etl_source_status) via the shared pool.
     Returns a safe dict even if DB is unavailable.
     """
     stale_after_hours_raw = os.getenv("ETL_STALE_AFTER_HOURS", "4").strip() or "4"
@@ -142,45 +156,28 @@ def _get_etl_meta() -> dict:
         "source_name": None,
     }
 
-    db_url = (os.getenv("DATABASE_URL") or "").strip()
-    if not db_url:
+    pool = db_pool.get_pool()
+    if pool is None:
         return meta
 
     try:
-        import psycopg  # type: ignore
-
-        with psycopg.connect(db_url) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT
-                        source_name,
-                        COALESCE(finished_at, started_at) AS import_ts
-                    FROM etl_log
-                    WHERE status = 'success'
-                    ORDER BY COALESCE(finished_at, started_at) DESC
-                    LIMIT 1
-                    """
-                )
-                row = cur.fetchone()
-                if not row:
-                    return meta
-
-                source_name, import_ts = row
-                if import_ts is None:
-                    return meta
-
-                if getattr(import_ts, "tzinfo", None) is None:
-                    import_ts = import_ts.replace(tzinfo=timezone.utc)
-                import_utc = import_ts.astimezone(timezone.utc)
-                now_utc = datetime.now(timezone.utc)
-                age_sec = max(0, int((now_utc - import_utc).total_seconds()))
-
-                meta["last_import_at"] = import_utc.isoformat()
-                meta["age_sec"] = age_sec
-                meta["is_stale"] = age_sec > stale_after_sec
-                meta["source_name"] = source_name
-                return meta
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                rows = [r for r in await etl_db.fetch_last_success_async(cur) if r[1] is not None]
+        if not rows:
+            return meta
+        source_name, import_ts = max(rows, key=lambda r: r[1])
+        if getattr(import_ts, "tzinfo", None) is None:
+            import_ts = import_ts.replace(tzinfo=timezone.utc)
+        import_utc = import_ts.astimezone(timezone.utc)
+        now_utc = datetime.now(timezone.utc)
+        age_sec = max(0, int((now_utc - import_utc).total_seconds()))
+
+        meta["last_import_at"] = import_utc.isoformat()
+        meta["age_sec"] = age_sec
+        meta["is_stale"] = age_sec > stale_after_sec
+        meta["source_name"] = source_name
+        return meta
     except Exception:
         logger.exception("Failed to load ETL meta from DB")
         return meta
@@ -192,7 +189,7 @@ async def handle_api_meta(request: web.Request) -> web.Response:
     cron = os.getenv("SCHEDULE_CRON", "0 10 * * 1")
     timezone = os.getenv("SCHEDULE_TIMEZONE", "Europe/Berlin")
     report_type = os.getenv("SCHEDULE_REPORT_TYPE", "bericht")
-    etl_meta = await asyncio.to_thread(_get_etl_meta)
+    etl_meta = await _get_etl_meta()
 
     return web.json_response({
         "ok": True,
@@ -220,7 +217,7 @@ async def handle_api_generate(request: web.Request) -> web.Response:
 
     Validates user via initData HMAC, then generates report in background and sends PDF to chat.
     """
-    if not _bot or not _run_report_fn or not _excel_lock:
+    if not _bot or _report_queue is None:
         return web.json_response({"ok": False, "error": "Server not ready"}, status=503)
 
     try:
@@ -278,11 +275,14 @@ async def handle_api_generate(request: web.Request) -> web.Response:
         logger.exception("Failed to send status message to user=%s", user_id)
         return web.json_response({"ok": False, "error": "Failed to send message"}, status=500)
 
-    # Launch generation in background (don't block HTTP response)
-    task = asyncio.create_task(_generate_and_send(chat_id, user_id, report_type, year, week, status_msg))
-    task.add_done_callback(_log_task_exception)
+    # Enqueue; the queue worker generates and sends in the background.
+    try:
+        position = await _generate_and_send(chat_id, user_id, report_type, year, week, status_msg)
+    except Exception:
+        logger.exception("Failed to queue report for user=%s", user_id)
+        return web.json_response({"ok": False, "error": "Failed to queue report"}, status=500)
 
-    return web.json_response({"ok": True, "message": "Report generation started"})
+    return web.json_response({"ok": True, "message": "Report generation started", "queue_position": position})
 
 
 def _etl_lock_path() -> pathlib.Path:
@@ -349,77 +349,42 @@ async def handle_api_etl_run(request: web.Request) -> web.Response:
         return web.json_response({"ok": False, "error": "Failed to start ETL"}, status=500)
 
 
-def _log_task_exception(task: asyncio.Task) -> None:
-    """Callback to log unhandled exceptions from background tasks."""
-    if task.cancelled():
-        return
-    exc = task.exception()
-    if exc is not None:
-        logger.error("Background task failed: %s", exc, exc_info=exc)
+async def _edit_status(chat_id: int, status_msg, text: str) -> None:
+    try:
+        await _bot.edit_message_text(chat_id=chat_id, message_id=status_msg.message_id, text=text)
+    except Exception:
+        pass
 
 
-async def _generate_and_send(chat_id: int, user_id: int, report_type: str, year: int, week: int, status_msg):
-    """Background task: generate report and send PDF to chat."""
-    try:
-        async with _excel_lock:
-            try:
-                await _bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=status_msg.message_id,
-                    text=f"Generating report... year={year}, week={week}\nStep 2/3: Running VBA + exporting..."
-                )
-            except Exception:
-                pass
-
-            xlsx_path, pdf_path = await asyncio.wait_for(
-                asyncio.to_thread(_run_report_fn, report_type, year, week),
-                timeout=30 * 60,
-            )
+async def _generate_and_send(chat_id: int, user_id: int, report_type: str, year: int, week: int, status_msg) -> int:
+    """Queue the report; the queue worker sends the PDF to chat. Returns the queue position."""
 
-        try:
-            await _bot.edit_message_text(
-                chat_id=chat_id,
-                message_id=status_msg.message_id,
-                text=f"Generating report... year={year}, week={week}\nStep 3/3: Sending PDF..."
-            )
-        except Exception:
-            pass
-
-        if pdf_path and os.path.exists(pdf_path):
-            with open(pdf_path, "rb") as fp:
-                await _bot.send_document(chat_id=chat_id, document=fp, filename=os.path.basename(pdf_path))
+    async def on_start(waiter):
+        await _edit_status(
+            chat_id, status_msg, f"Generating report... year={year}, week={week}\nStep 2/3: Running VBA + exporting..."
+        )
 
-        try:
-            await _bot.edit_message_text(
-                chat_id=chat_id,
-                message_id=status_msg.message_id,
-                text="Done."
-            )
-        except Exception:
-            pass
-
-        logger.info("API GEN success user=%s year=%s week=%s pdf=%s", user_id, year, week, pdf_path)
-
-        # Cleanup temp files
-        for p in (pdf_path, xlsx_path):
-            try:
-                if p:
-                    pathlib.Path(p).unlink(missing_ok=True)
-            except Exception:
-                pass
-
-    except asyncio.TimeoutError:
-        logger.exception("API GEN timeout user=%s year=%s week=%s", user_id, year, week)
-        try:
-            await _bot.edit_message_text(chat_id=chat_id, message_id=status_msg.message_id, text="Error: timeout")
-        except Exception:
-            pass
-    except Exception:
-        logger.exception("API GEN failed user=%s year=%s week=%s", user_id, year, week)
-        try:
-            await _bot.edit_message_text(chat_id=chat_id, message_id=status_msg.message_id, text="Error generating report.")
-        except Exception:
-            pass
+    async def on_done(waiter, result):
+        if result.error is not None:
+            logger.error("API GEN failed user=%s year=%s week=%s: %s", user_id, year, week, result.error)
+            timed_out = isinstance(result.error, asyncio.TimeoutError)
+            await _edit_status(chat_id, status_msg, "Error: timeout" if timed_out else "Error generating report.")
+            return
+
+        await _edit_status(chat_id, status_msg, f"Generating report... year={year}, week={week}\nStep 3/3: Sending PDF...")
+        if result.pdf_path and os.path.exists(result.pdf_path):
+            await get_file_cache().send_document(_bot, chat_id, result.pdf_path)
+        await _edit_status(chat_id, status_msg, "Done.")
+        logger.info("API GEN success user=%s year=%s week=%s pdf=%s", user_id, year, week, result.pdf_path)
+
+    ticket = await _report_queue.submit(
+        user_id, chat_id, report_type, year, week, on_start=on_start, on_done=on_done, source="api"
+    )
+    if ticket.position > 1:
+        await _edit_status(
+            chat_id, status_msg, f"Generating report... year={year}, week={week}\nQueued: #{ticket.position} in line..."
+        )
+    return ticket.position
 
 
 def create_web_app() -> web.Application:
@@ -436,6 +401,7 @@ def create_web_app() -> web.Application:
 
 async def start_web_server(port: int = 8443) -> web.AppRunner:
     """Start the web server and return the runner (for cleanup)."""
+    await db_pool.open_pool()  # no-op when bot._post_init already opened it
     app = create_web_app()
     runner = web.AppRunner(app)
     await runner.setup()
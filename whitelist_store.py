@@ -0,0 +1,159 @@
+"""
+In-memory allowed_users whitelist for the bot and the Mini App web server.
+
+Lookups read an immutable snapshot and never touch the network. A
+background task keeps it current: it LISTENs on allowed_users_changed
+(NOTIFY from the trigger in sql/001_init_schema.sql) and reloads on every
+notification, plus a periodic safety reload (WHITELIST_REFRESH_SEC,
+default 60s). The listener installs the trigger idempotently on connect,
+so databases created before it existed get notifications too; without
+the privilege to do so it falls back to the periodic reload. If the DB is
+unreachable the last good snapshot is kept; reconnects back off up to
+RECONNECT_MAX_SEC.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+
+import db_pool
+
+logger = logging.getLogger("lkw_report_bot.whitelist")
+
+NOTIFY_CHANNEL = "allowed_users_changed"
+ALLOWED_USERS_SQL = "SELECT telegram_user_id FROM allowed_users WHERE is_active = true"
+RECONNECT_MAX_SEC = 60.0
+DEFAULT_REFRESH_SEC = 60.0
+MIN_REFRESH_SEC = 30.0
+
+NOTIFY_TRIGGER_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION notify_allowed_users_changed() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('allowed_users_changed', TG_OP);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = 'trg_allowed_users_changed' AND tgrelid = 'allowed_users'::regclass
+        ) THEN
+            CREATE TRIGGER trg_allowed_users_changed
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON allowed_users
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_allowed_users_changed();
+        END IF;
+    END
+    $$
+    """,
+)
+
+
+def refresh_sec_from_env() -> float:
+    """WHITELIST_REFRESH_SEC with a safe fallback for empty or malformed values."""
+    raw = (os.getenv("WHITELIST_REFRESH_SEC") or "").strip()
+    try:
+        value = float(raw) if raw else DEFAULT_REFRESH_SEC
+    except ValueError:
+        value = DEFAULT_REFRESH_SEC
+    return max(MIN_REFRESH_SEC, value)
+
+
+class WhitelistStore:
+    def __init__(self, refresh_sec: float = DEFAULT_REFRESH_SEC):
+        self.refresh_sec = refresh_sec
+        self._trigger_checked = False
+        self._snapshot: frozenset[int] = frozenset()
+        self.loaded_at: float = 0.0
+        self._warned = False
+
+    @property
+    def snapshot(self) -> frozenset[int]:
+        return self._snapshot
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    async def _fetch(self) -> frozenset[int]:
+        pool = db_pool.get_pool()
+        if pool is None:
+            raise RuntimeError("DB pool is not open")
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(ALLOWED_USERS_SQL)
+                rows = await cur.fetchall()
+        return frozenset(int(row[0]) for row in rows if row and row[0])
+
+    async def refresh(self) -> bool:
+        """Reload from allowed_users; on failure keep the last good snapshot."""
+        try:
+            users = await self._fetch()
+        except Exception:
+            if not self._warned:
+                logger.exception("Failed to load allowed_users; keeping %s cached users", len(self._snapshot))
+                self._warned = True
+            return False
+        self._snapshot = users  # single reference swap: readers see old or new, never a mix
+        self.loaded_at = time.time()
+        self._warned = False
+        return True
+
+    async def _listen_once(self, connect) -> None:
+        conn = await connect()
+        try:
+            if not self._trigger_checked:
+                await self._install_trigger(conn)
+            await conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            # Notifications sent while we were disconnected are lost: reload after (re)subscribing.
+            await self.refresh()
+            while True:
+                got = False
+                async for _notify in conn.notifies(timeout=self.refresh_sec, stop_after=1):
+                    got = True
+                await self.refresh()
+                if got:
+                    logger.info("allowed_users changed; whitelist reloaded (%s users)", len(self._snapshot))
+        finally:
+            await conn.close()
+
+    async def _install_trigger(self, conn) -> None:
+        try:
+            for statement in NOTIFY_TRIGGER_DDL:
+                await conn.execute(statement)
+        except Exception as exc:
+            logger.warning(
+                "Could not install allowed_users NOTIFY trigger (%s); relying on %.0fs reloads", exc, self.refresh_sec
+            )
+        self._trigger_checked = True
+
+    async def run(self, db_url: str, connect=None) -> None:
+        """Listener loop; runs until cancelled."""
+        if connect is None:
+            import psycopg  # type: ignore
+
+            async def connect():
+                return await psycopg.AsyncConnection.connect(db_url, autocommit=True)
+
+        delay = 1.0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._listen_once(connect)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Whitelist listener disconnected: %s; retrying in %.0fs", exc, delay)
+            if time.monotonic() - started > RECONNECT_MAX_SEC:
+                delay = 1.0
+            await asyncio.sleep(delay)
+            await self.refresh()
+            delay = min(delay * 2, RECONNECT_MAX_SEC)
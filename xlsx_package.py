@@ -0,0 +1,576 @@
+"""
+Helpers for reading the OOXML package (zip) behind .xlsx/.xlsm workbooks
+without openpyxl:
+- maps sheet names to their worksheet XML parts
+- reads shared strings
+- computes cheap per-sheet content fingerprints, and a whole-file one
+  (content_fingerprint) over the same parts for change detection
+- materialises a bounded window of a worksheet in one pass (SheetGrid)
+- StreamingWorkbook: a read-only, data-only stand-in for openpyxl's
+  read-only workbook that yields plain value tuples straight from the sheet
+  XML (openpyxl is only used for its number-format and date helpers)
+- SheetCache: reads each worksheet of a workbook once and serves every
+  later iter_rows() from memory until the sheet is released
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import posixpath
+import re
+import zipfile
+from pathlib import Path
+from typing import Iterable
+from xml.etree import ElementTree as ET
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_MAX_SIZE, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+WORKBOOK_PART = "xl/workbook.xml"
+WORKBOOK_RELS_PART = "xl/_rels/workbook.xml.rels"
+SHARED_STRINGS_PART = "xl/sharedStrings.xml"
+STYLES_PART = "xl/styles.xml"
+MISSING_SHEET_FINGERPRINT = "missing"
+# Package parts whose content can change extracted values: worksheets, shared
+# strings, styles (number formats decide how cells are typed) and the
+# workbook part + rels that map sheet names to parts. sheet_fingerprints
+# reads only these; whole-file change detection (content_fingerprint) hashes
+# the same set, so both agree on what counts as a data change.
+EXTRACTION_PART_PREFIXES = ("xl/worksheets/", "xl/sharedStrings", "xl/styles", "xl/workbook", "xl/_rels/workbook")
+
+
+def content_fingerprint(path: Path, zip_parts: tuple[str, ...] = EXTRACTION_PART_PREFIXES) -> str:
+    """
+    Workbooks (xlsx/xlsm/xlsb are zips): sha256 over name, CRC-32 and size
+    of the data parts, read from the central directory without inflating
+    anything. Other files: chunked sha256 over a memory-mapped read.
+    """
+    digest = hashlib.sha256()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in sorted(zf.infolist(), key=lambda i: i.filename):
+                if info.filename.startswith(zip_parts):
+                    digest.update(f"{info.filename}:{info.CRC:08x}:{info.file_size}\n".encode("utf-8"))
+        return "zip:" + digest.hexdigest()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for offset in range(0, len(mm), 1024 * 1024):
+                    digest.update(mm[offset:offset + 1024 * 1024])
+    return "sha256:" + digest.hexdigest()
+
+
+_SHARED_STRING_REF_RE = re.compile(rb'<c\b[^>]*\bt="s"[^>]*>\s*<v>(\d+)</v>')
+
+
+def _resolve_target(target: str) -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def sheet_parts(zf: zipfile.ZipFile) -> dict[str, str]:
+    """
+    Returns {sheet name: zip member name of its worksheet XML}, in workbook order.
+    """
+    rels_root = ET.fromstring(zf.read(WORKBOOK_RELS_PART))
+    targets = {
+        rel.get("Id"): _resolve_target(rel.get("Target") or "")
+        for rel in rels_root.iter(f"{{{NS_PKG_REL}}}Relationship")
+    }
+    workbook_root = ET.fromstring(zf.read(WORKBOOK_PART))
+    parts: dict[str, str] = {}
+    for sheet in workbook_root.iter(f"{{{NS_MAIN}}}sheet"):
+        name = sheet.get("name")
+        target = targets.get(sheet.get(f"{{{NS_REL}}}id"))
+        if name and target:
+            parts[name] = target
+    return parts
+
+
+def read_shared_strings(zf: zipfile.ZipFile) -> list[str]:
+    if SHARED_STRINGS_PART not in zf.namelist():
+        return []
+    t_tag = f"{{{NS_MAIN}}}t"
+    r_tag = f"{{{NS_MAIN}}}r"
+    si_tag = f"{{{NS_MAIN}}}si"
+    strings: list[str] = []
+    with zf.open(SHARED_STRINGS_PART) as fh:
+        for _, elem in ET.iterparse(fh, events=("end",)):
+            if elem.tag != si_tag:
+                continue
+            # Plain <t> or rich-text runs <r><t>; phonetic hints (<rPh>) are not cell text.
+            parts: list[str] = []
+            for child in elem:
+                if child.tag == t_tag:
+                    parts.append(child.text or "")
+                elif child.tag == r_tag:
+                    parts.extend(t.text or "" for t in child.iter(t_tag))
+            # Same unescaping as openpyxl's string table reader.
+            strings.append("".join(parts).replace("x005F_", ""))
+            elem.clear()
+    return strings
+
+
+def sheet_fingerprints(path: Path, sheet_names: list[str] | tuple[str, ...] | None = None) -> dict[str, str]:
+    """
+    Cheap content fingerprint per sheet: sha1 over the worksheet XML part, the
+    shared strings it references and the styles part (number formats decide
+    how cells are typed). Sheets that are not in the workbook map to
+    MISSING_SHEET_FINGERPRINT.
+    """
+    with zipfile.ZipFile(path) as zf:
+        members = set(zf.namelist())
+        parts = sheet_parts(zf)
+        wanted = list(sheet_names) if sheet_names is not None else list(parts)
+        styles_hash = hashlib.sha1(zf.read(STYLES_PART)).hexdigest() if STYLES_PART in members else ""
+        shared_strings: list[str] | None = None
+        result: dict[str, str] = {}
+        for name in wanted:
+            part = parts.get(name)
+            if part is None or part not in members:
+                result[name] = MISSING_SHEET_FINGERPRINT
+                continue
+            data = zf.read(part)
+            digest = hashlib.sha1(data)
+            digest.update(styles_hash.encode("ascii"))
+            refs = _SHARED_STRING_REF_RE.findall(data)
+            if refs:
+                if shared_strings is None:
+                    shared_strings = read_shared_strings(zf)
+                for ref in refs:
+                    idx = int(ref)
+                    digest.update(b"\x1f")
+                    if idx < len(shared_strings):
+                        digest.update(shared_strings[idx].encode("utf-8"))
+            result[name] = digest.hexdigest()
+        return result
+
+
+class SheetGrid:
+    """
+    A rectangle of a worksheet read in a single iter_rows pass.
+
+    openpyxl read-only worksheets re-parse the sheet stream on every
+    ws.cell() call, so scans over a region should read it once through
+    this instead. Row/column numbers are 1-based and absolute, like
+    ws.cell(); anything outside the window reads as None. max_row=None
+    reads to the end of the sheet. number_formats=True also keeps each
+    cell's number format (needed to tell percentages from plain numbers).
+    """
+
+    def __init__(
+        self,
+        ws,
+        min_row: int = 1,
+        max_row: int | None = None,
+        min_col: int = 1,
+        max_col: int | None = None,
+        number_formats: bool = False,
+    ) -> None:
+        self.title = getattr(ws, "title", "")
+        self.min_row = min_row
+        self.min_col = min_col
+        self._values: list[tuple] = []
+        self._formats: list[tuple] | None = [] if number_formats else None
+        rows = ws.iter_rows(
+            min_row=min_row,
+            max_row=max_row,
+            min_col=min_col,
+            max_col=max_col,
+            values_only=not number_formats,
+        )
+        for row in rows:
+            if number_formats:
+                self._values.append(tuple(cell.value for cell in row))
+                self._formats.append(tuple(cell.number_format for cell in row))
+            else:
+                self._values.append(tuple(row))
+        self.max_row = min_row + len(self._values) - 1
+        width = max((len(r) for r in self._values), default=0)
+        self.max_col = max_col if max_col is not None else min_col + width - 1
+
+    def value(self, row: int, col: int) -> object:
+        r = row - self.min_row
+        c = col - self.min_col
+        if r < 0 or c < 0 or r >= len(self._values):
+            return None
+        values = self._values[r]
+        return values[c] if c < len(values) else None
+
+    def number_format(self, row: int, col: int) -> str | None:
+        if self._formats is None:
+            raise RuntimeError("SheetGrid was read without number_formats=True")
+        r = row - self.min_row
+        c = col - self.min_col
+        if r < 0 or c < 0 or r >= len(self._formats):
+            return None
+        formats = self._formats[r]
+        return formats[c] if c < len(formats) else None
+
+    def row(self, row: int) -> tuple:
+        """Values of one row, starting at min_col."""
+        r = row - self.min_row
+        if r < 0 or r >= len(self._values):
+            return ()
+        return self._values[r]
+
+    def iter_rows(self, min_row: int | None = None):
+        """Yields (row number, values) from min_row (default: the window start)."""
+        start = max(self.min_row, min_row or self.min_row)
+        for offset in range(start - self.min_row, len(self._values)):
+            yield self.min_row + offset, self._values[offset]
+
+
+class StreamingCell:
+    """Value + number format of one cell, for iter_rows(values_only=False)."""
+
+    __slots__ = ("value", "number_format")
+
+    def __init__(self, value: object, number_format: str | None) -> None:
+        self.value = value
+        self.number_format = number_format
+
+
+_EMPTY_STREAMING_CELL = StreamingCell(None, None)
+
+
+def _cast_number(value: str) -> int | float:
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+class StreamingWorksheet:
+    """
+    Read-only worksheet that iterparses its XML part on every iter_rows call.
+    Mirrors openpyxl's ReadOnlyWorksheet.iter_rows: missing rows/cells are
+    filled with None and rows are padded to max_col (or the sheet dimension).
+    """
+
+    def __init__(self, parent: "StreamingWorkbook", title: str, part: str) -> None:
+        self.parent = parent
+        self.title = title
+        self._part = part
+        self.min_row = self.min_column = 1
+        self.max_row = self.max_column = None
+        self._read_dimension()
+
+    def _read_dimension(self) -> None:
+        dimension_tag = f"{{{NS_MAIN}}}dimension"
+        data_tag = f"{{{NS_MAIN}}}sheetData"
+        with self.parent._zf.open(self._part) as fh:
+            for event, elem in ET.iterparse(fh, events=("start",)):
+                if elem.tag == dimension_tag:
+                    ref = elem.get("ref")
+                    if ref:
+                        self.min_column, self.min_row, self.max_column, self.max_row = range_boundaries(ref)
+                    return
+                if elem.tag == data_tag:
+                    return
+
+    def _parse_rows(self, max_row: int | None):
+        """Yields (row number, [(column, value, style id), ...]) per <row> element."""
+        wb = self.parent
+        row_tag = f"{{{NS_MAIN}}}row"
+        v_tag = f"{{{NS_MAIN}}}v"
+        is_tag = f"{{{NS_MAIN}}}is"
+        t_tag = f"{{{NS_MAIN}}}t"
+        r_tag = f"{{{NS_MAIN}}}r"
+        shared_strings = wb.shared_strings
+        date_styles = wb.date_styles
+        timedelta_styles = wb.timedelta_styles
+        epoch = wb.epoch
+        column_of: dict[str, int] = {}
+        row_counter = 0
+        with wb._zf.open(self._part) as fh:
+            for _, row in ET.iterparse(fh, events=("end",)):
+                if row.tag != row_tag:
+                    continue
+                r_attr = row.get("r")
+                row_counter = int(float(r_attr)) if r_attr else row_counter + 1
+                if max_row is not None and row_counter > max_row:
+                    return
+                col_counter = 0
+                cells = []
+                for c in row:
+                    ref = c.get("r")
+                    if ref:
+                        letters = ref.rstrip("0123456789")
+                        col_counter = column_of.get(letters) or column_of.setdefault(
+                            letters, column_index_from_string(letters)
+                        )
+                    else:
+                        col_counter += 1
+                    data_type = c.get("t", "n")
+                    style_id = int(c.get("s") or 0)
+                    value: object = None
+                    if data_type == "inlineStr":
+                        node = c.find(is_tag)
+                        if node is not None:
+                            plain = node.find(t_tag)
+                            runs = [t.text or "" for run in node.findall(r_tag) for t in run.iter(t_tag)]
+                            value = (plain.text or "" if plain is not None else "") + "".join(runs)
+                    else:
+                        value = c.findtext(v_tag) or None
+                        if value is not None:
+                            if data_type == "n":
+                                value = _cast_number(value)
+                                if style_id in date_styles:
+                                    try:
+                                        value = from_excel(value, epoch, timedelta=style_id in timedelta_styles)
+                                    except (OverflowError, ValueError):
+                                        value = "#VALUE!"
+                            elif data_type == "s":
+                                value = shared_strings[int(value)]
+                            elif data_type == "b":
+                                value = bool(int(value))
+                            elif data_type == "d":
+                                value = from_ISO8601(value)
+                    cells.append((col_counter, value, style_id))
+                row.clear()
+                yield row_counter, cells
+
+    def iter_rows(
+        self,
+        min_row: int | None = None,
+        max_row: int | None = None,
+        min_col: int | None = None,
+        max_col: int | None = None,
+        values_only: bool = False,
+    ):
+        min_col = min_col or 1
+        min_row = min_row or 1
+        max_col = max_col or self.max_column
+        max_row = max_row or self.max_row
+        filler = None if values_only else _EMPTY_STREAMING_CELL
+        empty_row = (filler,) * (max_col + 1 - min_col) if max_col is not None else ()
+        number_format = self.parent.number_format
+
+        counter = min_row
+        idx = 1
+        for idx, cells in self._parse_rows(max_row):
+            for _ in range(counter, idx):
+                counter += 1
+                yield empty_row
+            if counter > idx:
+                continue
+            counter += 1
+            if not cells and not max_col:
+                yield ()
+                continue
+            width = (max_col or cells[-1][0]) + 1 - min_col
+            out = [filler] * width
+            for column, value, style_id in cells:
+                if min_col <= column < min_col + width:
+                    out[column - min_col] = value if values_only else StreamingCell(value, number_format(style_id))
+            yield tuple(out)
+        if max_row is not None and max_row < idx:
+            for _ in range(counter, max_row + 1):
+                yield empty_row
+
+    @property
+    def values(self):
+        return self.iter_rows(values_only=True)
+
+
+class StreamingWorkbook:
+    """
+    Minimal read-only, data-only workbook over the OOXML zip: sheetnames,
+    wb[name] -> StreamingWorksheet, close(). Values are converted like
+    openpyxl (shared/inline strings, booleans, numbers, date-formatted
+    numbers -> datetime/time/timedelta honouring the 1904 epoch).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._zf = zipfile.ZipFile(path)
+        self._parts = sheet_parts(self._zf)
+        self._sheets: dict[str, StreamingWorksheet] = {}
+        self._shared_strings: list[str] | None = None
+        self.epoch = CALENDAR_WINDOWS_1900
+        workbook_pr = ET.fromstring(self._zf.read(WORKBOOK_PART)).find(f"{{{NS_MAIN}}}workbookPr")
+        if workbook_pr is not None and workbook_pr.get("date1904") in ("1", "true"):
+            self.epoch = CALENDAR_MAC_1904
+        self._read_styles()
+
+    def _read_styles(self) -> None:
+        self._style_formats: list[str] = []
+        self.date_styles: set[int] = set()
+        self.timedelta_styles: set[int] = set()
+        if STYLES_PART not in self._zf.namelist():
+            return
+        root = ET.fromstring(self._zf.read(STYLES_PART))
+        custom = {
+            int(fmt.get("numFmtId")): fmt.get("formatCode") or ""
+            for fmt in root.iter(f"{{{NS_MAIN}}}numFmt")
+        }
+        cell_xfs = root.find(f"{{{NS_MAIN}}}cellXfs")
+        for idx, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+            fmt_id = int(xf.get("numFmtId") or 0)
+            if fmt_id in custom:
+                code = custom[fmt_id]
+            elif fmt_id < BUILTIN_FORMATS_MAX_SIZE:
+                code = BUILTIN_FORMATS.get(fmt_id, "General")
+            else:
+                code = "General"
+            self._style_formats.append(code)
+            if is_date_format(code):
+                self.date_styles.add(idx)
+            if is_timedelta_format(code):
+                self.timedelta_styles.add(idx)
+
+    def number_format(self, style_id: int) -> str:
+        if 0 <= style_id < len(self._style_formats):
+            return self._style_formats[style_id]
+        return "General"
+
+    @property
+    def shared_strings(self) -> list[str]:
+        if self._shared_strings is None:
+            self._shared_strings = read_shared_strings(self._zf)
+        return self._shared_strings
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return list(self._parts)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._parts
+
+    def __getitem__(self, name: str) -> StreamingWorksheet:
+        if name not in self._parts:
+            raise KeyError(f"Worksheet {name} does not exist.")
+        if name not in self._sheets:
+            self._sheets[name] = StreamingWorksheet(self, name, self._parts[name])
+        return self._sheets[name]
+
+    def close(self) -> None:
+        self._zf.close()
+
+
+class CachedSheet:
+    """
+    In-memory copy of one worksheet: {row number: values tuple} for non-empty
+    rows, trailing empty cells trimmed. iter_rows() re-pads rows like
+    openpyxl's read-only worksheet, so extractors cannot tell the difference.
+    Sheets without a stored dimension keep their rows untrimmed, because
+    openpyxl then pads each row only up to its own last cell.
+    """
+
+    def __init__(self, ws, number_formats: bool = False) -> None:
+        self.title = ws.title
+        self._rows: dict[int, tuple] = {}
+        self._formats: dict[int, tuple] | None = {} if number_formats else None
+        sized = ws.max_column is not None
+        last_row = 0
+        # The source yields rows up to the last <row> element, never past it.
+        self._end_row = 0
+        for row_idx, row in enumerate(ws.iter_rows(values_only=not number_formats), start=1):
+            self._end_row = row_idx
+            values = tuple(cell.value for cell in row) if number_formats else row
+            n = len(values)
+            while n and values[n - 1] is None:
+                n -= 1
+            if not n:
+                continue
+            if not sized:
+                n = len(values)
+            self._rows[row_idx] = tuple(values[:n])
+            if number_formats:
+                self._formats[row_idx] = tuple(cell.number_format for cell in row[:n])
+            last_row = row_idx
+        self.min_row = self.min_column = 1
+        self.max_row = ws.max_row or last_row
+        self.max_column = ws.max_column
+
+    def iter_rows(
+        self,
+        min_row: int | None = None,
+        max_row: int | None = None,
+        min_col: int | None = None,
+        max_col: int | None = None,
+        values_only: bool = False,
+    ):
+        if not values_only and self._formats is None:
+            raise RuntimeError(f"Sheet '{self.title}' was cached without number formats")
+        min_row = min_row or 1
+        min_col = min_col or 1
+        max_row = min(max_row or self.max_row, self._end_row)
+        max_col = max_col or self.max_column
+        width = max(0, max_col + 1 - min_col) if max_col is not None else 0
+        empty = (None,) * width
+        for row_idx in range(min_row, max_row + 1):
+            values = self._rows.get(row_idx)
+            if values is None:
+                row = empty
+            elif max_col is None:
+                row = values[min_col - 1 :]
+            else:
+                row = values[min_col - 1 : max_col]
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+            if values_only:
+                yield row
+                continue
+            formats = self._formats.get(row_idx, ())[min_col - 1 : max_col]
+            yield tuple(
+                StreamingCell(value, formats[i] if i < len(formats) else None) for i, value in enumerate(row)
+            )
+
+    @property
+    def values(self):
+        return self.iter_rows(values_only=True)
+
+
+class SheetCache:
+    """
+    Workbook wrapper that parses each sheet exactly once.
+
+    consumers maps sheet name -> how many readers will ask for it; release()
+    drops a sheet from memory once its last reader is done. Sheets listed in
+    formatted_sheets also keep number formats (for iter_rows(values_only=False)).
+    """
+
+    def __init__(self, wb, consumers: dict[str, int] | None = None, formatted_sheets: Iterable[str] = ()) -> None:
+        self._wb = wb
+        self._consumers = dict(consumers or {})
+        self._formatted = set(formatted_sheets)
+        self._sheets: dict[str, CachedSheet] = {}
+        self.loads: dict[str, int] = {}
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return self._wb.sheetnames
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._wb.sheetnames
+
+    def __getitem__(self, name: str) -> CachedSheet:
+        sheet = self._sheets.get(name)
+        if sheet is None:
+            sheet = CachedSheet(self._wb[name], number_formats=name in self._formatted)
+            self._sheets[name] = sheet
+            self.loads[name] = self.loads.get(name, 0) + 1
+        return sheet
+
+    def release(self, names: Iterable[str]) -> None:
+        for name in names:
+            remaining = self._consumers.get(name, 0) - 1
+            self._consumers[name] = remaining
+            if remaining <= 0:
+                self._sheets.pop(name, None)
+
+    @property
+    def cached_sheets(self) -> list[str]:
+        return list(self._sheets)
+
+    def close(self) -> None:
+        self._sheets.clear()
+        self._wb.close()